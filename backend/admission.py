@@ -0,0 +1,217 @@
+"""
+Admission control and load shedding for expensive endpoints
+
+Chart rendering, the ML recommendation endpoints and /api/home cost
+orders of magnitude more than catalog reads. Each of them belongs to a
+lane with a concurrency limit and a short bounded queue. A request that
+finds the queue full, or waits longer than ADMISSION_QUEUE_TIMEOUT, gets
+an immediate 503 with Retry-After. A per-user token bucket (keyed by the JWT
+subject, no database access) answers 429 when one user floods a lane.
+
+Writes and cheap reads never pass through a lane. Because the lanes'
+combined concurrency stays below the threadpool size, quiz submissions
+and time tracking always find a free worker thread, whatever the
+analytics load.
+"""
+import asyncio
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.responses import JSONResponse
+from backend.auth import get_bearer_token, get_token_subject
+from backend.database import current_tenant
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1").lower() in ("1", "true", "yes")
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+# Per-user budget on limited lanes: sustained requests/second and burst size
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "5"))
+# Remembered users; the least recently seen bucket is dropped beyond this
+ADMISSION_MAX_USERS = 10000
+
+
+class Lane:
+    """
+    Concurrency limit with a bounded wait queue for one class of routes
+    """
+
+    def __init__(self, name: str, methods: Tuple[str, ...], pattern: str,
+                 concurrency: int, queue_size: int, timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.methods = methods
+        self.pattern = re.compile(pattern)
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0, "rate_limited": 0}
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.pattern.match(path) is not None
+
+    async def acquire(self) -> bool:
+        """
+        Take a slot, waiting in the queue if needed; False means shed the request
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.active >= self.concurrency:
+            if self.waiting >= self.queue_size:
+                self.stats["rejected_full"] += 1
+                return False
+            self.stats["queued"] += 1
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected_timeout"] += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.stats["admitted"] += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            **self.stats,
+        }
+
+
+class TokenBuckets:
+    """
+    Per-key token buckets refilled continuously at `rate` tokens/second
+    """
+
+    def __init__(self, rate: float = ADMISSION_USER_RATE, burst: float = ADMISSION_USER_BURST,
+                 max_keys: int = ADMISSION_MAX_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """
+        Spend one token; returns 0 if allowed, else seconds until one is available
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+def default_lanes() -> List[Lane]:
+    return [
+        Lane(
+            "charts", ("GET",), r"^/api/analytics/(progress-chart|topic-performance-chart)$",
+            concurrency=int(os.getenv("ADMISSION_CHART_CONCURRENCY", "2")),
+            queue_size=int(os.getenv("ADMISSION_CHART_QUEUE", "4")),
+        ),
+        Lane(
+            # The review queue is one index range scan, not a model
+            "ml", ("GET",), r"^/api/(recommendations/(?!review-queue$)|home$)",
+            concurrency=int(os.getenv("ADMISSION_ML_CONCURRENCY", "4")),
+            queue_size=int(os.getenv("ADMISSION_ML_QUEUE", "8")),
+        ),
+    ]
+
+
+class AdmissionController:
+    """
+    Lanes plus per-user rate limits, shared by the middleware and metrics
+    """
+
+    def __init__(self, lanes: Optional[List[Lane]] = None, buckets: Optional[TokenBuckets] = None):
+        self.lanes = lanes if lanes is not None else default_lanes()
+        self.buckets = buckets or TokenBuckets()
+
+    def lane_for(self, method: str, path: str) -> Optional[Lane]:
+        for lane in self.lanes:
+            if lane.matches(method, path):
+                return lane
+        return None
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "lanes": {lane.name: lane.snapshot() for lane in self.lanes},
+            "rate_limit": {"rate": self.buckets.rate, "burst": self.buckets.burst, "tracked_users": len(self.buckets)},
+        }
+
+
+admission = AdmissionController()
+
+
+def _client_key(scope) -> str:
+    headers = dict(scope.get("headers", []))
+    subject = get_token_subject(get_bearer_token(headers.get(b"authorization", b"").decode("latin-1")))
+    if subject is not None:
+        # Usernames repeat across tenants
+        return f"user:{current_tenant.get()}:{subject}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the controller's lanes and rate limits
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        lane = self.controller.lane_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.controller.buckets.take(_client_key(scope))
+        if wait > 0:
+            lane.stats["rate_limited"] += 1
+            await _reject(429, "Too many requests, slow down", wait)(scope, receive, send)
+            return
+
+        if not await lane.acquire():
+            await _reject(503, f"Server busy ({lane.name}), retry shortly", lane.timeout)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
@@ -0,0 +1,331 @@
+"""
+Cold-storage archive for old quiz attempts
+
+`quiz_attempts` only grows, so attempts older than ARCHIVE_AFTER_DAYS are
+moved out of SQLite into compressed Parquet files partitioned by month:
+
+    ARCHIVE_DIR/quiz_attempts/month=YYYY-MM/part-<first id>-<last id>.parquet
+
+(other tenants than the default one under ARCHIVE_DIR/tenants/<tenant>/).
+
+Before rows leave the hot table their totals are folded into
+`archived_topic_stats`, so aggregates, the dashboard and the ML views stay
+exact without reading the files. Attempt history and export read the files
+transparently (memory-mapped, row groups pruned by user_id).
+
+A run writes each part as a .tmp file, then in one transaction folds the
+totals, deletes the rows and records the part in `attempt_archive_parts`,
+and only then renames the file into place. A crashed run is repaired by the
+next one: committed parts are renamed, uncommitted ones discarded (their
+rows are still in the hot table).
+
+pyarrow is imported only when there is something to archive or read.
+
+Usage: python -m backend.archive [--older-than-days 365] [--vacuum]
+"""
+import argparse
+import glob
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import func, select, union_all
+from sqlalchemy.orm import Session
+from backend.database import tenant_dir
+from backend.models import ArchivedTopicStats, AttemptArchivePart, Quiz, QuizAttempt
+from backend.pagination import raw_timestamp
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+# At least a month of history always stays in the hot table
+MIN_ARCHIVE_AGE_DAYS = 31
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50000"))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+# Rows per row group; smaller groups prune better on per-user reads
+ARCHIVE_ROW_GROUP_SIZE = 16384
+
+ATTEMPTS_TABLE = "quiz_attempts"
+# completed_at keeps the text SQLite stored, so cursors compare exactly
+ARCHIVE_COLUMNS = ["id", "user_id", "quiz_id", "topic_id", "score", "answers_submitted", "completed_at"]
+
+
+def _parquet():
+    """
+    Import pyarrow on first use
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The attempt archive needs pyarrow: pip install pyarrow")
+    return pyarrow, pyarrow.parquet
+
+
+def _table_dir() -> str:
+    return os.path.join(tenant_dir(ARCHIVE_DIR), ATTEMPTS_TABLE)
+
+
+def _month_files() -> Dict[str, List[str]]:
+    """
+    Committed part files by month (YYYY-MM)
+    """
+    months: Dict[str, List[str]] = {}
+    for path in glob.glob(os.path.join(_table_dir(), "month=*", "part-*.parquet")):
+        month = os.path.basename(os.path.dirname(path))[len("month="):]
+        months.setdefault(month, []).append(path)
+    return months
+
+
+def _read_month(paths: List[str], user_id: Optional[int] = None, columns: Optional[List[str]] = None,
+                topic_ids: Optional[Iterable[int]] = None) -> List[dict]:
+    """
+    Rows of one month's parts (optionally one user's or some topics'), oldest first
+    """
+    _, pq = _parquet()
+    filters = []
+    if user_id is not None:
+        filters.append(("user_id", "==", user_id))
+    if topic_ids is not None:
+        filters.append(("topic_id", "in", sorted(topic_ids)))
+    rows: List[dict] = []
+    for path in paths:
+        table = pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+        rows.extend(table.to_pylist())
+    rows.sort(key=lambda r: (r["completed_at"], r["id"]))
+    return rows
+
+
+def parse_timestamp(text: str) -> datetime:
+    return datetime.fromisoformat(text)
+
+
+def read_user_attempts(user_id: int, before: Optional[Tuple[str, int]] = None,
+                       limit: Optional[int] = None) -> List[dict]:
+    """
+    A user's archived attempts newest first, older than the `before` key
+
+    Months are visited newest first and reading stops once `limit` rows are
+    collected; months entirely newer than `before` are skipped unread.
+    """
+    months = _month_files()
+    result: List[dict] = []
+    for month in sorted(months, reverse=True):
+        if before is not None and month > before[0][:7]:
+            continue
+        rows = _read_month(months[month], user_id)
+        if before is not None:
+            rows = [r for r in rows if (r["completed_at"], r["id"]) < before]
+        result.extend(reversed(rows))
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+    return result
+
+
+def iter_user_attempts(user_id: int) -> Iterator[dict]:
+    """
+    A user's archived attempts oldest first, one month in memory at a time
+    """
+    months = _month_files()
+    for month in sorted(months):
+        yield from _read_month(months[month], user_id)
+
+
+def iter_archived_attempts(columns: Optional[List[str]] = None,
+                           topic_ids: Optional[Iterable[int]] = None) -> Iterator[dict]:
+    """
+    Every archived attempt (or only those of `topic_ids`) oldest first (by completed_at, id)
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys([*columns, "id", "completed_at"]))
+    months = _month_files()
+    for month in sorted(months):
+        yield from _read_month(months[month], columns=columns, topic_ids=topic_ids)
+
+
+def has_archived_attempts(db: Session, user_id: int) -> bool:
+    """
+    Whether any of the user's attempts were archived (one indexed lookup)
+    """
+    return db.query(ArchivedTopicStats.id).filter(ArchivedTopicStats.user_id == user_id).first() is not None
+
+
+def score_totals(db: Session, user_id: Optional[int] = None):
+    """
+    (user_id, topic_id, attempts, score_sum) over hot and archived attempts
+    """
+    hot = select(
+        QuizAttempt.user_id.label("user_id"),
+        Quiz.topic_id.label("topic_id"),
+        func.count(QuizAttempt.id).label("attempts"),
+        func.sum(QuizAttempt.score).label("score_sum"),
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).group_by(QuizAttempt.user_id, Quiz.topic_id)
+    cold = select(
+        ArchivedTopicStats.user_id, ArchivedTopicStats.topic_id,
+        ArchivedTopicStats.attempts_count, ArchivedTopicStats.score_sum,
+    )
+    if user_id is not None:
+        hot = hot.filter(QuizAttempt.user_id == user_id)
+        cold = cold.filter(ArchivedTopicStats.user_id == user_id)
+    both = union_all(hot, cold).subquery()
+    return db.query(
+        both.c.user_id, both.c.topic_id, func.sum(both.c.attempts), func.sum(both.c.score_sum)
+    ).group_by(both.c.user_id, both.c.topic_id).all()
+
+
+def recover_parts(db: Session):
+    """
+    Finish or discard part files left behind by an interrupted run
+    """
+    committed = {path for (path,) in db.query(AttemptArchivePart.path).all()}
+    for tmp in glob.glob(os.path.join(_table_dir(), "month=*", "part-*.parquet.tmp")):
+        final = tmp[:-len(".tmp")]
+        if os.path.relpath(final, ARCHIVE_DIR) in committed:
+            os.replace(tmp, final)
+            logger.info(f"Recovered committed archive part {final}")
+        else:
+            os.remove(tmp)
+            logger.info(f"Discarded uncommitted archive part {tmp}")
+
+
+def _write_part(rows: List[dict], path: str):
+    """
+    Write rows to a compressed Parquet file, sorted for per-user pruning
+    """
+    pa, pq = _parquet()
+    rows = sorted(rows, key=lambda r: (r["user_id"], r["completed_at"], r["id"]))
+    schema = pa.schema([
+        ("id", pa.int64()), ("user_id", pa.int64()), ("quiz_id", pa.int64()), ("topic_id", pa.int64()),
+        ("score", pa.float64()), ("answers_submitted", pa.string()), ("completed_at", pa.string()),
+    ])
+    table = pa.Table.from_pylist(rows, schema=schema)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        pq.write_table(table, f, compression=ARCHIVE_COMPRESSION, row_group_size=ARCHIVE_ROW_GROUP_SIZE)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fold_totals(db: Session, rows: List[dict]):
+    """
+    Add the rows' per-user/per-topic totals to archived_topic_stats
+    """
+    totals: Dict[Tuple[int, int], list] = {}
+    for r in rows:
+        # [count, score sum, best, passed, first attempt, last attempt]
+        completed_at = parse_timestamp(r["completed_at"])
+        t = totals.setdefault((r["user_id"], r["topic_id"]), [0, 0.0, 0.0, 0, completed_at, completed_at])
+        t[0] += 1
+        t[1] += r["score"]
+        t[2] = max(t[2], r["score"])
+        t[3] += r["score"] >= 60
+        t[4] = min(t[4], completed_at)
+        t[5] = max(t[5], completed_at)
+
+    user_ids = {user_id for user_id, _ in totals}
+    existing = {
+        (s.user_id, s.topic_id): s
+        for s in db.query(ArchivedTopicStats).filter(ArchivedTopicStats.user_id.in_(user_ids)).all()
+    }
+    for (user_id, topic_id), (count, score_sum, best, passed, first_at, last_at) in totals.items():
+        row = existing.get((user_id, topic_id))
+        if row is None:
+            row = ArchivedTopicStats(user_id=user_id, topic_id=topic_id, attempts_count=0,
+                                     score_sum=0.0, best_score=0.0, passed_count=0)
+            db.add(row)
+        row.attempts_count += count
+        row.score_sum += score_sum
+        row.best_score = max(row.best_score, best)
+        row.passed_count += passed
+        if row.first_attempt_at is None or first_at < row.first_attempt_at.replace(tzinfo=None):
+            row.first_attempt_at = first_at
+        if row.last_attempt_at is None or last_at > row.last_attempt_at.replace(tzinfo=None):
+            row.last_attempt_at = last_at
+
+
+def archive_attempts(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                     batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move attempts older than `older_than_days` to the archive; returns the count
+    """
+    if older_than_days < MIN_ARCHIVE_AGE_DAYS:
+        raise ValueError(f"Attempts younger than {MIN_ARCHIVE_AGE_DAYS} days must stay in the hot table")
+    recover_parts(db)
+    # completed_at is written by CURRENT_TIMESTAMP, which is UTC
+    cutoff = (datetime.utcnow() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    archived = 0
+    while True:
+        batch = db.query(
+            QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.quiz_id, Quiz.topic_id,
+            QuizAttempt.score, QuizAttempt.answers_submitted, raw_timestamp(QuizAttempt.completed_at),
+        ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(
+            raw_timestamp(QuizAttempt.completed_at) < cutoff
+        ).order_by(QuizAttempt.id).limit(batch_size).all()
+        if not batch:
+            break
+        rows = [dict(zip(ARCHIVE_COLUMNS, row)) for row in batch]
+
+        by_month: Dict[str, List[dict]] = {}
+        for r in rows:
+            by_month.setdefault(r["completed_at"][:7], []).append(r)
+        parts = []
+        try:
+            for month, month_rows in by_month.items():
+                ids = [r["id"] for r in month_rows]
+                final = os.path.join(_table_dir(), f"month={month}", f"part-{min(ids):012d}-{max(ids):012d}.parquet")
+                _write_part(month_rows, final + ".tmp")
+                parts.append((final, month, month_rows))
+
+            _fold_totals(db, rows)
+            ids = [r["id"] for r in rows]
+            for start in range(0, len(ids), 900):
+                db.query(QuizAttempt).filter(QuizAttempt.id.in_(ids[start:start + 900])).delete(synchronize_session=False)
+            db.add_all(
+                AttemptArchivePart(
+                    month=month, path=os.path.relpath(final, ARCHIVE_DIR), rows=len(month_rows),
+                    min_attempt_id=min(r["id"] for r in month_rows), max_attempt_id=max(r["id"] for r in month_rows),
+                )
+                for final, month, month_rows in parts
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            for final, _, _ in parts:
+                if os.path.exists(final + ".tmp"):
+                    os.remove(final + ".tmp")
+            raise
+
+        for final, _, _ in parts:
+            os.replace(final + ".tmp", final)
+        archived += len(rows)
+        logger.info(f"Archived {len(rows)} attempts into {len(parts)} part(s)")
+
+    return archived
+
+
+def main():
+    from backend.database import SessionLocal, get_engine, init_db
+
+    parser = argparse.ArgumentParser(description="Move old quiz attempts to the Parquet archive")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--vacuum", action="store_true", help="reclaim the freed space in the database file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        count = archive_attempts(db, args.older_than_days, args.batch_size)
+    finally:
+        db.close()
+    logger.info(f"Archived {count} attempts older than {args.older_than_days} days to {tenant_dir(ARCHIVE_DIR)}")
+    if args.vacuum and count:
+        with get_engine().connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """
 Authentication utilities: JWT tokens and password hashing
 """
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -8,7 +9,7 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from backend.database import get_db
+from backend.database import DEFAULT_TENANT, current_tenant, get_db
 from backend.models import User
 from fastapi import APIRouter, Body
 
@@ -33,7 +34,7 @@ def login(form_data: dict = Body(...), db: Session = Depends(get_db)):
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "tid": current_tenant.get()}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -71,7 +72,7 @@ def signup(
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": new_user.username}, expires_delta=access_token_expires
+        data={"sub": new_user.username, "tid": current_tenant.get()}, expires_delta=access_token_expires
     )
 
     return {
@@ -93,6 +94,10 @@ SECRET_KEY = "your-secret-key-change-in-production-use-env-variable"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Comma-separated usernames allowed to use operator features (profiling, admin APIs);
+# "tenant:username" for another tenant than the default one
+ADMIN_USERNAMES = {name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()}
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -120,6 +125,55 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def get_token_subject(token: Optional[str]) -> Optional[str]:
+    """
+    Return the username in a valid JWT without touching the database
+    """
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+def get_token_tenant(token: Optional[str]) -> Optional[str]:
+    """
+    Return the tenant of a valid JWT (the default one if it has no claim)
+    """
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("tid", DEFAULT_TENANT)
+
+def get_bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """
+    Extract the token from an "Authorization: Bearer ..." header value
+    """
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return token.strip() or None
+
+def is_admin_username(username: Optional[str]) -> bool:
+    """
+    Check whether a username is configured as an administrator
+
+    Plain names are administrators of the default tenant; "tenant:name"
+    entries of that tenant only.
+    """
+    if not username:
+        return False
+    tenant = current_tenant.get()
+    if tenant == DEFAULT_TENANT:
+        return username in ADMIN_USERNAMES
+    return f"{tenant}:{username}" in ADMIN_USERNAMES
+
 def authenticate_user(db: Session, username: str, password: str):
     """
     Authenticate a user by username and password
@@ -151,3 +205,14 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     if user is None:
         raise credentials_exception
     return user
+
+def get_current_admin(current_user: User = Depends(get_current_user)):
+    """
+    Dependency restricting a route to ADMIN_USERNAMES
+    """
+    if not is_admin_username(current_user.username):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
@@ -0,0 +1,104 @@
+"""
+In-process memoization of per-user ML results
+
+Results are cached in an LRU keyed by (user_id, endpoint, params, user data
+version, catalog version), so a submission or catalog change makes old
+entries unreachable and they age out. Concurrent identical requests are
+de-duplicated (single flight): one caller computes, the others wait for
+its result instead of hitting sklearn and SQLite again.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+from backend.versions import get_catalog_version, get_user_version
+
+ML_CACHE_SIZE = int(os.getenv("ML_CACHE_SIZE", "2048"))
+
+
+class SingleFlightCache:
+    """
+    Thread-safe LRU cache whose misses are computed once per key
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing it at most once at a time
+
+        Cached values are shared between callers and must not be mutated.
+        """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "inflight": len(self._inflight),
+            }
+
+
+user_results = SingleFlightCache(maxsize=ML_CACHE_SIZE)
+
+
+def user_cache_key(user_id: int, endpoint: str, params: Tuple = ()) -> Tuple:
+    """
+    Cache key for a per-user result at the current data versions
+    """
+    return (user_id, endpoint, params, get_user_version(user_id), get_catalog_version())
+
+
+def cached_for_user(user_id: int, endpoint: str, params: Tuple, compute: Callable[[], Any]) -> Any:
+    """
+    Memoize compute() for a user until their data or the catalog changes
+    """
+    return user_results.get_or_compute(user_cache_key(user_id, endpoint, params), compute)
@@ -0,0 +1,66 @@
+"""
+Pre-serialized course catalog
+
+The catalog listing is loaded with selectinload (one query for courses, one
+for their topics), serialized once to JSON bytes and served from memory
+until the catalog version changes.
+"""
+from typing import List, Optional, Sequence
+from sqlalchemy.orm import Session, selectinload
+from backend.cache import SingleFlightCache
+from backend.models import Course
+from backend.responses import dumps
+from backend.schemas import CourseResponse
+from backend.versions import get_catalog_version
+from backend.warmup import register_warmup_hook
+
+# One entry per (catalog version, filter) combination
+catalog_cache = SingleFlightCache(maxsize=64)
+
+
+def load_catalog(db: Session, difficulty: Optional[str] = None, course_ids: Optional[Sequence[int]] = None) -> List[dict]:
+    """
+    Load courses with their topics in two queries, optionally filtered
+
+    With a difficulty filter only matching topics are kept, and courses
+    without any are left out.
+    """
+    query = db.query(Course).options(selectinload(Course.topics)).order_by(Course.id)
+    if course_ids:
+        query = query.filter(Course.id.in_(list(course_ids)))
+
+    catalog = []
+    for course in query.all():
+        data = CourseResponse.model_validate(course).model_dump(mode="json")
+        if difficulty:
+            data["topics"] = [t for t in data["topics"] if t["difficulty_level"] == difficulty]
+            if not data["topics"]:
+                continue
+        catalog.append(data)
+    return catalog
+
+
+def get_catalog_json(db: Session, difficulty: Optional[str] = None, course_ids: Optional[Sequence[int]] = None) -> bytes:
+    """
+    Catalog listing as JSON bytes, cached until the catalog changes
+    """
+    ids = tuple(sorted(set(course_ids))) if course_ids else ()
+    key = (get_catalog_version(), difficulty, ids)
+    return catalog_cache.get_or_compute(
+        key,
+        lambda: dumps(load_catalog(db, difficulty, ids))
+    )
+
+
+@register_warmup_hook
+def preload_catalog():
+    """
+    Serialize the unfiltered catalog ahead of the first request
+    """
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        get_catalog_json(db)
+    finally:
+        db.close()
@@ -1,20 +1,175 @@
 """
 Database configuration and session management
+
+Each tenant (school) has its own SQLite database, so commits from different
+tenants never wait on each other's write lock. The "default" tenant is
+learning_platform.db; every other tenant listed in TENANTS lives in
+TENANT_DB_DIR/<tenant>.db with the same schema. The tenant of a request
+comes from its token's `tid` claim (see backend.tenancy) and is held in a
+context variable; sessions bind to that tenant's database when created.
 """
-from sqlalchemy import create_engine
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Iterable, Optional
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./learning_platform.db"
 
+DEFAULT_TENANT = "default"
+TENANT_DB_DIR = os.getenv("TENANT_DB_DIR", "./tenants")
+# Threads used by fan_out to query the shards
+TENANT_FANOUT_WORKERS = int(os.getenv("TENANT_FANOUT_WORKERS", "8"))
+
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Configured tenants (comma-separated); the default tenant always exists
+TENANTS = [DEFAULT_TENANT] + sorted(
+    {name.strip() for name in os.getenv("TENANTS", "").split(",") if name.strip()} - {DEFAULT_TENANT}
+)
+for _name in TENANTS:
+    if not TENANT_NAME.match(_name):
+        raise ValueError(f"Invalid tenant name {_name!r} in TENANTS")
+
+# The tenant of the running request; scripts use TENANT (default: "default")
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=os.getenv("TENANT", DEFAULT_TENANT))
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_engines = {DEFAULT_TENANT: engine}
+_engines_lock = threading.Lock()
+
+
+def is_tenant(tenant: Optional[str]) -> bool:
+    return tenant in TENANTS
+
+
+def tenant_url(tenant: str) -> str:
+    if tenant == DEFAULT_TENANT:
+        return SQLALCHEMY_DATABASE_URL
+    return f"sqlite:///{os.path.join(TENANT_DB_DIR, tenant + '.db')}"
+
+
+def tenant_dir(root: str, tenant: Optional[str] = None) -> str:
+    """
+    A tenant's subdirectory of a data directory (the root for the default tenant)
+    """
+    tenant = tenant or current_tenant.get()
+    return root if tenant == DEFAULT_TENANT else os.path.join(root, "tenants", tenant)
+
+
+def get_engine(tenant: Optional[str] = None):
+    """
+    The engine of a tenant's database (the current tenant by default)
+    """
+    tenant = tenant or current_tenant.get()
+    shard = _engines.get(tenant)
+    if shard is not None:
+        return shard
+    if not is_tenant(tenant):
+        raise LookupError(f"Unknown tenant {tenant!r}")
+    with _engines_lock:
+        if tenant not in _engines:
+            os.makedirs(TENANT_DB_DIR, exist_ok=True)
+            _engines[tenant] = create_engine(tenant_url(tenant), connect_args={"check_same_thread": False})
+        return _engines[tenant]
+
+
+@contextmanager
+def tenant_scope(tenant: str):
+    """
+    Make `tenant` the current tenant inside the block
+    """
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+class TenantSession(Session):
+    """
+    Session bound to the database of the tenant current at its creation
+    """
+
+    def __init__(self, tenant: Optional[str] = None, **kwargs):
+        self.tenant = tenant or current_tenant.get()
+        kwargs["bind"] = kwargs.get("bind") or get_engine(self.tenant)
+        super().__init__(**kwargs)
+
+
+SessionLocal = sessionmaker(class_=TenantSession, autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+def lock_for_write(db: Session):
+    """
+    Take the database's write lock now, until the session commits or rolls back
+
+    For read-then-replace rebuilds: what the session reads afterwards cannot
+    change before its commit, as other writers wait on the lock (up to the
+    driver's busy timeout) instead of committing in between.
+    """
+    if not db.connection().connection.driver_connection.in_transaction:
+        db.execute(text("BEGIN IMMEDIATE"))
+
+def init_db(bind=None):
+    """
+    Create missing tables and indexes (explicit startup/migration step)
+
+    Applies to the current tenant's database unless `bind` is given.
+    """
+    # Import models so every table is registered on Base.metadata
+    import backend.models  # noqa: F401
+
+    bind = bind or get_engine()
+    Base.metadata.create_all(bind=bind)
+    # create_all skips indexes added to tables that already exist
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    # FTS5 table and the triggers keeping it in sync with the catalog
+    from backend.search import create_search_index
+    create_search_index(bind)
+
+def init_all_tenants():
+    """
+    Create missing tables and indexes in every configured tenant's database
+    """
+    for tenant in TENANTS:
+        init_db(get_engine(tenant))
+
+def fan_out(query: Callable[[Session], Any], tenants: Optional[Iterable[str]] = None,
+            max_workers: int = TENANT_FANOUT_WORKERS) -> Dict[str, Any]:
+    """
+    Run query(session) against every tenant's database in parallel
+
+    For cross-tenant (admin) reports: each call gets its own session, runs
+    with that tenant as the current one and must return plain data, not
+    ORM objects. Returns {tenant: result}; the first failure is raised.
+    """
+    tenants = list(tenants) if tenants is not None else list(TENANTS)
+
+    def run(tenant: str):
+        with tenant_scope(tenant):
+            db = SessionLocal()
+            try:
+                return query(db)
+            finally:
+                db.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tenants)))) as pool:
+        futures = {tenant: pool.submit(copy_context().run, run, tenant) for tenant in tenants}
+        return {tenant: future.result() for tenant, future in futures.items()}
+
 def get_db():
     """
     Dependency for getting database session
@@ -0,0 +1,202 @@
+"""
+Derived data maintained by the event pipeline
+
+Handlers run in the background after a write's response has been sent:
+they refresh the per-user/per-topic aggregates, push a dashboard delta to
+the user's live streams and precompute the personalized recommendation
+views so the next read is a cache hit.
+Handlers recompute from the source tables, so processing an event twice
+(or two batches for one user concurrently) is harmless.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.database import SessionLocal
+from backend.enrollment import curriculum_topic_ids
+from backend.events import Event, EventBus, QUIZ_SUBMITTED, PERFORMANCE_TRACKED
+from backend.live import live_broker
+from backend.models import ArchivedTopicStats, Performance, Quiz, QuizAttempt, Topic, UserTopicStats
+
+logger = logging.getLogger(__name__)
+
+PRECOMPUTE_RECOMMENDATIONS = os.getenv("PRECOMPUTE_RECOMMENDATIONS", "1").lower() in ("1", "true", "yes")
+# The frontend asks for /recommendations/topics?limit=5
+PRECOMPUTE_TOPIC_LIMIT = 5
+
+
+def refresh_user_topic_stats(db: Session, user_id: int, topic_ids: Optional[Iterable[int]] = None):
+    """
+    Recompute a user's UserTopicStats rows (all topics, or only `topic_ids`)
+
+    Hot attempts are aggregated in SQL and added to the archived totals.
+    """
+    topic_ids = set(topic_ids) if topic_ids is not None else None
+
+    attempts_query = db.query(
+        Quiz.topic_id,
+        func.count(QuizAttempt.id),
+        func.sum(QuizAttempt.score),
+        func.max(QuizAttempt.score),
+        func.sum(case((QuizAttempt.score >= 60, 1), else_=0)),
+        func.max(QuizAttempt.completed_at),
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(QuizAttempt.user_id == user_id)
+    time_query = db.query(Performance.topic_id, Performance.time_spent_minutes).filter(Performance.user_id == user_id)
+    archived_query = db.query(ArchivedTopicStats).filter(ArchivedTopicStats.user_id == user_id)
+    stats_query = db.query(UserTopicStats).filter(UserTopicStats.user_id == user_id)
+    if topic_ids is not None:
+        attempts_query = attempts_query.filter(Quiz.topic_id.in_(topic_ids))
+        time_query = time_query.filter(Performance.topic_id.in_(topic_ids))
+        archived_query = archived_query.filter(ArchivedTopicStats.topic_id.in_(topic_ids))
+        stats_query = stats_query.filter(UserTopicStats.topic_id.in_(topic_ids))
+
+    attempts = {row[0]: row[1:] for row in attempts_query.group_by(Quiz.topic_id).all()}
+    time_spent = dict(time_query.all())
+    archived = {row.topic_id: row for row in archived_query.all()}
+    existing = {row.topic_id: row for row in stats_query.all()}
+
+    for topic_id in set(attempts) | set(time_spent) | set(archived) | set(existing):
+        count, score_sum, best, passed, last_at = attempts.get(topic_id, (0, 0.0, 0.0, 0, None))
+        cold = archived.get(topic_id)
+        if cold is not None:
+            # Attempts moved to the archive count through their folded totals
+            count = (count or 0) + cold.attempts_count
+            score_sum = (score_sum or 0.0) + cold.score_sum
+            best = max(best or 0.0, cold.best_score)
+            passed = (passed or 0) + cold.passed_count
+            last_at = last_at or cold.last_attempt_at
+        row = existing.get(topic_id)
+        if row is None:
+            row = UserTopicStats(user_id=user_id, topic_id=topic_id)
+            db.add(row)
+        row.attempts_count = count or 0
+        row.score_sum = score_sum or 0.0
+        row.best_score = best or 0.0
+        row.passed_count = passed or 0
+        row.last_attempt_at = last_at
+        row.time_spent_minutes = time_spent.get(topic_id, 0.0) or 0.0
+    db.commit()
+
+
+def update_aggregates(user_id: int, events: List[Event]):
+    """
+    Event handler: refresh aggregates for the topics touched by the batch
+    """
+    topic_ids = {e.payload["topic_id"] for e in events if "topic_id" in e.payload}
+    db = SessionLocal()
+    try:
+        try:
+            refresh_user_topic_stats(db, user_id, topic_ids or None)
+        except IntegrityError:
+            # Another process inserted the same row first; recompute on top of it
+            db.rollback()
+            refresh_user_topic_stats(db, user_id, topic_ids or None)
+    finally:
+        db.close()
+
+
+def build_dashboard_delta(db: Session, user_id: int, topic_ids: Iterable[int]) -> dict:
+    """
+    Dashboard changes after a write, in the shapes /api/analytics/dashboard uses
+
+    Summary numbers, the performance rows of the touched topics and the
+    progress point for today; computed from the aggregates, not raw attempts.
+    """
+    stats = db.query(UserTopicStats).filter(UserTopicStats.user_id == user_id).all()
+    # Completion is over the user's curriculum (the whole catalog if not enrolled)
+    curriculum = curriculum_topic_ids(db, user_id)
+    if curriculum is None:
+        total_topics = db.query(func.count(Topic.id)).scalar() or 0
+    else:
+        total_topics = len(curriculum)
+
+    completed = sum(1 for s in stats if s.passed_count > 0 and (curriculum is None or s.topic_id in curriculum))
+    attempts = sum(s.attempts_count for s in stats)
+    score_sum = sum(s.score_sum for s in stats)
+    average_score = score_sum / attempts if attempts else 0
+
+    topic_ids = set(topic_ids)
+    titles = dict(db.query(Topic.id, Topic.title).filter(Topic.id.in_(topic_ids)).all()) if topic_ids else {}
+    by_topic = {s.topic_id: s for s in stats}
+    topic_performances = []
+    for topic_id in sorted(topic_ids):
+        row = by_topic.get(topic_id)
+        count = row.attempts_count if row else 0
+        avg = row.score_sum / count if count else 0
+        if count == 0:
+            status = "Not Started"
+        else:
+            status = "Completed" if avg >= 60 else "In Progress"
+        topic_performances.append({
+            "topic_id": topic_id,
+            "topic_title": titles.get(topic_id, ""),
+            "average_score": avg,
+            "attempts_count": count,
+            "completion_status": status,
+            "time_spent_minutes": row.time_spent_minutes if row else 0.0,
+        })
+
+    return {
+        "total_topics": total_topics,
+        "completed_topics": completed,
+        "completion_percentage": round(completed / total_topics * 100, 2) if total_topics else 0,
+        "average_score": round(average_score, 2),
+        "topic_performances": topic_performances,
+        "progress_point": {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "topics_completed": sum(s.passed_count for s in stats),
+            "average_score": average_score,
+        },
+    }
+
+
+def push_dashboard_delta(user_id: int, events: List[Event]):
+    """
+    Event handler: send the dashboard delta to the user's open streams
+    """
+    topic_ids = {e.payload["topic_id"] for e in events if "topic_id" in e.payload}
+    db = SessionLocal()
+    try:
+        delta = build_dashboard_delta(db, user_id, topic_ids)
+    finally:
+        db.close()
+    live_broker.publish(user_id, "dashboard", delta)
+
+
+def precompute_recommendations(user_id: int, events: List[Event]):
+    """
+    Event handler: fill the per-user result cache for the new data version
+    """
+    from backend.cache import user_cache_key, user_results
+    from backend.ml.adaptive_path import get_adaptive_recommendations_for_snapshot
+    from backend.ml.knowledge_gaps import detect_knowledge_gaps_for_snapshot
+    from backend.ml.recommendations import recommend_topics_for_snapshot
+    from backend.snapshot import load_user_snapshot
+
+    # Keys first, then one data load shared by the three views
+    topics_key = user_cache_key(user_id, "topics", (PRECOMPUTE_TOPIC_LIMIT, "content"))
+    gaps_key = user_cache_key(user_id, "knowledge-gaps", ())
+    path_key = user_cache_key(user_id, "adaptive-path", ())
+    db = SessionLocal()
+    try:
+        snapshot = load_user_snapshot(db, user_id)
+    finally:
+        db.close()
+
+    user_results.get_or_compute(topics_key, lambda: recommend_topics_for_snapshot(snapshot, PRECOMPUTE_TOPIC_LIMIT))
+    user_results.get_or_compute(gaps_key, lambda: detect_knowledge_gaps_for_snapshot(snapshot))
+    user_results.get_or_compute(path_key, lambda: get_adaptive_recommendations_for_snapshot(snapshot))
+
+
+def register_handlers(bus: EventBus):
+    """
+    Subscribe the derived-data handlers to the event bus
+    """
+    # Handlers run in this order for each batch
+    bus.subscribe(update_aggregates, types=[QUIZ_SUBMITTED, PERFORMANCE_TRACKED])
+    bus.subscribe(push_dashboard_delta, types=[QUIZ_SUBMITTED, PERFORMANCE_TRACKED])
+    if PRECOMPUTE_RECOMMENDATIONS:
+        bus.subscribe(precompute_recommendations, types=[QUIZ_SUBMITTED, PERFORMANCE_TRACKED])
@@ -0,0 +1,103 @@
+"""
+Course enrollment, which defines the curriculum each learner's views cover
+
+A learner is enrolled in a course explicitly or on their first quiz
+submission in it. The dashboard totals, recommendations, knowledge gaps and
+adaptive path only consider topics of enrolled courses, so per-request work
+follows the learner's own curriculum instead of the whole catalog. A learner
+without enrollments still sees the whole catalog, so new accounts have
+something to start from.
+
+Enroll existing learners in the courses they have activity in with
+`python -m backend.enrollment`.
+"""
+import logging
+from typing import List, Optional, Set
+from sqlalchemy import exists, or_, select
+from sqlalchemy.orm import Session
+from backend.models import Enrollment, Performance, Quiz, QuizAttempt, Topic
+
+logger = logging.getLogger(__name__)
+
+
+def enrolled_course_ids(db: Session, user_id: int) -> List[int]:
+    return [
+        course_id for (course_id,) in
+        db.query(Enrollment.course_id).filter(Enrollment.user_id == user_id).order_by(Enrollment.course_id).all()
+    ]
+
+
+def scope_topics(query, user_id: int):
+    """
+    Restrict a Topic query to the user's enrolled courses (all if none)
+    """
+    enrolled = select(Enrollment.course_id).where(Enrollment.user_id == user_id)
+    return query.filter(or_(Topic.course_id.in_(enrolled), ~exists(enrolled)))
+
+
+def curriculum_topic_ids(db: Session, user_id: int) -> Optional[Set[int]]:
+    """
+    Topic ids of the user's enrolled courses, or None for the whole catalog
+    """
+    course_ids = enrolled_course_ids(db, user_id)
+    if not course_ids:
+        return None
+    return {topic_id for (topic_id,) in db.query(Topic.id).filter(Topic.course_id.in_(course_ids)).all()}
+
+
+def enroll(db: Session, user_id: int, course_id: int) -> bool:
+    """
+    Enroll the user in a course; False if already enrolled
+
+    Flushes without committing. A concurrent enrollment of the same pair
+    raises IntegrityError here or at the caller's commit.
+    """
+    exists_already = db.query(Enrollment.id).filter(
+        Enrollment.user_id == user_id, Enrollment.course_id == course_id
+    ).first()
+    if exists_already is not None:
+        return False
+    db.add(Enrollment(user_id=user_id, course_id=course_id))
+    db.flush()
+    return True
+
+
+def unenroll(db: Session, user_id: int, course_id: int) -> bool:
+    """
+    Remove an enrollment and commit; False if there was none
+    """
+    deleted = db.query(Enrollment).filter(
+        Enrollment.user_id == user_id, Enrollment.course_id == course_id
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+
+def backfill_enrollments(db: Session) -> int:
+    """
+    Enroll every user in the courses they attempted quizzes or tracked time in
+    """
+    from_attempts = db.query(QuizAttempt.user_id, Topic.course_id).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    ).join(Topic, Quiz.topic_id == Topic.id)
+    from_time = db.query(Performance.user_id, Topic.course_id).join(Topic, Performance.topic_id == Topic.id)
+    pairs = set(from_attempts.distinct().all()) | set(from_time.distinct().all())
+    existing = set(db.query(Enrollment.user_id, Enrollment.course_id).all())
+
+    missing = pairs - existing
+    db.add_all(Enrollment(user_id=user_id, course_id=course_id) for user_id, course_id in sorted(missing))
+    db.commit()
+    return len(missing)
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        count = backfill_enrollments(session)
+    finally:
+        session.close()
+    logger.info(f"Added {count} enrollments from existing activity")
@@ -0,0 +1,164 @@
+"""
+In-process event pipeline for derived data
+
+Write endpoints publish events (after their response is sent) onto bounded
+asyncio queues, one per consumer task, partitioned by user id so a user's
+events are processed in order and never concurrently. Each consumer drains
+its queue, batches consecutive events per user and hands each batch to the
+subscribed handlers in the threadpool. A full queue makes publishers wait
+(backpressure); on shutdown the queues are drained before exiting.
+Events remember the tenant they were published in and are handled with it
+as the current tenant.
+"""
+import asyncio
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+from anyio import to_thread
+from backend.database import DEFAULT_TENANT, current_tenant, tenant_scope
+
+logger = logging.getLogger(__name__)
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "1000"))
+EVENT_CONSUMERS = int(os.getenv("EVENT_CONSUMERS", "2"))
+EVENT_BATCH_SIZE = int(os.getenv("EVENT_BATCH_SIZE", "100"))
+EVENT_DRAIN_TIMEOUT = float(os.getenv("EVENT_DRAIN_TIMEOUT", "10"))
+
+QUIZ_SUBMITTED = "quiz_submitted"
+PERFORMANCE_TRACKED = "performance_tracked"
+
+
+@dataclass
+class Event:
+    """
+    Something that changed a user's learning data
+    """
+    type: str
+    user_id: int
+    payload: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    tenant: str = field(default_factory=current_tenant.get)
+
+
+# handler(user_id, events) -> None, called in a worker thread
+Handler = Callable[[int, List[Event]], None]
+
+
+class EventBus:
+    """
+    Bounded asyncio queues with a pool of batching consumers
+    """
+
+    def __init__(self, maxsize: int = EVENT_QUEUE_SIZE, consumers: int = EVENT_CONSUMERS,
+                 batch_size: int = EVENT_BATCH_SIZE):
+        self.maxsize = maxsize
+        self.consumers = consumers
+        self.batch_size = batch_size
+        self._handlers: List[tuple] = []
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"published": 0, "processed": 0, "batches": 0, "failed": 0, "inline": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def subscribe(self, handler: Handler, types: Optional[Sequence[str]] = None) -> Handler:
+        """
+        Register a handler, optionally only for some event types
+        """
+        self._handlers.append((handler, set(types) if types else None))
+        return handler
+
+    async def start(self):
+        if self.running:
+            return
+        per_queue = max(1, self.maxsize // self.consumers)
+        self._queues = [asyncio.Queue(maxsize=per_queue) for _ in range(self.consumers)]
+        self._tasks = [asyncio.create_task(self._consume(queue), name=f"event-consumer-{i}")
+                       for i, queue in enumerate(self._queues)]
+        logger.info(f"Event pipeline started with {self.consumers} consumers")
+
+    async def publish(self, event: Event):
+        """
+        Enqueue an event, waiting while the queue is full
+
+        Without running consumers (scripts, tests without lifespan) the
+        handlers run inline instead, so derived data is never skipped.
+        """
+        self.stats["published"] += 1
+        if not self.running:
+            self.stats["inline"] += 1
+            await to_thread.run_sync(self._dispatch, event.tenant, event.user_id, [event])
+            return
+        await self._queues[self._partition(event)].put(event)
+
+    def _partition(self, event: Event) -> int:
+        # A user's events always go to the same queue, whatever their tenant
+        key = event.user_id if event.tenant == DEFAULT_TENANT else zlib.crc32(f"{event.tenant}:{event.user_id}".encode())
+        return key % len(self._queues)
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def _consume(self, queue: asyncio.Queue):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            # Group per user, keeping each user's events in publish order
+            per_user: Dict[tuple, List[Event]] = OrderedDict()
+            for event in batch:
+                per_user.setdefault((event.tenant, event.user_id), []).append(event)
+
+            try:
+                for (tenant, user_id), events in per_user.items():
+                    await to_thread.run_sync(self._dispatch, tenant, user_id, events)
+            finally:
+                self.stats["batches"] += 1
+                for _ in batch:
+                    queue.task_done()
+
+    def _dispatch(self, tenant: str, user_id: int, events: List[Event]):
+        with tenant_scope(tenant):
+            self._run_handlers(user_id, events)
+
+    def _run_handlers(self, user_id: int, events: List[Event]):
+        for handler, types in self._handlers:
+            selected = [e for e in events if types is None or e.type in types]
+            if not selected:
+                continue
+            try:
+                handler(user_id, selected)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Event handler {handler.__name__} failed for user {user_id}: {e}")
+        self.stats["processed"] += len(events)
+
+    async def drain(self, timeout: float = EVENT_DRAIN_TIMEOUT):
+        """
+        Wait for queued events to be processed, then stop the consumers
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Event pipeline shut down with {self.queue_depth()} events unprocessed")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queues = []
+        logger.info("Event pipeline stopped")
+
+
+event_bus = EventBus()
@@ -0,0 +1,249 @@
+"""
+Quiz grading: answer keys, bulk scoring and re-grading
+
+A quiz's `answers` column holds one answer-key entry per question: either
+the correct option index (single choice, the original format) or an object
+
+    {"correct": [0, 2], "weight": 2.0, "partial_credit": true}
+
+for multi-select and weighted questions. A key compiles into a boolean
+(questions x options) matrix, padded to the widest question, plus each
+question's own option count; submissions are encoded as a boolean
+(submissions x questions x options) array and graded together:
+
+- without partial credit a question scores 1 only if exactly the correct
+  options are selected (for single choice: the right index);
+- with partial credit it scores (correct picks / correct options) minus
+  (wrong picks / wrong options of that question), floored at 0.
+
+The score is the weighted share of credit, as a percentage. With the
+original format every weight is 1, so scores match the previous
+"correct answers / questions * 100" to the last bit.
+
+After an answer key is edited, `regrade_quiz` re-scores every stored attempt
+of the quiz in chunks (one transaction per chunk) and refreshes what is
+derived from scores. Archived attempts keep the score they were archived
+with.
+
+    python -m backend.grading QUIZ_ID [--chunk-size N]
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Set, Tuple
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from backend.models import Quiz, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+REGRADE_CHUNK_SIZE = int(os.getenv("REGRADE_CHUNK_SIZE", "1000"))
+# Score changes smaller than this are float noise, not a re-grade
+SCORE_EPSILON = 1e-9
+
+
+@dataclass(frozen=True)
+class AnswerKey:
+    correct: np.ndarray  # (questions, options) bool
+    weights: np.ndarray  # (questions,)
+    partial: np.ndarray  # (questions,) bool: partial credit allowed
+    option_counts: np.ndarray  # (questions,) options of each question
+
+    @property
+    def questions(self) -> int:
+        return self.correct.shape[0]
+
+    @property
+    def options(self) -> int:
+        return self.correct.shape[1]
+
+
+def key_entry(correct: Sequence[int], weight: float = 1.0, partial_credit: bool = False) -> Any:
+    """
+    The stored answer-key entry for one question (an int when possible)
+    """
+    correct = sorted(set(correct))
+    if len(correct) == 1 and weight == 1.0 and not partial_credit:
+        return correct[0]
+    return {"correct": correct, "weight": weight, "partial_credit": partial_credit}
+
+
+def compile_answer_key(entries: List[Any], option_counts: Sequence[int] = ()) -> AnswerKey:
+    """
+    Build an AnswerKey from stored entries (and each question's option count)
+    """
+    parsed = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            parsed.append((entry["correct"], float(entry.get("weight", 1.0)), bool(entry.get("partial_credit", False))))
+        else:
+            parsed.append(([entry], 1.0, False))
+    # Without a stored count, a question has as many options as its key reaches
+    counts = [
+        max(option_counts[q] if q < len(option_counts) else 0, max(indices, default=-1) + 1, 1)
+        for q, (indices, _, _) in enumerate(parsed)
+    ]
+    correct = np.zeros((len(parsed), max(counts, default=1)), dtype=bool)
+    for q, (indices, _, _) in enumerate(parsed):
+        correct[q, [i for i in indices if 0 <= i < counts[q]]] = True
+    return AnswerKey(
+        correct=correct,
+        weights=np.array([w for _, w, _ in parsed], dtype=float),
+        partial=np.array([p for _, _, p in parsed], dtype=bool),
+        option_counts=np.array(counts, dtype=int),
+    )
+
+
+def quiz_answer_key(quiz: Quiz) -> AnswerKey:
+    questions = json.loads(quiz.questions)
+    return compile_answer_key(json.loads(quiz.answers), [len(q.get("options", ())) for q in questions])
+
+
+def encode_submissions(key: AnswerKey, submissions: Sequence[Sequence[Any]]) -> np.ndarray:
+    """
+    Selections as a (submissions, questions, options) bool array
+
+    Each answer is an option index or a list of them; answers past the last
+    question, options the question doesn't have and missing answers select
+    nothing.
+    """
+    rows, questions, options = [], [], []
+    for n, answers in enumerate(submissions):
+        for q, answer in enumerate(answers[:key.questions]):
+            if answer is None:
+                continue
+            for option in (answer if isinstance(answer, list) else [answer]):
+                if isinstance(option, int) and 0 <= option < key.option_counts[q]:
+                    rows.append(n)
+                    questions.append(q)
+                    options.append(option)
+    selected = np.zeros((len(submissions), key.questions, key.options), dtype=bool)
+    selected[rows, questions, options] = True
+    return selected
+
+
+def grade(key: AnswerKey, selected: np.ndarray) -> np.ndarray:
+    """
+    Percentage score of each encoded submission
+    """
+    if key.questions == 0:
+        return np.zeros(len(selected))
+    correct = key.correct[None, :, :]
+    exact = (selected == correct).all(axis=2)
+    n_correct = np.maximum(key.correct.sum(axis=1), 1)
+    # Each question's own wrong options, whatever the widest question has
+    n_wrong = np.maximum(key.option_counts - key.correct.sum(axis=1), 1)
+    hits = (selected & correct).sum(axis=2)
+    misses = (selected & ~correct).sum(axis=2)
+    partial = np.clip(hits / n_correct - misses / n_wrong, 0.0, 1.0)
+    credit = np.where(key.partial[None, :], partial, exact.astype(float))
+    # Divide before scaling, as the original per-question loop did
+    return (credit @ key.weights) / key.weights.sum() * 100
+
+
+def grade_submission(key: AnswerKey, answers: Sequence[Any]) -> float:
+    return float(grade(key, encode_submissions(key, [answers]))[0])
+
+
+@dataclass
+class RegradeResult:
+    quiz_id: int
+    attempts_checked: int = 0
+    attempts_changed: int = 0
+    user_ids: Set[int] = field(default_factory=set)
+
+
+def regrade_quiz(db: Session, quiz_id: int, chunk_size: int = REGRADE_CHUNK_SIZE) -> RegradeResult:
+    """
+    Re-score all stored attempts of a quiz against its current answer key
+
+    Attempts are read in id order, `chunk_size` at a time. Each chunk's score
+    changes and daily-rollup corrections commit together; the affected
+    learners' topic aggregates and caches are refreshed after each chunk.
+    Mastery ratings, review schedules and leaderboard entries depend on the
+    history, so if any score changed they are rebuilt once at the end: the
+    topic's ratings, and the affected learners' schedules and entries on the
+    topic and course boards. Each rebuild holds the write lock from reading
+    the hot attempts to its commit; submissions made meanwhile wait for it.
+    """
+    from backend.derived import refresh_user_topic_stats
+    from backend.rollup import PASS_SCORE, apply_daily_deltas
+    from backend.versions import bump_user_version
+
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if quiz is None:
+        raise ValueError(f"Quiz {quiz_id} not found")
+    key = quiz_answer_key(quiz)
+    topic_id = quiz.topic_id
+    result = RegradeResult(quiz_id)
+
+    last_id = 0
+    while True:
+        rows = db.query(
+            QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.score,
+            QuizAttempt.answers_submitted, QuizAttempt.completed_at,
+        ).filter(QuizAttempt.quiz_id == quiz_id, QuizAttempt.id > last_id).order_by(
+            QuizAttempt.id
+        ).limit(chunk_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        result.attempts_checked += len(rows)
+
+        scores = grade(key, encode_submissions(key, [json.loads(r.answers_submitted) for r in rows]))
+        old_scores = np.array([r.score for r in rows], dtype=float)
+        changed = np.flatnonzero(np.abs(scores - old_scores) > SCORE_EPSILON)
+        if changed.size == 0:
+            continue
+
+        # (score delta, passed delta) per user and day of the attempt
+        deltas: Dict[Tuple[int, Any], list] = defaultdict(lambda: [0.0, 0])
+        for i in changed:
+            row, new_score = rows[i], float(scores[i])
+            delta = deltas[(row.user_id, row.completed_at.date())]
+            delta[0] += new_score - row.score
+            delta[1] += int(new_score >= PASS_SCORE) - int(row.score >= PASS_SCORE)
+        db.execute(update(QuizAttempt), [{"id": rows[i].id, "score": float(scores[i])} for i in changed])
+        apply_daily_deltas(db, {k: tuple(v) for k, v in deltas.items()})
+        db.commit()
+
+        chunk_users = {rows[i].user_id for i in changed}
+        for user_id in chunk_users:
+            refresh_user_topic_stats(db, user_id, [topic_id])
+            bump_user_version(user_id)
+        result.attempts_changed += len(changed)
+        result.user_ids |= chunk_users
+
+    if result.attempts_changed:
+        from backend.leaderboard import rebuild_topic_entries
+        from backend.ml.mastery import rebuild_ratings
+        from backend.ml.spaced_repetition import rebuild_schedule
+        rebuild_ratings(db, [topic_id])
+        rebuild_schedule(db, result.user_ids, [topic_id])
+        rebuild_topic_entries(db, topic_id, result.user_ids)
+    logger.info(
+        f"Re-graded quiz {quiz_id}: {result.attempts_changed} of {result.attempts_checked} attempts changed, "
+        f"{len(result.user_ids)} learners"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Re-grade all attempts of a quiz")
+    parser.add_argument("quiz_id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=REGRADE_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        regrade_quiz(session, args.quiz_id, args.chunk_size)
+    finally:
+        session.close()
@@ -0,0 +1,61 @@
+"""
+Conditional GET support: strong ETags for catalog endpoints
+"""
+import hashlib
+import os
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from backend.auth import get_bearer_token, get_token_subject
+from backend.versions import get_catalog_version
+
+# Browsers keep catalog responses but revalidate them with If-None-Match
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "private, no-cache")
+
+
+def catalog_etag(request: Request) -> str:
+    """
+    Strong ETag for a catalog resource: catalog version + request URL
+    """
+    key = f"{get_catalog_version()}|{request.url.path}?{request.url.query}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against an ETag (weak comparison)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def catalog_headers(etag: str) -> dict:
+    """
+    Validator and caching headers sent with every catalog response
+    """
+    return {
+        "ETag": etag,
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Authorization",
+    }
+
+
+def check_catalog_etag(request: Request, response: Response) -> str:
+    """
+    Dependency answering 304 Not Modified before any database access
+
+    Declare it in the route's `dependencies` so it runs ahead of
+    get_current_user. The token is still verified, but only by its
+    signature, which needs no query.
+    """
+    etag = catalog_etag(request)
+    headers = catalog_headers(etag)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        token = get_bearer_token(request.headers.get("authorization"))
+        if get_token_subject(token) is not None:
+            raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return etag
@@ -2,7 +2,7 @@
 Initialize database with sample courses and topics
 Run this script to populate initial data
 """
-from backend.database import SessionLocal, engine, Base
+from backend.database import SessionLocal, init_db
 from backend.models import Course, Topic, Quiz
 import json
 
@@ -10,7 +10,7 @@ def init_data():
     """
     Create sample courses, topics, and quizzes
     """
-    Base.metadata.create_all(bind=engine)
+    init_db()
     db = SessionLocal()
     
     try:
@@ -0,0 +1,429 @@
+"""
+Per-course and per-topic leaderboards, maintained incrementally
+
+`leaderboard_entries` holds each learner's best score per topic and, per
+course, the sum of their topic bests; ties rank by whoever reached the score
+first. submit_quiz updates the two affected rows (only when the attempt
+beats the learner's previous best), so no request ever sorts
+`quiz_attempts`.
+
+Each worker keeps an ordered in-memory copy of the boards it serves: a
+sorted list of (-score, achieved_at, user_id) keys plus the key per user.
+"My rank" is a binary search (O(log n)) and the top k is a slice (O(k)).
+Boards carry a version from backend.versions. A worker applies its own
+updates in place and reloads a board (one range scan of the rank index)
+when another worker changed it; every LEADERBOARD_RELOAD_INTERVAL seconds
+boards are reloaded anyway, which picks up offline rebuilds.
+
+    python -m backend.leaderboard rebuild   # recompute from attempts and archive
+    python -m backend.leaderboard verify    # check the table and ranks with window functions
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from backend.archive import iter_archived_attempts, parse_timestamp
+from backend.database import current_tenant, lock_for_write
+from backend.models import LeaderboardEntry, Quiz, QuizAttempt, Topic
+from backend.versions import bump_leaderboard_version, get_leaderboard_version
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_RELOAD_INTERVAL = float(os.getenv("LEADERBOARD_RELOAD_INTERVAL", "300"))
+LEADERBOARD_MAX_TOP = 100
+# Course totals are rounded so equal totals tie whatever the summation order
+TOTAL_DECIMALS = 6
+# Users per IN (...) list when rebuilding some users' entries
+REBUILD_CHUNK = 500
+
+TOPIC = "topic"
+COURSE = "course"
+
+
+@dataclass(frozen=True)
+class Standing:
+    rank: int
+    user_id: int
+    best_score: float
+    achieved_at: datetime
+
+
+def board_name(scope: str, scope_id: int) -> str:
+    return f"{scope}:{scope_id}"
+
+
+class Board:
+    """
+    One leaderboard in rank order
+    """
+
+    def __init__(self, version: int, entries: List[Tuple[int, float, datetime]] = ()):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._by_user: Dict[int, tuple] = {
+            user_id: (-score, achieved_at, user_id) for user_id, score, achieved_at in entries
+        }
+        self._keys: List[tuple] = sorted(self._by_user.values())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def set(self, user_id: int, score: float, achieved_at: datetime):
+        old = self._by_user.get(user_id)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, old)]
+        key = (-score, achieved_at, user_id)
+        insort(self._keys, key)
+        self._by_user[user_id] = key
+
+    def standing(self, user_id: int) -> Optional[Standing]:
+        key = self._by_user.get(user_id)
+        if key is None:
+            return None
+        return Standing(bisect_left(self._keys, key) + 1, user_id, -key[0], key[1])
+
+    def top(self, k: int) -> List[Standing]:
+        return [
+            Standing(rank, user_id, -negative_score, achieved_at)
+            for rank, (negative_score, achieved_at, user_id) in enumerate(self._keys[:k], start=1)
+        ]
+
+
+def _load_board(db: Session, scope: str, scope_id: int, version: int) -> Board:
+    rows = db.query(
+        LeaderboardEntry.user_id, LeaderboardEntry.best_score, LeaderboardEntry.achieved_at
+    ).filter(LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id).order_by(
+        LeaderboardEntry.best_score.desc(), LeaderboardEntry.achieved_at, LeaderboardEntry.user_id
+    ).all()
+    return Board(version, rows)
+
+
+class Leaderboards:
+    """
+    This worker's in-memory boards, kept in step with the table
+    """
+
+    def __init__(self, reload_interval: float = LEADERBOARD_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        # Keyed by (tenant, scope, scope_id)
+        self._boards: Dict[Tuple[str, str, int], Board] = {}
+        self._lock = threading.Lock()
+
+    def _current(self, db: Session, scope: str, scope_id: int) -> Board:
+        # Called with the lock held
+        key = (current_tenant.get(), scope, scope_id)
+        version = get_leaderboard_version(board_name(scope, scope_id))
+        board = self._boards.get(key)
+        if (board is None or board.version != version
+                or time.monotonic() - board.loaded_at > self.reload_interval):
+            # The version is read before loading: a concurrent change makes
+            # the loaded board stale again rather than silently lost
+            board = _load_board(db, scope, scope_id, version)
+            self._boards[key] = board
+        return board
+
+    def view(self, db: Session, scope: str, scope_id: int, user_id: int,
+             limit: int) -> Tuple[int, List[Standing], Optional[Standing]]:
+        """
+        (entries, top `limit`, the user's standing) of one board
+        """
+        with self._lock:
+            board = self._current(db, scope, scope_id)
+            return len(board), board.top(limit), board.standing(user_id)
+
+    def board(self, db: Session, scope: str, scope_id: int) -> Board:
+        with self._lock:
+            return self._current(db, scope, scope_id)
+
+    def apply(self, scope: str, scope_id: int, user_id: int, score: float, achieved_at: datetime):
+        """
+        Record a committed change; applied in place if this board is current
+        """
+        with self._lock:
+            key = (current_tenant.get(), scope, scope_id)
+            version = bump_leaderboard_version(board_name(scope, scope_id))
+            board = self._boards.get(key)
+            if board is None:
+                return
+            if board.version == version - 1:
+                board.set(user_id, score, achieved_at)
+                board.version = version
+            else:
+                # Another worker changed it in between; reload on next read
+                del self._boards[key]
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+
+leaderboards = Leaderboards()
+
+
+def _entry(db: Session, user_id: int, scope: str, scope_id: int) -> Optional[LeaderboardEntry]:
+    return db.query(LeaderboardEntry).filter(
+        LeaderboardEntry.user_id == user_id, LeaderboardEntry.scope == scope, LeaderboardEntry.scope_id == scope_id
+    ).first()
+
+
+def _apply_score(db: Session, user_id: int, topic_id: int, course_id: int,
+                 score: float, completed_at: datetime) -> Optional[Tuple[float, datetime]]:
+    """
+    Update the topic and course rows; the new course total, or None if no new best
+    """
+    row = _entry(db, user_id, TOPIC, topic_id)
+    if row is None:
+        db.add(LeaderboardEntry(
+            scope=TOPIC, scope_id=topic_id, user_id=user_id, best_score=score, achieved_at=completed_at
+        ))
+        db.flush()
+    else:
+        # Conditional, so a concurrent higher score is never overwritten
+        improved = db.query(LeaderboardEntry).filter(
+            LeaderboardEntry.id == row.id, LeaderboardEntry.best_score < score
+        ).update({"best_score": score, "achieved_at": completed_at}, synchronize_session=False)
+        if not improved:
+            return None
+
+    # The course total is re-summed from the topic rows, so it cannot drift
+    total, reached_at = db.query(
+        func.sum(LeaderboardEntry.best_score), func.max(LeaderboardEntry.achieved_at)
+    ).filter(
+        LeaderboardEntry.user_id == user_id, LeaderboardEntry.scope == TOPIC,
+        LeaderboardEntry.scope_id.in_(select(Topic.id).where(Topic.course_id == course_id)),
+    ).one()
+    total = round(total, TOTAL_DECIMALS)
+    course = _entry(db, user_id, COURSE, course_id)
+    if course is None:
+        db.add(LeaderboardEntry(
+            scope=COURSE, scope_id=course_id, user_id=user_id, best_score=total, achieved_at=reached_at
+        ))
+    else:
+        course.best_score = total
+        course.achieved_at = reached_at
+    return total, reached_at
+
+
+def record_score(db: Session, user_id: int, topic_id: int, course_id: int, score: float,
+                 completed_at: Optional[datetime]) -> Optional[Tuple[float, datetime]]:
+    """
+    Fold a quiz attempt into the topic and course leaderboard rows
+
+    Flushes without committing, so the rows land with the attempt. Returns
+    the new course total (None if the attempt is no new best); pass it to
+    publish_score once the transaction has committed.
+    """
+    course_total = _apply_score(db, user_id, topic_id, course_id, score, completed_at or datetime.utcnow())
+    db.flush()
+    return course_total
+
+
+def publish_score(user_id: int, topic_id: int, course_id: int, score: float,
+                  completed_at: datetime, course_total: Optional[Tuple[float, datetime]]):
+    """
+    Apply a committed record_score to this worker's boards
+    """
+    if course_total is None:
+        return
+    leaderboards.apply(TOPIC, topic_id, user_id, score, completed_at)
+    leaderboards.apply(COURSE, course_id, user_id, *course_total)
+
+
+def compute_entries(db: Session) -> Dict[Tuple[str, int, int], Tuple[float, datetime]]:
+    """
+    Every leaderboard entry recomputed from the attempts, archive included
+    """
+    best: Dict[Tuple[int, int], Tuple[float, datetime]] = {}
+    # Archived attempts come oldest first and are all older than hot ones:
+    # on equal scores the first one reached is kept
+    for a in iter_archived_attempts(["user_id", "topic_id", "score"]):
+        key = (a["user_id"], a["topic_id"])
+        if key not in best or a["score"] > best[key][0]:
+            best[key] = (a["score"], parse_timestamp(a["completed_at"]))
+
+    position = func.row_number().over(
+        partition_by=(QuizAttempt.user_id, Quiz.topic_id),
+        order_by=(QuizAttempt.score.desc(), QuizAttempt.completed_at, QuizAttempt.id),
+    ).label("position")
+    ranked = db.query(
+        QuizAttempt.user_id, Quiz.topic_id, QuizAttempt.score, QuizAttempt.completed_at, position
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).subquery()
+    for user_id, topic_id, score, completed_at, _ in db.query(ranked).filter(ranked.c.position == 1).all():
+        key = (user_id, topic_id)
+        if key not in best or score > best[key][0]:
+            best[key] = (score, completed_at)
+
+    course_of = dict(db.query(Topic.id, Topic.course_id).all())
+    entries: Dict[Tuple[str, int, int], Tuple[float, datetime]] = {}
+    for (user_id, topic_id), (score, achieved_at) in best.items():
+        if topic_id not in course_of:
+            continue
+        entries[(TOPIC, topic_id, user_id)] = (score, achieved_at)
+        course_key = (COURSE, course_of[topic_id], user_id)
+        total, reached_at = entries.get(course_key, (0.0, achieved_at))
+        entries[course_key] = (total + score, max(reached_at, achieved_at))
+    for key, (total, reached_at) in entries.items():
+        if key[0] == COURSE:
+            entries[key] = (round(total, TOTAL_DECIMALS), reached_at)
+    return entries
+
+
+def rebuild_leaderboards(db: Session) -> int:
+    """
+    Replace the table with entries recomputed from the attempts
+    """
+    entries = compute_entries(db)
+    boards = set(db.query(LeaderboardEntry.scope, LeaderboardEntry.scope_id).distinct().all())
+    boards |= {(scope, scope_id) for scope, scope_id, _ in entries}
+    db.query(LeaderboardEntry).delete(synchronize_session=False)
+    db.add_all(
+        LeaderboardEntry(scope=scope, scope_id=scope_id, user_id=user_id, best_score=score, achieved_at=achieved_at)
+        for (scope, scope_id, user_id), (score, achieved_at) in sorted(entries.items())
+    )
+    db.commit()
+    # Workers sharing the version map reload on their next read
+    for scope, scope_id in boards:
+        bump_leaderboard_version(board_name(scope, scope_id))
+    leaderboards.clear()
+    return len(entries)
+
+
+def rebuild_topic_entries(db: Session, topic_id: int, user_ids: Iterable[int]) -> int:
+    """
+    Recompute some learners' entries on one topic board and its course board
+
+    For after a re-grade, which only changes that topic's scores: the
+    learners' topic bests are recomputed from the topic's attempts and their
+    course totals re-summed from the topic rows. The write lock is held
+    from reading the hot attempts to the commit, so scores submitted
+    meanwhile wait instead of being overwritten.
+    """
+    user_ids = set(user_ids)
+    course_id = db.query(Topic.course_id).filter(Topic.id == topic_id).scalar()
+    if course_id is None or not user_ids:
+        return 0
+    # Oldest first (archive, then hot rows): on equal scores the first one reached is kept
+    best: Dict[int, Tuple[float, datetime]] = {}
+    for a in iter_archived_attempts(["user_id", "topic_id", "score"], [topic_id]):
+        if a["user_id"] in user_ids and (a["user_id"] not in best or a["score"] > best[a["user_id"]][0]):
+            best[a["user_id"]] = (a["score"], parse_timestamp(a["completed_at"]))
+    lock_for_write(db)
+    for user_id, score, completed_at in db.query(
+        QuizAttempt.user_id, QuizAttempt.score, QuizAttempt.completed_at
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(Quiz.topic_id == topic_id).order_by(
+        QuizAttempt.completed_at, QuizAttempt.id
+    ).yield_per(1000):
+        if user_id in user_ids and (user_id not in best or score > best[user_id][0]):
+            best[user_id] = (score, completed_at)
+
+    ordered = sorted(user_ids)
+    chunks = [ordered[start:start + REBUILD_CHUNK] for start in range(0, len(ordered), REBUILD_CHUNK)]
+    for chunk in chunks:
+        db.query(LeaderboardEntry).filter(
+            LeaderboardEntry.scope == TOPIC, LeaderboardEntry.scope_id == topic_id,
+            LeaderboardEntry.user_id.in_(chunk),
+        ).delete(synchronize_session=False)
+    db.add_all(
+        LeaderboardEntry(scope=TOPIC, scope_id=topic_id, user_id=user_id, best_score=score, achieved_at=achieved_at)
+        for user_id, (score, achieved_at) in sorted(best.items())
+    )
+    db.flush()
+
+    # Course totals are re-summed from the topic rows, as in _apply_score
+    course_topics = select(Topic.id).where(Topic.course_id == course_id)
+    for chunk in chunks:
+        totals = db.query(
+            LeaderboardEntry.user_id, func.sum(LeaderboardEntry.best_score), func.max(LeaderboardEntry.achieved_at)
+        ).filter(
+            LeaderboardEntry.scope == TOPIC, LeaderboardEntry.scope_id.in_(course_topics),
+            LeaderboardEntry.user_id.in_(chunk),
+        ).group_by(LeaderboardEntry.user_id).all()
+        db.query(LeaderboardEntry).filter(
+            LeaderboardEntry.scope == COURSE, LeaderboardEntry.scope_id == course_id,
+            LeaderboardEntry.user_id.in_(chunk),
+        ).delete(synchronize_session=False)
+        db.add_all(
+            LeaderboardEntry(
+                scope=COURSE, scope_id=course_id, user_id=user_id,
+                best_score=round(total, TOTAL_DECIMALS), achieved_at=reached_at,
+            )
+            for user_id, total, reached_at in totals
+        )
+    db.commit()
+    # Workers sharing the version map reload these boards on their next read
+    bump_leaderboard_version(board_name(TOPIC, topic_id))
+    bump_leaderboard_version(board_name(COURSE, course_id))
+    return len(best)
+
+
+def verify_leaderboards(db: Session, tolerance: float = 1e-6) -> List[str]:
+    """
+    Problems found in the table and this worker's in-memory ranks
+
+    Table rows are compared with a recomputation from the attempts (a
+    ROW_NUMBER window per user and topic), and ranks with a ROW_NUMBER
+    window over each board.
+    """
+    problems = []
+    expected = compute_entries(db)
+    stored = {
+        (scope, scope_id, user_id): (score, achieved_at)
+        for scope, scope_id, user_id, score, achieved_at in db.query(
+            LeaderboardEntry.scope, LeaderboardEntry.scope_id, LeaderboardEntry.user_id,
+            LeaderboardEntry.best_score, LeaderboardEntry.achieved_at,
+        ).all()
+    }
+    for key in sorted(expected.keys() | stored.keys()):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None:
+            problems.append(f"{board_name(*key[:2])} user {key[2]}: expected {want}, stored {have}")
+        elif abs(want[0] - have[0]) > tolerance or want[1] != have[1]:
+            problems.append(f"{board_name(*key[:2])} user {key[2]}: expected {want}, stored {have}")
+
+    rank = func.row_number().over(
+        partition_by=(LeaderboardEntry.scope, LeaderboardEntry.scope_id),
+        order_by=(LeaderboardEntry.best_score.desc(), LeaderboardEntry.achieved_at, LeaderboardEntry.user_id),
+    )
+    boards: Dict[Tuple[str, int], Board] = {}
+    for scope, scope_id, user_id, sql_rank in db.query(
+        LeaderboardEntry.scope, LeaderboardEntry.scope_id, LeaderboardEntry.user_id, rank
+    ).all():
+        if (scope, scope_id) not in boards:
+            boards[(scope, scope_id)] = leaderboards.board(db, scope, scope_id)
+        standing = boards[(scope, scope_id)].standing(user_id)
+        if standing is None or standing.rank != sql_rank:
+            problems.append(
+                f"{board_name(scope, scope_id)} user {user_id}: rank {sql_rank} in SQL, "
+                f"{standing.rank if standing else None} in memory"
+            )
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify the leaderboards")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            logger.info(f"Rebuilt {rebuild_leaderboards(session)} leaderboard entries")
+        else:
+            problems = verify_leaderboards(session)
+            for problem in problems:
+                logger.warning(problem)
+            logger.info(f"Leaderboards checked: {len(problems)} problems")
+            raise SystemExit(1 if problems else 0)
+    finally:
+        session.close()
@@ -0,0 +1,218 @@
+"""
+Live dashboard updates over Server-Sent Events
+
+The event pipeline publishes dashboard deltas here after a user's writes
+are processed; every open stream of that user receives them. Each
+connection is a coroutine with a small queue (no threads), so one worker
+can hold thousands of idle streams. Recent events are kept per user so a
+reconnecting EventSource resumes from its Last-Event-ID. A user's history is
+dropped once they have no open stream and no event for SSE_HISTORY_TTL
+seconds; resuming from a dropped history gets a "reset" instead.
+
+With several worker processes a write may be processed by a worker that
+doesn't hold the user's stream. Streams therefore also watch the shared
+user data version and send a "reset" (full reload) when it moves without
+a delta arriving locally.
+
+Streams are keyed by (tenant, user id): user ids repeat across tenants.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+from backend.database import current_tenant
+from backend.versions import get_user_version
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", "50"))
+# How often an idle stream checks for writes handled by other workers
+SSE_VERSION_POLL_SECONDS = float(os.getenv("SSE_VERSION_POLL_SECONDS", "2"))
+SSE_CLIENT_QUEUE = 100
+# Seconds a user's replay history outlives their last event and stream
+SSE_HISTORY_TTL = float(os.getenv("SSE_HISTORY_TTL", "600"))
+
+# Event ids are "<boot>-<seq>"; ids from another boot cannot be resumed
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+# (tenant, user id)
+StreamKey = Tuple[str, int]
+
+
+def format_sse(data: dict, event: Optional[str] = None, event_id: Optional[str] = None) -> bytes:
+    """
+    Encode one Server-Sent Event
+    """
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class LiveBroker:
+    """
+    Per-user fan-out of events to open SSE connections
+    """
+
+    def __init__(self, replay: int = SSE_REPLAY_BUFFER, history_ttl: float = SSE_HISTORY_TTL):
+        self.replay = replay
+        self.history_ttl = history_ttl
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Dict[StreamKey, Set[asyncio.Queue]] = {}
+        self._history: Dict[StreamKey, Deque[Tuple[int, bytes]]] = {}
+        self._evicted: Dict[StreamKey, int] = {}  # Last sequence dropped from each user's history
+        # Monotonic time of each history's last event, least recent first
+        self._touched: "OrderedDict[StreamKey, float]" = OrderedDict()
+        self._pruned_seq = 0  # Newest sequence of any dropped history
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """
+        Remember the event loop that owns the connections
+        """
+        self._loop = loop
+
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, user_id: int, event: str, data: dict):
+        """
+        Send an event to a user's streams; safe to call from any thread
+        """
+        key = (current_tenant.get(), user_id)
+        with self._lock:
+            self._seq += 1
+            event_id = f"{_BOOT_ID}-{self._seq}"
+            message = format_sse(data, event=event, event_id=event_id)
+            if key not in self._history:
+                self._history[key] = deque(maxlen=self.replay)
+                # Events of an earlier, dropped history of this key can't be replayed
+                self._evicted[key] = self._pruned_seq
+            history = self._history[key]
+            if len(history) == history.maxlen:
+                self._evicted[key] = history[0][0]
+            item = (self._seq, message)
+            history.append(item)
+            now = time.monotonic()
+            self._touched[key] = now
+            self._touched.move_to_end(key)
+            self._prune(now)
+
+        if self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(key, item)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, key, item)
+
+    def _prune(self, now: float):
+        """
+        Drop histories idle for history_ttl; called with the lock held
+        """
+        while self._touched:
+            key, touched = next(iter(self._touched.items()))
+            if now - touched < self.history_ttl:
+                return
+            if self._subscribers.get(key):
+                # Still streaming: keep it for another period
+                self._touched[key] = now
+                self._touched.move_to_end(key)
+                continue
+            del self._touched[key]
+            history = self._history.pop(key)
+            self._evicted.pop(key, None)
+            if history:
+                self._pruned_seq = max(self._pruned_seq, history[-1][0])
+
+    def _deliver(self, key: StreamKey, item: Tuple[int, bytes]):
+        for queue in list(self._subscribers.get(key, ())):
+            if queue.full():
+                # Slow client: drop its oldest pending message
+                queue.get_nowait()
+            queue.put_nowait(item)
+
+    def _missed_since(self, key: StreamKey, last_event_id: Optional[str]):
+        """
+        Buffered (seq, message) pairs after last_event_id, or None if it
+        can't be resumed
+        """
+        if not last_event_id:
+            return []
+        boot, _, seq = last_event_id.partition("-")
+        if boot != _BOOT_ID or not seq.isdigit():
+            return None
+        with self._lock:
+            history = list(self._history.get(key, ()))
+            # A key without history may have had one that was dropped
+            evicted = self._evicted.get(key, self._pruned_seq)
+        if int(seq) < evicted:
+            return None  # Fell out of the replay buffer
+        return [item for item in history if item[0] > int(seq)]
+
+    async def stream(self, user_id: int, last_event_id: Optional[str] = None,
+                     heartbeat: float = SSE_HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+        """
+        Async generator of SSE bytes for one connection
+        """
+        if self._loop is None:
+            self.bind(asyncio.get_running_loop())
+        key = (current_tenant.get(), user_id)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_CLIENT_QUEUE)
+        self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield b"retry: 3000\n\n"
+            last_seq = 0
+            missed = self._missed_since(key, last_event_id)
+            if missed is None:
+                # Can't resume: tell the client to reload the full dashboard
+                yield format_sse({"reason": "resume-unavailable"}, event="reset")
+            else:
+                for last_seq, message in missed:
+                    yield message
+            seen_version = get_user_version(user_id)
+            poll = min(heartbeat, SSE_VERSION_POLL_SECONDS)
+            idle = 0.0
+            while True:
+                try:
+                    seq, message = await asyncio.wait_for(queue.get(), timeout=poll)
+                except asyncio.TimeoutError:
+                    version = get_user_version(user_id)
+                    if version != seen_version:
+                        # Written through another worker; its delta went to that worker's streams
+                        seen_version = version
+                        idle = 0.0
+                        yield format_sse({"reason": "updated"}, event="reset")
+                        continue
+                    idle += poll
+                    if idle >= heartbeat:
+                        idle = 0.0
+                        yield b": heartbeat\n\n"
+                    continue
+                idle = 0.0
+                seen_version = get_user_version(user_id)
+                if seq > last_seq:  # Skip what the replay already sent
+                    last_seq = seq
+                    yield message
+        finally:
+            queues = self._subscribers.get(key)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    self._subscribers.pop(key, None)
+
+
+live_broker = LiveBroker()
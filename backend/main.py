@@ -1,24 +1,68 @@
 """
 Main FastAPI application entry point
 """
+import asyncio
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.database import engine, Base
-from backend.routers import auth, courses, quizzes, performance, recommendations, analytics
+from backend.admission import ADMISSION_ENABLED, AdmissionMiddleware, admission
+from backend.auth import get_current_admin
+from backend.cache import user_results
+from backend.catalog import catalog_cache
+from backend.database import TENANTS, get_engine, init_all_tenants
+from backend.derived import register_handlers
+from backend.events import event_bus
+from backend.live import live_broker
+from backend.routers import auth, courses, quizzes, performance, recommendations, analytics, home, admin, search
+from backend.profiling import ProfilingMiddleware, PROFILE_DIR
+from backend.responses import FastJSONResponse
+from backend.tenancy import TenantMiddleware
+from backend.query_debug import (
+    QUERY_DEBUG, QUERY_REPEAT_THRESHOLD, QueryDebugMiddleware, install_query_listener
+)
+from backend.warmup import WARMUP_ON_STARTUP, start_background_warmup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Error creating database tables: {e}")
+# Background consumers maintaining derived data after writes
+register_handlers(event_bus)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup/shutdown: create the schema, then optionally warm up in the background
+    """
+    try:
+        init_all_tenants()
+        logger.info(f"Database tables created successfully ({len(TENANTS)} tenants)")
+    except Exception as e:
+        logger.error(f"Error creating database tables: {e}")
+
+    await event_bus.start()
+    live_broker.bind(asyncio.get_running_loop())
+
+    if WARMUP_ON_STARTUP:
+        start_background_warmup()
+
+    yield
+
+    # Let queued derived-data updates finish before exiting
+    await event_bus.drain()
 
-app = FastAPI(title="AI-Based Personalized Learning Platform", version="1.0.0")
+app = FastAPI(
+    title="AI-Based Personalized Learning Platform",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+
+# Load shedding for expensive endpoints; added first so that CORS headers
+# still reach the browser on 429/503 responses
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission)
 
 # CORS middleware for frontend communication
 app.add_middleware(
@@ -27,8 +71,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+# Opt-in per-request profiling (X-Profile header from an admin, or sampling)
+app.add_middleware(ProfilingMiddleware, directory=PROFILE_DIR)
+
+# Dev/test mode: count queries per request and flag N+1 patterns
+if QUERY_DEBUG in ("warn", "raise"):
+    for tenant in TENANTS:
+        install_query_listener(get_engine(tenant))
+    app.add_middleware(QueryDebugMiddleware, threshold=QUERY_REPEAT_THRESHOLD, mode=QUERY_DEBUG)
+
+# Selects each request's tenant database; added last so it runs outermost and
+# every other middleware already sees the tenant
+app.add_middleware(TenantMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
 app.include_router(courses.router, prefix="/api/courses", tags=["courses"])
@@ -36,7 +94,22 @@ app.include_router(quizzes.router, prefix="/api/quizzes", tags=["quizzes"])
 app.include_router(performance.router, prefix="/api/performance", tags=["performance"])
 app.include_router(recommendations.router, prefix="/api/recommendations", tags=["recommendations"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(home.router, prefix="/api/home", tags=["home"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
 
 @app.get("/")
 def root():
     return {"message": "AI-Based Personalized Learning Platform API"}
+
+@app.get("/api/metrics")
+def metrics(current_user=Depends(get_current_admin)):
+    """
+    Operational state of this worker: admission lanes, event pipeline, caches
+    """
+    return {
+        "admission": admission.stats(),
+        "events": {**event_bus.stats, "queue_depth": event_bus.queue_depth()},
+        "caches": {"ml": user_results.stats(), "catalog": catalog_cache.stats()},
+        "live_connections": live_broker.connection_count(),
+    }
@@ -3,7 +3,7 @@ Adaptive learning path using rule-based logic
 """
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from backend.models import User, Topic, QuizAttempt, Course
+from backend.snapshot import UserSnapshot, load_user_snapshot
 
 def get_adaptive_recommendations(user_id: int, db: Session) -> List[Dict]:
     """
@@ -12,38 +12,39 @@ def get_adaptive_recommendations(user_id: int, db: Session) -> List[Dict]:
     - High score (>= 80) → recommend next difficulty level
     - Failed twice → recommend revision
     """
-    # Get all quiz attempts for user
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).all()
+    return get_adaptive_recommendations_for_snapshot(load_user_snapshot(db, user_id))
+
+def get_adaptive_recommendations_for_snapshot(snapshot: UserSnapshot) -> List[Dict]:
+    """
+    Adaptive learning path from a preloaded user snapshot
+    """
+    topics = snapshot.topics_by_id()
     
     # Group attempts by topic
     topic_performance = {}
-    for attempt in attempts:
-        quiz = attempt.quiz
-        topic_id = quiz.topic_id
-        
-        if topic_id not in topic_performance:
-            topic_performance[topic_id] = {
-                "scores": [],
-                "attempts": 0,
-                "topic": quiz.topic
-            }
-        
-        topic_performance[topic_id]["scores"].append(attempt.score)
-        topic_performance[topic_id]["attempts"] += 1
+    for topic_id, totals in snapshot.topic_totals().items():
+        if topic_id not in topics:
+            continue  # Outside the user's curriculum
+        topic_performance[topic_id] = {
+            "totals": totals,
+            "attempts": totals.attempts_count,
+            "topic": topics[topic_id]
+        }
     
     recommendations = []
     
     # Rule 1: Low score → recommend easier content
     for topic_id, data in topic_performance.items():
         topic = data["topic"]
-        avg_score = sum(data["scores"]) / len(data["scores"]) if data["scores"] else 0
+        avg_score = data["totals"].average
         
         if avg_score < 60:
             # Find easier topics in same course
-            course_topics = db.query(Topic).filter(
-                Topic.course_id == topic.course_id,
-                Topic.order_index < topic.order_index
-            ).order_by(Topic.order_index.desc()).limit(2).all()
+            course_topics = sorted(
+                (t for t in snapshot.topics
+                 if t.course_id == topic.course_id and t.order_index < topic.order_index),
+                key=lambda t: t.order_index, reverse=True
+            )[:2]
             
             for easier_topic in course_topics:
                 recommendations.append({
@@ -57,14 +58,15 @@ def get_adaptive_recommendations(user_id: int, db: Session) -> List[Dict]:
     # Rule 2: High score → recommend next difficulty level
     for topic_id, data in topic_performance.items():
         topic = data["topic"]
-        avg_score = sum(data["scores"]) / len(data["scores"]) if data["scores"] else 0
+        avg_score = data["totals"].average
         
         if avg_score >= 80:
             # Find next topics in same course
-            next_topics = db.query(Topic).filter(
-                Topic.course_id == topic.course_id,
-                Topic.order_index > topic.order_index
-            ).order_by(Topic.order_index).limit(2).all()
+            next_topics = sorted(
+                (t for t in snapshot.topics
+                 if t.course_id == topic.course_id and t.order_index > topic.order_index),
+                key=lambda t: t.order_index
+            )[:2]
             
             for next_topic in next_topics:
                 recommendations.append({
@@ -80,10 +82,10 @@ def get_adaptive_recommendations(user_id: int, db: Session) -> List[Dict]:
             next_difficulty = difficulty_order.get(topic.difficulty_level)
             
             if next_difficulty:
-                advanced_topics = db.query(Topic).filter(
-                    Topic.difficulty_level == next_difficulty,
-                    Topic.course_id == topic.course_id
-                ).limit(1).all()
+                advanced_topics = [
+                    t for t in snapshot.topics
+                    if t.difficulty_level == next_difficulty and t.course_id == topic.course_id
+                ][:1]
                 
                 for adv_topic in advanced_topics:
                     recommendations.append({
@@ -97,7 +99,7 @@ def get_adaptive_recommendations(user_id: int, db: Session) -> List[Dict]:
     # Rule 3: Failed twice → recommend revision
     for topic_id, data in topic_performance.items():
         topic = data["topic"]
-        failed_attempts = sum(1 for score in data["scores"] if score < 60)
+        failed_attempts = data["totals"].failed_count
         
         if failed_attempts >= 2:
             recommendations.append({
@@ -0,0 +1,322 @@
+"""
+Batch scoring: recommendations and knowledge gaps for many learners at once
+
+The per-user views load one snapshot and loop over topics in Python. For a
+whole section that would mean one snapshot per student. Here the data of a
+chunk of users is loaded with a few set-based queries into dense
+(users x topics) matrices, and both models are evaluated as array
+operations over all users of the chunk:
+
+- recommendations: the cosine similarity of each user's preference vector
+  to every topic's features, one matrix product.
+- knowledge gaps: one L2-regularised logistic regression per user, all fit
+  together by batched Newton steps. They converge to the same optimum as
+  scikit-learn's lbfgs solver (which stops at its 1e-4 tolerance), so risk
+  scores agree to about that precision.
+
+The outputs have the same shape and order as recommend_topics and
+detect_knowledge_gaps. BatchData is plain arrays, so what-if analyses can
+edit a loaded batch (scores, time spent, scope) before scoring it.
+"""
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import func, literal, union_all
+from sqlalchemy.orm import Session
+from backend.models import ArchivedTopicStats, Enrollment, Performance, Quiz, QuizAttempt, Topic
+from backend.snapshot import TopicInfo
+
+logger = logging.getLogger(__name__)
+
+# Users scored per chunk; bounds the (users x topics) matrices held at once
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "500"))
+
+DIFFICULTY_VALUES = {"Beginner": 1.0, "Intermediate": 2.0, "Advanced": 3.0}
+NEW_TOPIC_REASON = "New topic based on your learning pattern"
+WEAK_TOPIC_REASON = "Weak area - needs revision"
+CONTINUE_REASON = "Continue learning path"
+
+# Newton solver for the per-user logistic regressions (C=1, as in sklearn)
+NEWTON_MAX_ITER = 50
+NEWTON_TOLERANCE = 1e-10
+
+
+@dataclass
+class BatchData:
+    user_ids: np.ndarray  # (users,)
+    topics: Tuple[TopicInfo, ...]  # By id: those in scope or attempted for some user of the batch
+    in_scope: np.ndarray  # (users, topics) bool: topic is in the user's curriculum
+    attempts: np.ndarray  # (users, topics) attempt counts, archive included
+    score_sum: np.ndarray  # (users, topics)
+    time_spent: np.ndarray  # (users, topics) minutes
+    first_attempt: np.ndarray  # (users, topics) rank of the first attempt, inf if none
+
+    @property
+    def attempted(self) -> np.ndarray:
+        return self.attempts > 0
+
+    def averages(self) -> np.ndarray:
+        """
+        Average score per user and topic (0 where not attempted)
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.attempted, self.score_sum / self.attempts, 0.0)
+
+
+def load_batch(db: Session, user_ids: Sequence[int]) -> BatchData:
+    """
+    Load the scoring inputs of many users with one query per kind of data
+
+    The matrices only have columns for topics some user of the batch has in
+    scope or attempted; no score depends on the other topics.
+    """
+    user_ids = np.asarray(sorted(set(user_ids)), dtype=np.int64)
+    row_of = {int(uid): i for i, uid in enumerate(user_ids)}
+    ids = user_ids.tolist()
+
+    # Scope: topics of enrolled courses, or the whole catalog without enrollments
+    enrolled: Dict[int, set] = {}
+    for user_id, course_id in db.query(Enrollment.user_id, Enrollment.course_id).filter(
+        Enrollment.user_id.in_(ids)
+    ).all():
+        enrolled.setdefault(user_id, set()).add(course_id)
+
+    # Archived and hot totals in one statement. Archived attempts are all
+    # older than hot ones, so they order first (source 0), by their first
+    # attempt; hot topics follow by their first attempt
+    hot = db.query(
+        QuizAttempt.user_id.label("user_id"), Quiz.topic_id.label("topic_id"),
+        func.count(QuizAttempt.id).label("attempts"), func.sum(QuizAttempt.score).label("score_sum"),
+        literal(1).label("source"), func.min(QuizAttempt.completed_at).label("first_at"),
+        func.min(QuizAttempt.id).label("first_id"),
+    ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(
+        QuizAttempt.user_id.in_(ids)
+    ).group_by(QuizAttempt.user_id, Quiz.topic_id)
+    archived = db.query(
+        ArchivedTopicStats.user_id.label("user_id"), ArchivedTopicStats.topic_id.label("topic_id"),
+        ArchivedTopicStats.attempts_count.label("attempts"), ArchivedTopicStats.score_sum.label("score_sum"),
+        literal(0).label("source"), ArchivedTopicStats.first_attempt_at.label("first_at"),
+        ArchivedTopicStats.topic_id.label("first_id"),
+    ).filter(ArchivedTopicStats.user_id.in_(ids))
+    totals = union_all(archived.statement, hot.statement).subquery()
+    rows = db.execute(
+        totals.select().order_by(totals.c.user_id, totals.c.source, totals.c.first_at, totals.c.first_id)
+    ).all()
+
+    topics = tuple(
+        TopicInfo(*row) for row in db.query(
+            Topic.id, Topic.course_id, Topic.title, Topic.difficulty_level, Topic.order_index
+        ).order_by(Topic.id).all()
+    )
+    if len(enrolled) == len(ids):
+        # Everyone is enrolled: only their courses' topics and what they attempted
+        courses = set().union(*enrolled.values())
+        attempted_ids = {row.topic_id for row in rows}
+        topics = tuple(t for t in topics if t.course_id in courses or t.id in attempted_ids)
+    shape = (len(user_ids), len(topics))
+    col_of = {t.id: j for j, t in enumerate(topics)}
+
+    in_scope = np.ones(shape, dtype=bool)
+    topic_courses = np.array([t.course_id for t in topics], dtype=np.int64)
+    for user_id, course_ids in enrolled.items():
+        in_scope[row_of[user_id]] = np.isin(topic_courses, list(course_ids))
+
+    attempts = np.zeros(shape)
+    score_sum = np.zeros(shape)
+    first_attempt = np.full(shape, np.inf)
+    for rank, (user_id, topic_id, count, total, _source, _first_at, _first_id) in enumerate(rows):
+        j = col_of.get(topic_id)
+        if j is None:
+            continue
+        i = row_of[user_id]
+        attempts[i, j] += count
+        score_sum[i, j] += total or 0.0
+        first_attempt[i, j] = min(first_attempt[i, j], rank)
+
+    time_spent = np.zeros(shape)
+    for user_id, topic_id, minutes in db.query(
+        Performance.user_id, Performance.topic_id, Performance.time_spent_minutes
+    ).filter(Performance.user_id.in_(ids)).all():
+        if topic_id in col_of:
+            time_spent[row_of[user_id], col_of[topic_id]] = minutes or 0.0
+
+    return BatchData(
+        user_ids=user_ids, topics=topics, in_scope=in_scope, attempts=attempts,
+        score_sum=score_sum, time_spent=time_spent, first_attempt=first_attempt,
+    )
+
+
+def _topic_entry(topic: TopicInfo) -> dict:
+    return {"topic_id": topic.id, "topic_title": topic.title, "difficulty_level": topic.difficulty_level}
+
+
+def recommend_batch(data: BatchData, limit: int = 5) -> List[List[dict]]:
+    """
+    recommend_topics for every user of the batch
+    """
+    if not data.topics:
+        return [[] for _ in data.user_ids]
+    attempted = data.attempted
+    averages = data.averages()
+    has_history = attempted.any(axis=1)
+
+    # Preference [mean of the user's topic averages / 100, 0.5] against
+    # topic features [difficulty, order_index / 10], both L2-normalised
+    counts = np.maximum(attempted.sum(axis=1), 1)
+    preference = np.column_stack([averages.sum(axis=1) / counts / 100.0, np.full(len(counts), 0.5)])
+    features = np.array([
+        [DIFFICULTY_VALUES.get(t.difficulty_level, 1.0), t.order_index / 10.0] for t in data.topics
+    ])
+    preference /= np.linalg.norm(preference, axis=1, keepdims=True)
+    features /= np.linalg.norm(features, axis=1, keepdims=True)
+    similarity = preference @ features.T
+
+    # Learners without history get beginner topics first
+    beginner = np.array([1.0 if t.difficulty_level == "Beginner" else 0.5 for t in data.topics])
+    similarity = np.where(has_history[:, None], similarity, beginner[None, :])
+
+    eligible = data.in_scope & ~(attempted & (averages >= 80))
+    ranked = np.argsort(-np.where(eligible, similarity, -np.inf), axis=1, kind="stable")[:, :limit]
+
+    results = []
+    for i, columns in enumerate(ranked):
+        recommendations = []
+        for j in columns:
+            if not eligible[i, j]:
+                break
+            if not attempted[i, j]:
+                reason = NEW_TOPIC_REASON
+            elif averages[i, j] < 60:
+                reason = WEAK_TOPIC_REASON
+            else:
+                reason = CONTINUE_REASON
+            recommendations.append({
+                **_topic_entry(data.topics[j]), "similarity_score": float(similarity[i, j]), "reason": reason
+            })
+        results.append(recommendations)
+    return results
+
+
+def _logistic_loss(theta, design, labels, mask):
+    z = np.einsum("utk,uk->ut", design, theta)
+    loss = (mask * (np.logaddexp(0.0, z) - labels * z)).sum(axis=1)
+    return loss + 0.5 * (theta[:, :-1] ** 2).sum(axis=1)
+
+
+def fit_logistic_batch(features: np.ndarray, labels: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Fit one logistic regression per user and return P(label=1) per row
+
+    `features` is (users, rows, k), `mask` marks each user's real rows.
+    Features are standardised per user, as StandardScaler does, and the
+    weights (not the intercept) carry an L2 penalty with C=1.
+    """
+    weight = mask.astype(float)
+    n = np.maximum(weight.sum(axis=1), 1)[:, None]
+    mean = (features * weight[..., None]).sum(axis=1) / n
+    std = np.sqrt((((features - mean[:, None, :]) ** 2) * weight[..., None]).sum(axis=1) / n)
+    std[std == 0] = 1.0
+    scaled = (features - mean[:, None, :]) / std[:, None, :]
+    design = np.concatenate([scaled, np.ones(features.shape[:2] + (1,))], axis=2)
+
+    users, _, k = design.shape
+    penalty = np.eye(k)
+    penalty[-1, -1] = 0.0  # The intercept is not regularised
+    theta = np.zeros((users, k))
+    loss = _logistic_loss(theta, design, labels, weight)
+    for _ in range(NEWTON_MAX_ITER):
+        p = 1.0 / (1.0 + np.exp(-np.einsum("utk,uk->ut", design, theta)))
+        gradient = np.einsum("utk,ut->uk", design, weight * (p - labels)) + theta @ penalty
+        if np.abs(gradient).max() < NEWTON_TOLERANCE:
+            break
+        hessian = np.einsum("utk,ut,utl->ukl", design, weight * p * (1 - p), design) + penalty
+        step = np.linalg.solve(hessian, gradient[..., None])[..., 0]
+
+        # Backtracking, per user, until the loss does not increase
+        scale = np.ones(users)
+        for _ in range(30):
+            candidate = theta - scale[:, None] * step
+            candidate_loss = _logistic_loss(candidate, design, labels, weight)
+            worse = candidate_loss > loss + 1e-12
+            if not worse.any():
+                break
+            scale[worse] /= 2
+        theta, loss = candidate, candidate_loss
+
+    return 1.0 / (1.0 + np.exp(-np.einsum("utk,uk->ut", design, theta)))
+
+
+def detect_gaps_batch(data: BatchData) -> List[List[dict]]:
+    """
+    detect_knowledge_gaps for every user of the batch
+    """
+    averages = data.averages()
+    attempted = data.attempted & data.in_scope
+    weak = averages < 60
+    counts = attempted.sum(axis=1)
+    weak_counts = (attempted & weak).sum(axis=1)
+    # Logistic regression needs both weak and strong topics
+    fitted = (weak_counts > 0) & (weak_counts < counts)
+
+    risk = np.clip((60 - averages) / 60, 0, 1)  # Rule-based risk
+    if fitted.any():
+        difficulty = np.array([DIFFICULTY_VALUES.get(t.difficulty_level, 1.0) for t in data.topics])
+        rows = np.flatnonzero(fitted)
+        # Fit over attempted topics only: each user's attempted columns are
+        # packed to the left of a (users, most attempted) block, the padding
+        # masked out
+        columns = np.argsort(~attempted[rows], axis=1, kind="stable")[:, :counts[rows].max()]
+        mask = np.take_along_axis(attempted[rows], columns, axis=1)
+
+        def packed(values: np.ndarray) -> np.ndarray:
+            return np.take_along_axis(values[rows], columns, axis=1)
+
+        features = np.stack(
+            [packed(averages), packed(data.attempts), packed(data.time_spent), difficulty[columns]], axis=2
+        )
+        fitted_risk = fit_logistic_batch(features, packed(weak).astype(float), mask)
+        block = (rows[:, None], columns)
+        risk[block] = np.where(mask, fitted_risk, risk[block])
+
+    # Attempted topics in first-attempt order, then (for fitted users) the
+    # rest of the curriculum at medium risk; fitted users sort by risk
+    untouched = data.in_scope & ~attempted & fitted[:, None]
+    risk = np.where(untouched, 0.5, risk)
+    listed = attempted | untouched
+    position = np.where(attempted, data.first_attempt, np.arange(len(data.topics)) + 1e12)
+    sort_risk = np.where(fitted[:, None], -risk, 0.0)
+    # Last key is primary: listed topics first, by risk, then position
+    order = np.lexsort((position, sort_risk, ~listed), axis=1)
+
+    results = []
+    for i, columns in enumerate(order):
+        gaps = []
+        for j in columns[:listed[i].sum()]:
+            gaps.append({
+                **_topic_entry(data.topics[j]),
+                "is_weak": bool(weak[i, j] or untouched[i, j]),
+                "risk_score": float(risk[i, j]),
+            })
+        results.append(gaps)
+    return results
+
+
+def chunked(user_ids: Sequence[int], size: int = BATCH_CHUNK_SIZE) -> Iterator[List[int]]:
+    user_ids = sorted(set(user_ids))
+    for start in range(0, len(user_ids), size):
+        yield user_ids[start:start + size]
+
+
+def iter_batch_scores(db: Session, user_ids: Sequence[int], limit: int = 5,
+                      chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Recommendations and knowledge gaps per user, one chunk of users at a time
+    """
+    for chunk in chunked(user_ids, chunk_size):
+        data = load_batch(db, chunk)
+        recommendations = recommend_batch(data, limit)
+        gaps = detect_gaps_batch(data)
+        for user_id, recs, user_gaps in zip(data.user_ids.tolist(), recommendations, gaps):
+            yield {"user_id": user_id, "recommendations": recs, "knowledge_gaps": user_gaps}
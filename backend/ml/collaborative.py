@@ -0,0 +1,320 @@
+"""
+Item-item collaborative filtering over a sparse user x topic score matrix
+
+Offline: build a CSR matrix of every learner's average score per topic,
+then keep the top-N cosine neighbors of each topic (computed block by
+block, so memory stays bounded at 100k users x 50k topics). Online: score
+candidate topics as a sparse dot product of the user's own row against
+that neighbor table.
+
+The table is stored in the model registry (artifact "cf_neighbors", or
+"cf_neighbors@<tenant>" for other tenants than the default one), so
+every worker maps the same arrays instead of building its own copy. It is
+built on first use and rebuilt once older than CF_MAX_AGE, by one worker
+at a time while the others keep serving the stale table; a version pinned
+by a rollback (`python -m backend.ml.registry activate`) is never rebuilt
+automatically. `python -m backend.ml.collaborative` publishes a fresh build
+and the running workers pick it up without a restart.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy.orm import Session
+from backend.archive import score_totals
+from backend.database import DEFAULT_TENANT, current_tenant
+from backend.enrollment import curriculum_topic_ids
+from backend.ml.registry import build_lock, is_pinned, model_registry, publish
+from backend.models import Topic
+from backend.warmup import register_warmup_hook
+
+logger = logging.getLogger(__name__)
+
+CF_NEIGHBORS = int(os.getenv("CF_NEIGHBORS", "50"))
+CF_BLOCK_SIZE = int(os.getenv("CF_BLOCK_SIZE", "512"))
+# Rebuild the published table when it is older than this (seconds)
+CF_MAX_AGE = float(os.getenv("CF_MAX_AGE", "3600"))
+CF_ARTIFACT = "cf_neighbors"
+
+
+def score_to_rating(scores: np.ndarray) -> np.ndarray:
+    """
+    Map 0-100 scores to (0.1, 1]: every attempt counts as an interaction
+    """
+    return 0.1 + 0.9 * (np.asarray(scores, dtype=np.float32) / 100.0)
+
+
+class NeighborTable:
+    """
+    Top-N item-item cosine neighbors, as a sparse topics x topics matrix
+    """
+
+    def __init__(self, topic_ids: np.ndarray, neighbors: sp.csr_matrix, built_at: Optional[float] = None,
+                 version: Optional[str] = None):
+        self.topic_ids = topic_ids
+        self.index: Dict[int, int] = {int(t): i for i, t in enumerate(topic_ids)}
+        self.neighbors = neighbors
+        self.built_at = built_at or time.time()
+        self.version = version or f"{self.built_at:.0f}"
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "topic_ids": self.topic_ids,
+            "data": self.neighbors.data,
+            "indices": self.neighbors.indices,
+            "indptr": self.neighbors.indptr,
+        }
+
+    @classmethod
+    def from_artifact(cls, artifact) -> "NeighborTable":
+        """
+        A table over the artifact's memory-mapped arrays (no copy)
+        """
+        a = artifact.arrays
+        n = len(a["topic_ids"])
+        neighbors = sp.csr_matrix((a["data"], a["indices"], a["indptr"]), shape=(n, n), copy=False)
+        return cls(a["topic_ids"], neighbors, built_at=artifact.meta["built_at"], version=artifact.version)
+
+    def score(self, ratings: Dict[int, float]) -> Dict[int, float]:
+        """
+        Predicted affinity for every topic reachable from the user's topics
+
+        Weighted average of the user's ratings over each candidate's
+        neighbors: (r @ S) / (|r > 0| @ S).
+        """
+        cols = [self.index[t] for t in ratings if t in self.index]
+        if not cols:
+            return {}
+        values = score_to_rating([ratings[self.topic_ids[c]] for c in cols])
+        n = len(self.topic_ids)
+        user_row = sp.csr_matrix((values, ([0] * len(cols), cols)), shape=(1, n))
+        seen_row = sp.csr_matrix((np.ones(len(cols), dtype=np.float32), ([0] * len(cols), cols)), shape=(1, n))
+
+        numerator = (user_row @ self.neighbors).tocoo()
+        denominator = (seen_row @ self.neighbors).toarray().ravel()
+        return {
+            int(self.topic_ids[j]): float(v / denominator[j])
+            for j, v in zip(numerator.col, numerator.data)
+            if denominator[j] > 0
+        }
+
+
+def build_score_matrix(db: Session):
+    """
+    Sparse user x topic matrix of average ratings, from one aggregate query
+    """
+    rows = [(user_id, topic_id, score_sum / count) for user_id, topic_id, count, score_sum in score_totals(db)]
+
+    topic_ids = np.array(sorted(t for (t,) in db.query(Topic.id).all()), dtype=np.int64)
+    if not rows or len(topic_ids) == 0:
+        return sp.csr_matrix((0, len(topic_ids)), dtype=np.float32), np.array([], dtype=np.int64), topic_ids
+
+    users = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    topics = np.fromiter((r[1] for r in rows), dtype=np.int64, count=len(rows))
+    scores = np.fromiter((r[2] for r in rows), dtype=np.float32, count=len(rows))
+
+    user_ids, user_index = np.unique(users, return_inverse=True)
+    topic_index = np.searchsorted(topic_ids, topics)
+    valid = (topic_index < len(topic_ids)) & (topic_ids[np.minimum(topic_index, len(topic_ids) - 1)] == topics)
+
+    matrix = sp.csr_matrix(
+        (score_to_rating(scores[valid]), (user_index[valid], topic_index[valid])),
+        shape=(len(user_ids), len(topic_ids)), dtype=np.float32
+    )
+    return matrix, user_ids, topic_ids
+
+
+def compute_neighbors(matrix: sp.csr_matrix, k: int = CF_NEIGHBORS, block_size: int = CF_BLOCK_SIZE) -> sp.csr_matrix:
+    """
+    Keep the top-k cosine neighbors of each topic (column), excluding itself
+    """
+    n_topics = matrix.shape[1]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sp.diags(1.0 / norms)).tocsc().astype(np.float32)
+    normalized_t = normalized.T.tocsr()
+
+    rows, cols, vals = [], [], []
+    for start in range(0, n_topics, block_size):
+        stop = min(start + block_size, n_topics)
+        # (block x topics) similarities; sparse because most topic pairs share no learners
+        block = (normalized_t[start:stop] @ normalized).tocsr()
+        for i in range(stop - start):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            idx, sims = block.indices[lo:hi], block.data[lo:hi]
+            keep = (idx != start + i) & (sims > 0)
+            idx, sims = idx[keep], sims[keep]
+            if len(sims) > k:
+                top = np.argpartition(-sims, k)[:k]
+                idx, sims = idx[top], sims[top]
+            rows.append(np.full(len(idx), start + i, dtype=np.int64))
+            cols.append(idx)
+            vals.append(sims)
+
+    if not rows:
+        return sp.csr_matrix((n_topics, n_topics), dtype=np.float32)
+    return sp.csr_matrix(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_topics, n_topics), dtype=np.float32
+    )
+
+
+def build_neighbor_table(db: Session, k: int = CF_NEIGHBORS) -> NeighborTable:
+    """
+    Build the neighbor table from all learners' attempts
+    """
+    started = time.perf_counter()
+    matrix, user_ids, topic_ids = build_score_matrix(db)
+    table = NeighborTable(topic_ids, compute_neighbors(matrix, k))
+    logger.info(
+        f"Built item-item table: {len(user_ids)} users x {len(topic_ids)} topics, "
+        f"{matrix.nnz} ratings, {table.neighbors.nnz} neighbor pairs "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return table
+
+
+# Loaded table per artifact name
+_tables: Dict[str, NeighborTable] = {}
+_table_lock = threading.Lock()
+
+
+def artifact_name() -> str:
+    """
+    Registry name of the current tenant's neighbor table
+    """
+    tenant = current_tenant.get()
+    return CF_ARTIFACT if tenant == DEFAULT_TENANT else f"{CF_ARTIFACT}@{tenant}"
+
+
+def publish_neighbor_table(table: NeighborTable) -> str:
+    """
+    Save a table as the current tenant's artifact for every worker
+    """
+    return publish(artifact_name(), table.to_arrays(), meta={"built_at": table.built_at})
+
+
+def _fresh(artifact) -> bool:
+    if artifact is None:
+        return False
+    return time.time() - artifact.meta["built_at"] < CF_MAX_AGE or is_pinned(artifact.name)
+
+
+def _rebuild(db: Session, name: str, blocking: bool):
+    """
+    Build and publish the table unless it is fresh; the current artifact
+
+    Without `blocking`, returns the stale artifact at once when another
+    thread or worker is already rebuilding.
+    """
+    if not _table_lock.acquire(blocking=blocking):
+        return model_registry.get(name)
+    try:
+        with build_lock(name, blocking=blocking) as acquired:
+            # Another thread or worker may have published while we waited
+            artifact = model_registry.refresh(name)
+            if acquired and not _fresh(artifact):
+                publish_neighbor_table(build_neighbor_table(db))
+                artifact = model_registry.refresh(name)
+            return artifact
+    finally:
+        _table_lock.release()
+
+
+def get_neighbor_table(db: Session) -> NeighborTable:
+    """
+    The current neighbor table, building and publishing it when missing or too old
+
+    Only a missing table makes the request wait for a build; a stale one is
+    served while one worker rebuilds it.
+    """
+    name = artifact_name()
+    artifact = model_registry.get(name)
+    if not _fresh(artifact):
+        artifact = _rebuild(db, name, blocking=artifact is None)
+    table = _tables.get(name)
+    if table is None or table.version != artifact.version:
+        table = _tables[name] = NeighborTable.from_artifact(artifact)
+    return table
+
+
+@register_warmup_hook
+def preload_neighbor_table():
+    """
+    Load (or build) the neighbor table during warm-up, before forking workers
+    """
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        get_neighbor_table(db)
+    finally:
+        db.close()
+
+
+def get_user_ratings(user_id: int, db: Session) -> Dict[int, float]:
+    """
+    The user's average score per attempted topic
+    """
+    return {topic_id: float(score_sum / count) for _, topic_id, count, score_sum in score_totals(db, user_id)}
+
+
+def recommend_topics_collaborative(user_id: int, db: Session, limit: int = 5,
+                                   table: Optional[NeighborTable] = None) -> List[Dict]:
+    """
+    Recommend topics that learners with overlapping history did well on
+
+    Falls back to content-based recommendations for users without history
+    or when no neighbor reaches a new topic. `table` defaults to the current
+    neighbor table; callers caching the result pass the one their key names.
+    """
+    ratings = get_user_ratings(user_id, db)
+    scores = (table or get_neighbor_table(db)).score(ratings) if ratings else {}
+    # Same rules as the content-based recommender: only the user's curriculum,
+    # skipping topics already mastered
+    curriculum = curriculum_topic_ids(db, user_id) if scores else None
+    candidates = {
+        t: s for t, s in scores.items()
+        if ratings.get(t, 0) < 80 and (curriculum is None or t in curriculum)
+    }
+
+    if not candidates:
+        from backend.ml.recommendations import recommend_topics
+        return recommend_topics(user_id, db, limit)
+
+    top = sorted(candidates.items(), key=lambda x: x[1], reverse=True)[:limit]
+    topics = {t.id: t for t in db.query(Topic).filter(Topic.id.in_([t for t, _ in top])).all()}
+
+    recommendations = []
+    for topic_id, score in top:
+        topic = topics.get(topic_id)
+        if topic is None:
+            continue
+        if topic_id not in ratings:
+            reason = "Learners with similar history also studied this"
+        elif ratings[topic_id] < 60:
+            reason = "Weak area - needs revision"
+        else:
+            reason = "Continue learning path"
+        recommendations.append({
+            "topic_id": topic.id,
+            "topic_title": topic.title,
+            "difficulty_level": topic.difficulty_level,
+            "similarity_score": min(1.0, float(score)),
+            "reason": reason
+        })
+    return recommendations
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    session = SessionLocal()
+    try:
+        publish_neighbor_table(build_neighbor_table(session))
+    finally:
+        session.close()
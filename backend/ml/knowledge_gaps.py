@@ -7,35 +7,24 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.preprocessing import StandardScaler
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from backend.models import User, Topic, QuizAttempt, Performance
+from backend.snapshot import UserSnapshot, load_user_snapshot
 
-def prepare_features(user_id: int, db: Session) -> pd.DataFrame:
+def prepare_features(snapshot: UserSnapshot) -> pd.DataFrame:
     """
     Prepare feature matrix for knowledge gap detection
     Features: average_score, attempts_count, time_spent, difficulty_level
     """
-    # Get all quiz attempts for user
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).all()
-    
-    # Get performance data
-    performances = db.query(Performance).filter(Performance.user_id == user_id).all()
-    performance_dict = {p.topic_id: p.time_spent_minutes for p in performances}
+    performance_dict = snapshot.time_spent
+    topics = snapshot.topics_by_id()
     
     # Group attempts by topic
     topic_data = {}
-    for attempt in attempts:
-        quiz = attempt.quiz
-        topic_id = quiz.topic_id
-        
-        if topic_id not in topic_data:
-            topic_data[topic_id] = {
-                "scores": [],
-                "attempts": 0,
-                "topic_id": topic_id
-            }
-        
-        topic_data[topic_id]["scores"].append(attempt.score)
-        topic_data[topic_id]["attempts"] += 1
+    for topic_id, totals in snapshot.topic_totals().items():
+        topic_data[topic_id] = {
+            "average": totals.average,
+            "attempts": totals.attempts_count,
+            "topic_id": topic_id
+        }
     
     # Build feature matrix
     features = []
@@ -43,11 +32,11 @@ def prepare_features(user_id: int, db: Session) -> pd.DataFrame:
     topic_ids = []
     
     for topic_id, data in topic_data.items():
-        topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        topic = topics.get(topic_id)
         if not topic:
             continue
         
-        avg_score = np.mean(data["scores"]) if data["scores"] else 0
+        avg_score = data["average"]
         attempts_count = data["attempts"]
         time_spent = performance_dict.get(topic_id, 0)
         
@@ -63,7 +52,7 @@ def prepare_features(user_id: int, db: Session) -> pd.DataFrame:
         topic_ids.append(topic_id)
     
     if not features:
-        return pd.DataFrame(), []
+        return pd.DataFrame(), [], []
     
     df = pd.DataFrame(features, columns=["avg_score", "attempts_count", "time_spent", "difficulty"])
     return df, topic_ids, labels
@@ -72,8 +61,16 @@ def detect_knowledge_gaps(user_id: int, db: Session) -> List[Dict]:
     """
     Detect knowledge gaps using Logistic Regression
     """
+    return detect_knowledge_gaps_for_snapshot(load_user_snapshot(db, user_id))
+
+def detect_knowledge_gaps_for_snapshot(snapshot: UserSnapshot) -> List[Dict]:
+    """
+    Knowledge gaps from a preloaded user snapshot
+    """
+    topics = snapshot.topics_by_id()
+    
     # Prepare features
-    features_df, topic_ids, labels = prepare_features(user_id, db)
+    features_df, topic_ids, labels = prepare_features(snapshot)
     
     if len(features_df) == 0:
         return []
@@ -83,7 +80,7 @@ def detect_knowledge_gaps(user_id: int, db: Session) -> List[Dict]:
         # Not enough data for training - use rule-based approach
         gaps = []
         for idx, topic_id in enumerate(topic_ids):
-            topic = db.query(Topic).filter(Topic.id == topic_id).first()
+            topic = topics.get(topic_id)
             if not topic:
                 continue
             
@@ -115,7 +112,7 @@ def detect_knowledge_gaps(user_id: int, db: Session) -> List[Dict]:
     # Get all topics user has attempted
     gaps = []
     for idx, topic_id in enumerate(topic_ids):
-        topic = db.query(Topic).filter(Topic.id == topic_id).first()
+        topic = topics.get(topic_id)
         if not topic:
             continue
         
@@ -131,7 +128,7 @@ def detect_knowledge_gaps(user_id: int, db: Session) -> List[Dict]:
         })
     
     # Also check topics user hasn't attempted but should know about
-    all_topics = db.query(Topic).all()
+    all_topics = snapshot.topics
     attempted_topic_ids = set(topic_ids)
     
     for topic in all_topics:
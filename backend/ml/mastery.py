@@ -0,0 +1,204 @@
+"""
+Online mastery estimates (Elo-style learner/topic ratings)
+
+Every quiz attempt is one "match" between the learner's ability on a topic
+(TopicMastery.rating) and the topic's difficulty (TopicRating.rating), both
+on a logit scale. The expected score is sigmoid(ability - difficulty); after
+the attempt both ratings move by K * (actual - expected), with K shrinking
+as more attempts are seen. Each submission touches two rows, so mastery and
+risk are read directly instead of being refit from the attempt history, and
+topic difficulty is learned from all learners as a side effect.
+
+Rebuild every rating from the stored attempts with
+`python -m backend.ml.mastery`.
+"""
+import logging
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from backend.archive import iter_archived_attempts
+from backend.database import lock_for_write
+from backend.enrollment import scope_topics
+from backend.models import Quiz, QuizAttempt, Topic, TopicMastery, TopicRating
+
+logger = logging.getLogger(__name__)
+
+# Step size of the first update; later ones shrink as K / (1 + decay * n)
+MASTERY_K = float(os.getenv("MASTERY_K", "0.8"))
+MASTERY_K_DECAY = float(os.getenv("MASTERY_K_DECAY", "0.05"))
+# Topics with an expected score below this are reported as weak
+MASTERY_THRESHOLD = 0.6
+
+# Starting difficulty per level, before any learner has attempted the topic
+DIFFICULTY_PRIOR = {"Beginner": -0.5, "Intermediate": 0.0, "Advanced": 0.5}
+
+
+def expected_score(ability: float, difficulty: float) -> float:
+    """
+    Probability-like expected score (0-1) of a learner on a topic
+    """
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def step_size(attempts: int) -> float:
+    """
+    Update weight: large while a rating is uncertain, smaller as it settles
+    """
+    return MASTERY_K / (1.0 + MASTERY_K_DECAY * attempts)
+
+
+def elo_update(ability: float, ability_attempts: int, difficulty: float,
+               difficulty_attempts: int, score: float):
+    """
+    New (ability, difficulty) after one attempt scoring `score` (0-100)
+    """
+    surprise = score / 100.0 - expected_score(ability, difficulty)
+    return (
+        ability + step_size(ability_attempts) * surprise,
+        difficulty - step_size(difficulty_attempts) * surprise
+    )
+
+
+def _apply_attempt(db: Session, user_id: int, topic: Topic, score: float):
+    topic_rating = db.query(TopicRating).filter(TopicRating.topic_id == topic.id).first()
+    if topic_rating is None:
+        topic_rating = TopicRating(
+            topic_id=topic.id,
+            rating=DIFFICULTY_PRIOR.get(topic.difficulty_level, 0.0),
+            attempts_count=0
+        )
+        db.add(topic_rating)
+    mastery = db.query(TopicMastery).filter(
+        TopicMastery.user_id == user_id, TopicMastery.topic_id == topic.id
+    ).first()
+    if mastery is None:
+        mastery = TopicMastery(user_id=user_id, topic_id=topic.id, rating=0.0, attempts_count=0)
+        db.add(mastery)
+
+    ability, difficulty = elo_update(
+        mastery.rating, mastery.attempts_count, topic_rating.rating, topic_rating.attempts_count, score
+    )
+    mastery.rating = ability
+    mastery.attempts_count += 1
+    if topic_rating in db.new:
+        topic_rating.rating = difficulty
+        topic_rating.attempts_count = 1
+    else:
+        # Every learner updates this row: apply the change as an in-SQL increment
+        topic_rating.rating = TopicRating.rating + (difficulty - topic_rating.rating)
+        topic_rating.attempts_count = TopicRating.attempts_count + 1
+
+
+def update_mastery(db: Session, user_id: int, topic: Topic, score: float):
+    """
+    Apply one attempt to the learner's and the topic's ratings
+
+    Flushes without committing, so the ratings land with the attempt.
+    """
+    _apply_attempt(db, user_id, topic, score)
+    db.flush()
+
+
+def mastery_gaps(user_id: int, db: Session) -> List[Dict]:
+    """
+    Knowledge gaps from the stored ratings, without scanning attempts
+
+    Same shape as detect_knowledge_gaps; risk is 1 - expected score, so
+    topics never attempted are ranked by their learned difficulty.
+    """
+    topics = scope_topics(db.query(Topic), user_id).all()
+    # Only the ratings of the curriculum's topics
+    topic_ids = [topic.id for topic in topics]
+    difficulties = dict(
+        db.query(TopicRating.topic_id, TopicRating.rating).filter(TopicRating.topic_id.in_(topic_ids)).all()
+    )
+    abilities = dict(
+        db.query(TopicMastery.topic_id, TopicMastery.rating).filter(
+            TopicMastery.user_id == user_id, TopicMastery.topic_id.in_(topic_ids)
+        ).all()
+    )
+
+    gaps = []
+    for topic in topics:
+        difficulty = difficulties.get(topic.id, DIFFICULTY_PRIOR.get(topic.difficulty_level, 0.0))
+        expected = expected_score(abilities.get(topic.id, 0.0), difficulty)
+        gaps.append({
+            "topic_id": topic.id,
+            "topic_title": topic.title,
+            "difficulty_level": topic.difficulty_level,
+            "is_weak": expected < MASTERY_THRESHOLD,
+            "risk_score": float(1.0 - expected)
+        })
+
+    gaps.sort(key=lambda x: x["risk_score"], reverse=True)
+    return gaps
+
+
+def rebuild_ratings(db: Session, topic_ids: Optional[Iterable[int]] = None):
+    """
+    Replay stored attempts in order to rebuild the ratings (all, or of `topic_ids`)
+
+    Archived attempts are replayed first; they all precede the hot table.
+    A topic's ratings depend only on its own attempts, so rebuilding some
+    topics gives the same rows as a full rebuild. The write lock is held
+    from reading the hot attempts to the commit, so submissions made
+    meanwhile wait instead of being overwritten.
+    """
+    topic_query = db.query(Topic)
+    if topic_ids is not None:
+        topic_ids = set(topic_ids)
+        topic_query = topic_query.filter(Topic.id.in_(topic_ids))
+    topics = {t.id: t for t in topic_query.all()}
+    archived = [
+        (a["user_id"], a["topic_id"], a["score"])
+        for a in iter_archived_attempts(["user_id", "topic_id", "score"], topic_ids)
+    ]
+    lock_for_write(db)
+    hot_query = db.query(QuizAttempt.user_id, Quiz.topic_id, QuizAttempt.score).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    )
+    if topic_ids is not None:
+        hot_query = hot_query.filter(Quiz.topic_id.in_(topic_ids))
+    attempts = archived + hot_query.order_by(QuizAttempt.completed_at, QuizAttempt.id).all()
+
+    # [rating, attempts] per topic and per (user, topic), replayed in memory
+    difficulties = {t.id: [DIFFICULTY_PRIOR.get(t.difficulty_level, 0.0), 0] for t in topics.values()}
+    abilities: Dict[tuple, list] = {}
+    for user_id, topic_id, score in attempts:
+        if topic_id not in topics:
+            continue
+        topic_state = difficulties[topic_id]
+        user_state = abilities.setdefault((user_id, topic_id), [0.0, 0])
+        user_state[0], topic_state[0] = elo_update(user_state[0], user_state[1], topic_state[0], topic_state[1], score)
+        user_state[1] += 1
+        topic_state[1] += 1
+
+    mastery_rows, rating_rows = db.query(TopicMastery), db.query(TopicRating)
+    if topic_ids is not None:
+        mastery_rows = mastery_rows.filter(TopicMastery.topic_id.in_(topic_ids))
+        rating_rows = rating_rows.filter(TopicRating.topic_id.in_(topic_ids))
+    mastery_rows.delete(synchronize_session=False)
+    rating_rows.delete(synchronize_session=False)
+    db.add_all(
+        TopicRating(topic_id=topic_id, rating=rating, attempts_count=n)
+        for topic_id, (rating, n) in difficulties.items() if n
+    )
+    db.add_all(
+        TopicMastery(user_id=user_id, topic_id=topic_id, rating=rating, attempts_count=n)
+        for (user_id, topic_id), (rating, n) in abilities.items()
+    )
+    db.commit()
+    logger.info(f"Rebuilt mastery ratings from {len(attempts)} attempts")
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        rebuild_ratings(session)
+    finally:
+        session.close()
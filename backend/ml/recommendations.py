@@ -6,34 +6,21 @@ import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from sqlalchemy.orm import Session
 from typing import List, Dict
-from backend.models import User, Topic, QuizAttempt, Performance
+from backend.snapshot import TopicInfo, UserSnapshot, load_user_snapshot
 
-def get_user_topic_vector(user_id: int, db: Session) -> Dict[int, float]:
+def get_user_topic_vector(snapshot: UserSnapshot) -> Dict[int, float]:
     """
     Create a feature vector for user based on quiz scores per topic
     Returns dict: {topic_id: average_score}
     """
-    # Get all quiz attempts for user
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == user_id).all()
-    
-    # Group by topic and calculate average scores
-    topic_scores = {}
-    for attempt in attempts:
-        quiz = attempt.quiz
-        topic_id = quiz.topic_id
-        
-        if topic_id not in topic_scores:
-            topic_scores[topic_id] = []
-        topic_scores[topic_id].append(attempt.score)
-    
     # Calculate average scores
     topic_vectors = {}
-    for topic_id, scores in topic_scores.items():
-        topic_vectors[topic_id] = np.mean(scores)
+    for topic_id, totals in snapshot.topic_totals().items():
+        topic_vectors[topic_id] = totals.average
     
     return topic_vectors
 
-def get_topic_features(topic: Topic) -> np.ndarray:
+def get_topic_features(topic: TopicInfo) -> np.ndarray:
     """
     Create feature vector for a topic based on difficulty level
     """
@@ -47,11 +34,17 @@ def recommend_topics(user_id: int, db: Session, limit: int = 5) -> List[Dict]:
     """
     Recommend topics using content-based filtering with cosine similarity
     """
+    return recommend_topics_for_snapshot(load_user_snapshot(db, user_id), limit)
+
+def recommend_topics_for_snapshot(snapshot: UserSnapshot, limit: int = 5) -> List[Dict]:
+    """
+    Content-based recommendations from a preloaded user snapshot
+    """
     # Get user's performance vector
-    user_vector = get_user_topic_vector(user_id, db)
+    user_vector = get_user_topic_vector(snapshot)
     
     # Get all topics
-    all_topics = db.query(Topic).all()
+    all_topics = snapshot.topics
     
     if not all_topics:
         return []
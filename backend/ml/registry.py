@@ -0,0 +1,293 @@
+"""
+Versioned model artifacts shared by every worker process
+
+An artifact is a directory of uncompressed .npy arrays (plus optional
+joblib-pickled objects) and a meta.json:
+
+    MODEL_DIR/<name>/<version>/{<array>.npy, <object>.joblib, meta.json}
+    MODEL_DIR/<name>/CURRENT        (the active version)
+
+Arrays are opened with mmap_mode='r', so all workers share one page-cache
+copy instead of each holding its own. `publish` writes a new version into a
+temporary directory, renames it into place and then switches CURRENT with
+os.replace, so readers see either the old or the new version, never a
+partial one. `get` re-reads CURRENT at most every MODEL_RELOAD_INTERVAL
+seconds and hot-swaps to a new version without a restart; old versions
+stay mapped until their last reader lets go.
+
+A version activated by hand (a rollback) is pinned: automatic rebuilds
+leave it in place until it is unpinned or a new version is published.
+
+    python -m backend.ml.registry                      # list artifacts
+    python -m backend.ml.registry activate NAME VERSION  # switch or roll back, and pin
+    python -m backend.ml.registry unpin NAME             # allow automatic rebuilds again
+"""
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.getenv("MODEL_DIR", "./model_artifacts")
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "2"))
+# Versions kept on disk per artifact (the active one always included)
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+
+CURRENT_FILE = "CURRENT"
+PINNED_FILE = "PINNED"
+
+
+@dataclass
+class Artifact:
+    name: str
+    version: str
+    meta: Dict[str, Any]
+    arrays: Dict[str, np.ndarray]  # Read-only memory maps
+    path: str
+    _objects: Dict[str, Any] = field(default_factory=dict)
+
+    def object(self, key: str) -> Any:
+        """
+        A pickled object saved with the artifact, loaded on first use
+        """
+        if key not in self._objects:
+            import joblib
+            self._objects[key] = joblib.load(os.path.join(self.path, f"{key}.joblib"), mmap_mode="r")
+        return self._objects[key]
+
+
+def _artifact_dir(name: str) -> str:
+    return os.path.join(MODEL_DIR, name)
+
+
+def _new_version() -> str:
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{time.time_ns() % 1_000_000_000:09d}-{os.getpid()}"
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def current_version(name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(_artifact_dir(name), CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(name: str) -> List[str]:
+    """
+    Complete versions of an artifact, oldest first
+    """
+    root = _artifact_dir(name)
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        v for v in os.listdir(root)
+        if not v.startswith(".") and os.path.isfile(os.path.join(root, v, "meta.json"))
+    )
+
+
+def is_pinned(name: str) -> bool:
+    return os.path.exists(os.path.join(_artifact_dir(name), PINNED_FILE))
+
+
+def unpin(name: str):
+    try:
+        os.remove(os.path.join(_artifact_dir(name), PINNED_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def activate(name: str, version: str, pin: bool = False):
+    """
+    Atomically point CURRENT at an existing version, pinning it or not
+    """
+    root = _artifact_dir(name)
+    if not os.path.isfile(os.path.join(root, version, "meta.json")):
+        raise ValueError(f"Unknown version {version} of {name}")
+    tmp = os.path.join(root, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+    if pin:
+        with open(os.path.join(root, PINNED_FILE), "w") as f:
+            f.write(version)
+    else:
+        unpin(name)
+    _fsync_dir(root)
+
+
+def _prune(name: str):
+    active = current_version(name)
+    stale = [v for v in list_versions(name) if v != active]
+    for version in stale[:max(0, len(stale) - (MODEL_KEEP_VERSIONS - 1))]:
+        # Processes that still map these files keep them alive until unmapped
+        shutil.rmtree(os.path.join(_artifact_dir(name), version), ignore_errors=True)
+
+
+def publish(name: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None,
+            objects: Optional[Dict[str, Any]] = None, activate_now: bool = True) -> str:
+    """
+    Save a new version of an artifact and (by default) make it current
+    """
+    root = _artifact_dir(name)
+    os.makedirs(root, exist_ok=True)
+    version = _new_version()
+    tmp = os.path.join(root, f".{version}.tmp")
+    os.makedirs(tmp)
+    try:
+        for key, array in arrays.items():
+            # Uncompressed and pickle-free, so it can be memory-mapped
+            np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        if objects:
+            import joblib
+            for key, obj in objects.items():
+                joblib.dump(obj, os.path.join(tmp, f"{key}.joblib"))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump({**(meta or {}), "arrays": sorted(arrays), "objects": sorted(objects or {})}, f)
+        for entry in os.listdir(tmp):
+            with open(os.path.join(tmp, entry), "rb") as f:
+                os.fsync(f.fileno())
+        os.rename(tmp, os.path.join(root, version))
+        _fsync_dir(root)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    if activate_now:
+        activate(name, version)
+        _prune(name)
+    logger.info(f"Published {name} version {version}")
+    return version
+
+
+def load(name: str, version: Optional[str] = None) -> Optional[Artifact]:
+    """
+    Open a version (the current one by default) with memory-mapped arrays
+    """
+    version = version or current_version(name)
+    if version is None:
+        return None
+    path = os.path.join(_artifact_dir(name), version)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = {key: np.load(os.path.join(path, f"{key}.npy"), mmap_mode="r") for key in meta["arrays"]}
+    return Artifact(name=name, version=version, meta=meta, arrays=arrays, path=path)
+
+
+class ModelRegistry:
+    """
+    Process-local view of the current artifacts, hot-reloaded on switch
+    """
+
+    def __init__(self, reload_interval: float = MODEL_RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self._loaded: Dict[str, Artifact] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Artifact]:
+        """
+        The current version of an artifact, or None if none was published
+        """
+        now = time.monotonic()
+        artifact = self._loaded.get(name)
+        if artifact is not None and now - self._checked.get(name, 0.0) < self.reload_interval:
+            return artifact
+        with self._lock:
+            artifact = self._loaded.get(name)
+            version = current_version(name)
+            self._checked[name] = now
+            if version is None:
+                return artifact
+            if artifact is None or artifact.version != version:
+                try:
+                    artifact = load(name, version)
+                except FileNotFoundError:
+                    # Pruned between reading CURRENT and opening; keep the old one
+                    return self._loaded.get(name)
+                self._loaded[name] = artifact
+                logger.info(f"Loaded {name} version {version}")
+            return artifact
+
+    def refresh(self, name: str) -> Optional[Artifact]:
+        """
+        Re-read CURRENT now (after publishing from this process)
+        """
+        self._checked.pop(name, None)
+        return self.get(name)
+
+
+model_registry = ModelRegistry()
+
+
+@contextmanager
+def build_lock(name: str, blocking: bool = True):
+    """
+    Cross-process lock so only one worker rebuilds an artifact at a time
+
+    Yields whether the lock is held: with blocking=False, False at once
+    when another process or thread holds it.
+    """
+    root = _artifact_dir(name)
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect and switch model artifact versions")
+    sub = parser.add_subparsers(dest="command")
+    switch = sub.add_parser("activate", help="make VERSION the current version of NAME and pin it")
+    switch.add_argument("name")
+    switch.add_argument("version")
+    release = sub.add_parser("unpin", help="let automatic rebuilds replace NAME's current version")
+    release.add_argument("name")
+    args = parser.parse_args()
+
+    if args.command == "activate":
+        activate(args.name, args.version, pin=True)
+        print(f"{args.name}: {args.version} (pinned)")
+        return
+    if args.command == "unpin":
+        unpin(args.name)
+        print(f"{args.name}: unpinned")
+        return
+    names = sorted(os.listdir(MODEL_DIR)) if os.path.isdir(MODEL_DIR) else []
+    for name in names:
+        active = current_version(name)
+        pinned = is_pinned(name)
+        for version in list_versions(name):
+            marker = ("!" if pinned else "*") if version == active else " "
+            size = sum(e.stat().st_size for e in os.scandir(os.path.join(MODEL_DIR, name, version)))
+            print(f"{marker} {name} {version} {size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Spaced-repetition review scheduling (SM-2)
+
+Every quiz attempt is a review of its topic. The score maps to an SM-2
+quality grade (0-5, score / 20 rounded). A grade of 3 or more extends the
+review interval: 1 day, then 6 days, then the previous interval times the
+ease factor. A lower grade restarts at 1 day. The ease factor moves with
+each grade and never drops below 1.3.
+
+`review_schedule` keeps one row per (user, topic) with the next due time,
+indexed on (user_id, due_at). The review queue is then an index range scan
+returning the k most overdue topics, whatever the size of the catalog.
+`python -m backend.ml.spaced_repetition due-counts` (nightly, from cron)
+stores every learner's due count for the day in `review_due_counts`, for
+reminder notifications.
+
+    python -m backend.ml.spaced_repetition rebuild      # replay all attempts
+    python -m backend.ml.spaced_repetition due-counts [--day YYYY-MM-DD]
+"""
+import logging
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from backend.archive import iter_archived_attempts, parse_timestamp
+from backend.database import lock_for_write
+from backend.models import Quiz, QuizAttempt, ReviewDueCount, ReviewSchedule, Topic
+
+logger = logging.getLogger(__name__)
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Days of precomputed due counts kept
+REVIEW_DUE_COUNT_DAYS = int(os.getenv("REVIEW_DUE_COUNT_DAYS", "30"))
+# Users per IN (...) list when rebuilding some users' schedules
+REBUILD_CHUNK = 500
+
+
+@dataclass(frozen=True)
+class ReviewState:
+    repetitions: int
+    interval_days: float
+    ease_factor: float
+
+
+def quality(score: float) -> int:
+    """
+    SM-2 grade (0-5) of a percentage score
+    """
+    return max(0, min(5, int(score / 20 + 0.5)))
+
+
+def sm2_update(state: ReviewState, score: float) -> ReviewState:
+    """
+    The state after one review scored `score`
+    """
+    q = quality(score)
+    ease = max(MIN_EASE, state.ease_factor + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    if q < 3:
+        return ReviewState(0, 1.0, ease)
+    if state.repetitions == 0:
+        interval = 1.0
+    elif state.repetitions == 1:
+        interval = 6.0
+    else:
+        interval = state.interval_days * state.ease_factor
+    return ReviewState(state.repetitions + 1, interval, ease)
+
+
+def _apply_review(db: Session, user_id: int, topic_id: int, score: float, reviewed_at: datetime):
+    row = db.query(ReviewSchedule).filter(
+        ReviewSchedule.user_id == user_id, ReviewSchedule.topic_id == topic_id
+    ).first()
+    if row is None:
+        row = ReviewSchedule(user_id=user_id, topic_id=topic_id)
+        db.add(row)
+        state = ReviewState(0, 0.0, INITIAL_EASE)
+    else:
+        state = ReviewState(row.repetitions, row.interval_days, row.ease_factor)
+    state = sm2_update(state, score)
+    row.repetitions = state.repetitions
+    row.interval_days = state.interval_days
+    row.ease_factor = state.ease_factor
+    row.due_at = reviewed_at + timedelta(days=state.interval_days)
+    row.last_score = score
+    row.last_reviewed_at = reviewed_at
+
+
+def record_review(db: Session, user_id: int, topic_id: int, score: float, reviewed_at: Optional[datetime]):
+    """
+    Reschedule a topic after a quiz attempt
+
+    Flushes without committing, so the schedule lands with the attempt.
+    """
+    # Attempt times come from SQLite's CURRENT_TIMESTAMP, which is UTC
+    reviewed_at = reviewed_at or datetime.utcnow()
+    _apply_review(db, user_id, topic_id, score, reviewed_at)
+    db.flush()
+
+
+def review_queue(db: Session, user_id: int, limit: int = 10, now: Optional[datetime] = None) -> List[Dict]:
+    """
+    The user's `limit` most overdue topics (due at or before `now`)
+    """
+    now = now or datetime.utcnow()
+    rows = db.query(
+        ReviewSchedule.topic_id, Topic.title, Topic.difficulty_level, ReviewSchedule.due_at,
+        ReviewSchedule.interval_days, ReviewSchedule.repetitions, ReviewSchedule.ease_factor,
+        ReviewSchedule.last_score,
+    ).join(Topic, ReviewSchedule.topic_id == Topic.id).filter(
+        ReviewSchedule.user_id == user_id, ReviewSchedule.due_at <= now
+    ).order_by(ReviewSchedule.due_at, ReviewSchedule.topic_id).limit(limit).all()
+    return [
+        {
+            "topic_id": topic_id,
+            "topic_title": title,
+            "difficulty_level": difficulty_level,
+            "due_at": due_at,
+            "overdue_days": (now - due_at).total_seconds() / 86400,
+            "interval_days": interval_days,
+            "repetitions": repetitions,
+            "ease_factor": ease_factor,
+            "last_score": last_score,
+        }
+        for topic_id, title, difficulty_level, due_at, interval_days, repetitions, ease_factor, last_score in rows
+    ]
+
+
+def compute_due_counts(db: Session, day: date) -> int:
+    """
+    Store every learner's reviews due by the end of `day`; returns the learner count
+
+    Counted while range-scanning the (due_at, user_id) index, which only
+    touches due rows (a GROUP BY would scan the table in user order). The
+    day's previous counts are replaced and counts older than
+    REVIEW_DUE_COUNT_DAYS dropped.
+    """
+    day_start = datetime.combine(day, time.min)
+    day_end = day_start + timedelta(days=1)
+    due: Dict[int, List[int]] = {}
+    for user_id, due_at in db.query(ReviewSchedule.user_id, ReviewSchedule.due_at).filter(
+        ReviewSchedule.due_at < day_end
+    ).order_by(ReviewSchedule.due_at).yield_per(5000):
+        counts = due.setdefault(user_id, [0, 0])
+        counts[0] += 1
+        counts[1] += due_at < day_start
+
+    db.query(ReviewDueCount).filter(ReviewDueCount.day == day).delete(synchronize_session=False)
+    db.query(ReviewDueCount).filter(
+        ReviewDueCount.day < day - timedelta(days=REVIEW_DUE_COUNT_DAYS)
+    ).delete(synchronize_session=False)
+    db.add_all(
+        ReviewDueCount(day=day, user_id=user_id, due_count=count, overdue_count=overdue)
+        for user_id, (count, overdue) in sorted(due.items())
+    )
+    db.commit()
+    return len(due)
+
+
+def iter_due_counts(db: Session, day: date, batch_size: int = 1000) -> Iterator[Tuple[int, int, int]]:
+    """
+    (user_id, due_count, overdue_count) of a day, for notification fan-out
+    """
+    last_user = 0
+    while True:
+        rows = db.query(ReviewDueCount.user_id, ReviewDueCount.due_count, ReviewDueCount.overdue_count).filter(
+            ReviewDueCount.day == day, ReviewDueCount.user_id > last_user
+        ).order_by(ReviewDueCount.user_id).limit(batch_size).all()
+        if not rows:
+            return
+        yield from rows
+        last_user = rows[-1][0]
+
+
+def rebuild_schedule(db: Session, user_ids: Optional[Iterable[int]] = None,
+                     topic_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Replay stored attempts in order to rebuild the review schedules
+
+    All of them by default, or only those of `user_ids` on `topic_ids`.
+    Archived attempts are replayed first; they all precede the hot table.
+    The write lock is held from reading the hot attempts to the commit, so
+    reviews recorded meanwhile wait instead of being overwritten.
+    """
+    user_ids = set(user_ids) if user_ids is not None else None
+    topic_ids = set(topic_ids) if topic_ids is not None else None
+    states: Dict[Tuple[int, int], list] = {}
+
+    def review(user_id, topic_id, score, reviewed_at):
+        if user_ids is not None and user_id not in user_ids:
+            return
+        entry = states.get((user_id, topic_id))
+        state = entry[0] if entry else ReviewState(0, 0.0, INITIAL_EASE)
+        states[(user_id, topic_id)] = [sm2_update(state, score), score, reviewed_at]
+
+    for a in iter_archived_attempts(["user_id", "topic_id", "score"], topic_ids):
+        review(a["user_id"], a["topic_id"], a["score"], parse_timestamp(a["completed_at"]))
+    lock_for_write(db)
+    hot_query = db.query(QuizAttempt.user_id, Quiz.topic_id, QuizAttempt.score, QuizAttempt.completed_at).join(
+        Quiz, QuizAttempt.quiz_id == Quiz.id
+    )
+    if topic_ids is not None:
+        hot_query = hot_query.filter(Quiz.topic_id.in_(topic_ids))
+    for row in hot_query.order_by(QuizAttempt.completed_at, QuizAttempt.id).yield_per(1000):
+        review(*row)
+
+    rows = db.query(ReviewSchedule)
+    if topic_ids is not None:
+        rows = rows.filter(ReviewSchedule.topic_id.in_(topic_ids))
+    if user_ids is None:
+        rows.delete(synchronize_session=False)
+    else:
+        ordered = sorted(user_ids)
+        for start in range(0, len(ordered), REBUILD_CHUNK):
+            rows.filter(ReviewSchedule.user_id.in_(ordered[start:start + REBUILD_CHUNK])).delete(
+                synchronize_session=False
+            )
+    db.add_all(
+        ReviewSchedule(
+            user_id=user_id, topic_id=topic_id, repetitions=state.repetitions,
+            interval_days=state.interval_days, ease_factor=state.ease_factor,
+            due_at=reviewed_at + timedelta(days=state.interval_days),
+            last_score=score, last_reviewed_at=reviewed_at,
+        )
+        for (user_id, topic_id), (state, score, reviewed_at) in states.items()
+    )
+    db.commit()
+    return len(states)
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Spaced-repetition schedule maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="rebuild all schedules from the stored attempts")
+    counts = sub.add_parser("due-counts", help="precompute the reviews due per learner for a day")
+    counts.add_argument("--day", type=date.fromisoformat, default=None, help="YYYY-MM-DD (default: today, UTC)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            logger.info(f"Rebuilt {rebuild_schedule(session)} review schedules")
+        else:
+            day = args.day or datetime.utcnow().date()
+            logger.info(f"Stored review due counts for {compute_due_counts(session, day)} learners on {day}")
+    finally:
+        session.close()
@@ -1,7 +1,7 @@
 """
 SQLAlchemy database models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database import Base
@@ -54,6 +54,26 @@ class Topic(Base):
     course = relationship("Course", back_populates="topics")
     quizzes = relationship("Quiz", back_populates="topic", cascade="all, delete-orphan")
     performances = relationship("Performance", back_populates="topic")
+    
+    __table_args__ = (
+        # Topics of a learner's enrolled courses, in course order
+        Index("ix_topics_course_order", "course_id", "order_index"),
+    )
+
+class Enrollment(Base):
+    """
+    A learner's enrollment in a course (their curriculum)
+    """
+    __tablename__ = "enrollments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
+    enrolled_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_enrollments_user_course", "user_id", "course_id", unique=True),
+    )
 
 class Quiz(Base):
     """
@@ -88,6 +108,13 @@ class QuizAttempt(Base):
     # Relationships
     user = relationship("User", back_populates="quiz_attempts")
     quiz = relationship("Quiz", back_populates="attempts")
+    
+    __table_args__ = (
+        # Per-user history, newest first (keyset pagination)
+        Index("ix_quiz_attempts_user_completed", "user_id", "completed_at", "id"),
+        # All attempts of one quiz in id order (re-grading)
+        Index("ix_quiz_attempts_quiz", "quiz_id", "id"),
+    )
 
 class Performance(Base):
     """
@@ -104,3 +131,174 @@ class Performance(Base):
     # Relationships
     user = relationship("User", back_populates="performances")
     topic = relationship("Topic", back_populates="performances")
+    
+    __table_args__ = (
+        Index("ix_performances_user_id", "user_id", "id"),
+    )
+
+class UserTopicStats(Base):
+    """
+    Per-user, per-topic aggregates derived from quiz attempts and time tracking
+    """
+    __tablename__ = "user_topic_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    attempts_count = Column(Integer, default=0)
+    score_sum = Column(Float, default=0.0)
+    best_score = Column(Float, default=0.0)
+    passed_count = Column(Integer, default=0)  # Attempts scoring >= 60
+    time_spent_minutes = Column(Float, default=0.0)
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_user_topic_stats_user_topic", "user_id", "topic_id", unique=True),
+    )
+
+class TopicMastery(Base):
+    """
+    Online per-user, per-topic ability estimate (Elo-style rating)
+    """
+    __tablename__ = "topic_mastery"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    rating = Column(Float, default=0.0)  # Learner ability on the logit scale
+    attempts_count = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_topic_mastery_user_topic", "user_id", "topic_id", unique=True),
+    )
+
+class TopicRating(Base):
+    """
+    Topic difficulty learned from every learner's attempts (Elo-style rating)
+    """
+    __tablename__ = "topic_ratings"
+    
+    topic_id = Column(Integer, ForeignKey("topics.id"), primary_key=True)
+    rating = Column(Float, default=0.0)  # Difficulty on the logit scale
+    attempts_count = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UserDailyStats(Base):
+    """
+    Per-user, per-day rollup of quiz attempts and time tracking
+    """
+    __tablename__ = "user_daily_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    attempts_count = Column(Integer, default=0)
+    score_sum = Column(Float, default=0.0)
+    passed_count = Column(Integer, default=0)  # Attempts scoring >= 60
+    time_spent_minutes = Column(Float, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_user_daily_stats_user_day", "user_id", "day", unique=True),
+    )
+
+class ArchivedTopicStats(Base):
+    """
+    Per-user, per-topic totals of quiz attempts moved to the cold archive
+    """
+    __tablename__ = "archived_topic_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    attempts_count = Column(Integer, default=0)
+    score_sum = Column(Float, default=0.0)
+    best_score = Column(Float, default=0.0)
+    passed_count = Column(Integer, default=0)  # Attempts scoring >= 60
+    first_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    last_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_archived_topic_stats_user_topic", "user_id", "topic_id", unique=True),
+    )
+
+class AttemptArchivePart(Base):
+    """
+    One columnar file of archived quiz attempts (the archive's manifest)
+    """
+    __tablename__ = "attempt_archive_parts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String, nullable=False)  # YYYY-MM partition
+    path = Column(String, nullable=False, unique=True)  # Relative to ARCHIVE_DIR
+    rows = Column(Integer, nullable=False)
+    min_attempt_id = Column(Integer, nullable=False)
+    max_attempt_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class LeaderboardEntry(Base):
+    """
+    A learner's best result on one topic or course leaderboard
+
+    Topic entries hold the best score on the topic's quizzes; course entries
+    the sum of the learner's topic bests in the course. Ties rank by the
+    earlier achieved_at.
+    """
+    __tablename__ = "leaderboard_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String, nullable=False)  # "topic" or "course"
+    scope_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    best_score = Column(Float, nullable=False)
+    achieved_at = Column(DateTime(timezone=True), nullable=False)
+    
+    __table_args__ = (
+        Index("ix_leaderboard_entries_user_board", "user_id", "scope", "scope_id", unique=True),
+        # Board order: an index range scan returns a leaderboard already ranked
+        Index("ix_leaderboard_entries_rank", "scope", "scope_id", best_score.desc(), "achieved_at", "user_id"),
+    )
+
+class ReviewSchedule(Base):
+    """
+    Spaced-repetition state (SM-2) of one learner on one topic
+    """
+    __tablename__ = "review_schedule"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    repetitions = Column(Integer, default=0)  # Successful reviews in a row
+    interval_days = Column(Float, default=0.0)
+    ease_factor = Column(Float, default=2.5)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    last_score = Column(Float, nullable=True)
+    last_reviewed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_review_schedule_user_topic", "user_id", "topic_id", unique=True),
+        # A learner's queue, most overdue first
+        Index("ix_review_schedule_user_due", "user_id", "due_at", "topic_id"),
+        # Everything due before a time, per user (nightly due counts)
+        Index("ix_review_schedule_due_user", "due_at", "user_id"),
+    )
+
+class ReviewDueCount(Base):
+    """
+    Reviews due per learner on a day, precomputed nightly for notifications
+    """
+    __tablename__ = "review_due_counts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    due_count = Column(Integer, nullable=False)
+    overdue_count = Column(Integer, nullable=False)  # Already due before the day started
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_review_due_counts_day_user", "day", "user_id", unique=True),
+    )
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination helpers for per-user history listings
+
+Pages are ordered newest first by (timestamp, id). The cursor is an opaque
+token holding the last row's key; the next page is fetched with a row-value
+comparison that walks the (user_id, timestamp, id) index instead of
+OFFSET-scanning the whole history. Listings whose timestamp can change or be
+NULL page on the primary key alone (id_keyset_page), so no row can move
+between pages.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import String, tuple_, type_coerce
+from backend.responses import dumps
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*key) -> str:
+    """
+    Encode a row's sort key, (timestamp, id) or (id,), as an opaque URL-safe cursor
+    """
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_key(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a (timestamp, id) cursor produced by encode_cursor
+    """
+    key = _decode_key(cursor)
+    # A NULL timestamp has no place in the ordering; never compare against "None"
+    if len(key) != 2 or not isinstance(key[0], str) or not isinstance(key[1], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key[0], key[1]
+
+
+def decode_id_cursor(cursor: str) -> int:
+    """
+    Decode an (id,) cursor produced by encode_cursor
+    """
+    key = _decode_key(cursor)
+    if len(key) != 1 or not isinstance(key[0], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key[0]
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Parse a comma-separated field projection, defaulting to all fields
+    """
+    if not fields:
+        return list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return requested
+
+
+def project_row(row, fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    Serialize the selected fields of a result row to JSON-ready values
+    """
+    result = {}
+    for field in fields:
+        value = getattr(row, field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        result[field] = value
+    return result
+
+
+def raw_timestamp(column):
+    """
+    A timestamp column read as its stored text
+
+    SQLite keeps DateTime values as text whose format depends on who wrote
+    them (CURRENT_TIMESTAMP has no microseconds). Comparing cursors against
+    the stored text keeps tie-breaking exact; the SQL is unchanged, so the
+    index is still used.
+    """
+    return type_coerce(column, String)
+
+
+def keyset_page(query, timestamp_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Apply newest-first keyset ordering, the cursor predicate and limit+1
+    """
+    ts = raw_timestamp(timestamp_column)
+    if cursor:
+        cursor_ts, cursor_id = decode_cursor(cursor)
+        query = query.filter(tuple_(ts, id_column) < tuple_(cursor_ts, cursor_id))
+    return query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def id_keyset_page(query, id_column, cursor: Optional[str], limit: int):
+    """
+    Apply newest-first ordering on the primary key, the cursor predicate and limit+1
+    """
+    if cursor:
+        query = query.filter(id_column < decode_id_cursor(cursor))
+    return query.order_by(id_column.desc()).limit(limit + 1)
+
+
+def stream_page(
+    rows: Sequence[Any],
+    limit: int,
+    serialize: Callable[[Any], Dict[str, Any]],
+    cursor_key: Callable[[Any], tuple],
+) -> StreamingResponse:
+    """
+    Stream one page as a JSON array, with the next cursor in X-Next-Cursor
+
+    `rows` holds up to limit+1 rows; the extra row only signals that
+    another page exists.
+    """
+    has_more = len(rows) > limit
+    page = rows[:limit]
+    headers = {}
+    if has_more and page:
+        headers["X-Next-Cursor"] = encode_cursor(*cursor_key(page[-1]))
+
+    def body() -> Iterable[bytes]:
+        yield b"["
+        for i, row in enumerate(page):
+            if i:
+                yield b","
+            yield dumps(serialize(row))
+        yield b"]"
+
+    return StreamingResponse(body(), media_type="application/json", headers=headers)
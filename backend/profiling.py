@@ -0,0 +1,213 @@
+"""
+On-demand per-request CPU profiling
+
+A request is profiled when an administrator sends the X-Profile header, or
+when it is picked by random sampling (PROFILE_SAMPLE_RATE). The endpoint body
+runs under cProfile and the result is written to PROFILE_DIR as a .prof file
+(pstats format, viewable with snakeviz or `python -m pstats`) plus a JSON
+sidecar tagged with route, user and duration.
+
+Only one cProfile profiler can be active per process on recent Pythons, so
+concurrent profiled requests take turns: a request that finds the profiler
+busy runs unprofiled and nothing is saved for it.
+"""
+import asyncio
+import cProfile
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+from anyio import to_thread
+from fastapi.routing import APIRoute
+from backend.auth import get_bearer_token, get_token_subject, is_admin_username
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Fraction of requests profiled without the header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "x-profile"
+
+_active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+# Held while an endpoint runs under a profiler
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Profiler state for a single request
+    """
+
+    def __init__(self, method: str, path: str, reason: str):
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.route = path
+        self.user = None
+        self.profiler = cProfile.Profile()
+        self.started_at = time.time()
+        self.duration_ms = None
+        # Whether the endpoint actually ran under the profiler
+        self.profiled = False
+
+    def tag(self) -> str:
+        route = re.sub(r"[^A-Za-z0-9]+", "-", self.route).strip("-") or "root"
+        user = re.sub(r"[^A-Za-z0-9_.-]+", "-", str(self.user or "anonymous"))
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(self.started_at))
+        return f"{stamp}-{int(self.started_at * 1000) % 1000:03d}_{self.method}_{route}_{user}"
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """
+        Write the pstats dump and its metadata, returning the .prof path
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.tag())
+        self.profiler.dump_stats(base + ".prof")
+        with open(base + ".json", "w") as f:
+            json.dump({
+                "method": self.method,
+                "path": self.path,
+                "route": self.route,
+                "user": self.user,
+                "reason": self.reason,
+                "started_at": self.started_at,
+                "duration_ms": self.duration_ms,
+            }, f, indent=2)
+        return base + ".prof"
+
+
+def _should_profile(scope) -> Optional[str]:
+    """
+    Return why a request should be profiled, or None
+    """
+    headers = dict(scope.get("headers", []))
+    if headers.get(PROFILE_HEADER.encode(), b"").lower() in (b"1", b"true", b"yes"):
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if is_admin_username(get_token_subject(get_bearer_token(authorization))):
+            return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware deciding which requests to profile and saving the results
+    """
+
+    def __init__(self, app, directory: str = PROFILE_DIR):
+        self.app = app
+        self.directory = directory
+
+    async def __call__(self, scope, receive, send):
+        reason = _should_profile(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], reason)
+        token = _active_profile.set(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _active_profile.reset(token)
+            if not profile.profiled:
+                logger.info(f"Skipped profiling {profile.method} {profile.path}: another request holds the profiler")
+                return
+            profile.duration_ms = round((time.time() - profile.started_at) * 1000, 2)
+            try:
+                path = await to_thread.run_sync(profile.save, self.directory)
+                logger.info(f"Saved request profile {path} ({profile.duration_ms} ms)")
+            except Exception as e:
+                logger.error(f"Error saving request profile: {e}")
+
+
+def _note_request(profile: RequestProfile, route_path: Optional[str], kwargs: dict):
+    if route_path:
+        profile.route = route_path
+    user = kwargs.get("current_user")
+    if user is not None:
+        profile.user = getattr(user, "username", None) or getattr(user, "id", None)
+
+
+def _start_profiler(profile: RequestProfile) -> bool:
+    """
+    Enable the request's profiler unless another one is running
+
+    Returns False (and leaves the profiler off) when the lock is taken or
+    cProfile refuses because a different profiling tool is active.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return False
+    try:
+        profile.profiler.enable()
+    except ValueError as e:
+        _profiler_lock.release()
+        logger.warning(f"Could not enable the profiler: {e}")
+        return False
+    profile.profiled = True
+    return True
+
+
+def _stop_profiler(profile: RequestProfile):
+    profile.profiler.disable()
+    _profiler_lock.release()
+
+
+def _wrap_endpoint(endpoint, route_path: str):
+    """
+    Run the endpoint under the request's profiler, if one is active
+
+    Sync endpoints execute in a threadpool worker, so the profiler has to be
+    enabled around the call itself rather than in the middleware.
+    """
+    if getattr(endpoint, "_profiled", False):
+        # Re-registered by include_router: keep the prefixed path
+        endpoint._route_path = route_path
+        return endpoint
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = _active_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            _note_request(profile, wrapper._route_path, kwargs)
+            if not _start_profiler(profile):
+                return await endpoint(*args, **kwargs)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _stop_profiler(profile)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = _active_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            _note_request(profile, wrapper._route_path, kwargs)
+            if not _start_profiler(profile):
+                return endpoint(*args, **kwargs)
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _stop_profiler(profile)
+
+    wrapper._profiled = True
+    wrapper._route_path = route_path
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute whose endpoint can be profiled on demand
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _wrap_endpoint(endpoint, path), **kwargs)
@@ -0,0 +1,206 @@
+"""
+Query debugging for dev and test mode: N+1 detection and query budgets
+
+Hooks SQLAlchemy's before_cursor_execute event on the engine and records
+every statement, grouped by its normalized shape (literals and IN-lists
+collapsed). Requests are tracked by QueryDebugMiddleware; tests pin query
+counts with query_budget().
+"""
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from backend.database import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+# Dev mode: "" (off), "warn" or "raise"
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "").lower()
+# A statement shape repeated more than this many times per request is flagged
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_request_recorder: ContextVar[Optional["QueryRecorder"]] = ContextVar("query_recorder", default=None)
+_global_recorders: List["QueryRecorder"] = []
+_global_lock = threading.Lock()
+_installed_engines = set()
+
+
+class NPlusOneError(RuntimeError):
+    """
+    Raised in "raise" mode when a request repeats a statement shape too often
+    """
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a query_budget block runs more queries than allowed
+    """
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape so repeated lookups group together
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryRecorder:
+    """
+    Collects the statements executed while it is active
+    """
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.statements: List[str] = []
+        self.shapes: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str):
+        with self._lock:
+            self.statements.append(statement)
+            self.shapes[normalize_sql(statement)] += 1
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """
+        Statement shapes executed more than `threshold` times
+        """
+        return {shape: n for shape, n in self.shapes.items() if n > threshold}
+
+    def summary(self, limit: int = 5) -> str:
+        lines = [f"{self.count} queries{' for ' + self.label if self.label else ''}"]
+        for shape, n in self.shapes.most_common(limit):
+            lines.append(f"  {n}x {shape}")
+        return "\n".join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _request_recorder.get()
+    if recorder is not None:
+        recorder.record(statement)
+    if _global_recorders:
+        with _global_lock:
+            recorders = list(_global_recorders)
+        for recorder in recorders:
+            recorder.record(statement)
+
+
+def install_query_listener(engine=None):
+    """
+    Register the statement hook on an engine (idempotent)
+    """
+    engine = engine or default_engine
+    if id(engine) in _installed_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    _installed_engines.add(id(engine))
+
+
+def check_repeats(recorder: QueryRecorder, threshold: int = QUERY_REPEAT_THRESHOLD, mode: str = "warn"):
+    """
+    Warn or raise when a statement shape repeats more than `threshold` times
+    """
+    repeated = recorder.repeated(threshold)
+    if not repeated:
+        return
+    details = "\n".join(f"  {n}x {shape}" for shape, n in sorted(repeated.items(), key=lambda x: -x[1]))
+    message = f"Possible N+1 in {recorder.label or 'block'} ({recorder.count} queries):\n{details}"
+    if mode == "raise":
+        raise NPlusOneError(message)
+    logger.warning(message)
+
+
+class QueryDebugMiddleware:
+    """
+    ASGI middleware recording the queries of each request
+
+    Adds an X-Query-Count header and reports repeated statement shapes.
+    The check runs when the response starts, so in "raise" mode the
+    NPlusOneError still turns the request into a 500. Queries run while
+    streaming the body are checked once it is sent, and can only be logged.
+    """
+
+    def __init__(self, app, threshold: int = QUERY_REPEAT_THRESHOLD, mode: str = "warn"):
+        self.app = app
+        self.threshold = threshold
+        self.mode = mode
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = QueryRecorder(label=f"{scope['method']} {scope['path']}")
+        checked = []  # Query count at the check made on response start
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                checked.append(recorder.count)
+                check_repeats(recorder, self.threshold, self.mode)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(recorder.count).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _request_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            _request_recorder.reset(token)
+        if checked and recorder.count > checked[0]:
+            check_repeats(recorder, self.threshold, "warn")
+
+
+class query_budget(ContextDecorator):
+    """
+    Assert that a block (or decorated function) runs at most `max_queries` queries
+
+    Records every statement on the engine while active, including those run
+    by a TestClient in its own thread. Optionally also fails on repeated
+    statement shapes:
+
+        with query_budget(3):
+            client.get("/api/courses/", headers=headers)
+    """
+
+    def __init__(self, max_queries: int, repeat_threshold: Optional[int] = None, engine=None):
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+        self.engine = engine
+        self.recorder = None
+
+    def __enter__(self):
+        install_query_listener(self.engine)
+        self.recorder = QueryRecorder(label=f"query_budget({self.max_queries})")
+        with _global_lock:
+            _global_recorders.append(self.recorder)
+        return self.recorder
+
+    def __exit__(self, exc_type, exc, tb):
+        with _global_lock:
+            _global_recorders.remove(self.recorder)
+        if exc_type is not None:
+            return False
+        if self.recorder.count > self.max_queries:
+            raise QueryBudgetExceeded(
+                f"Expected at most {self.max_queries} queries, got {self.recorder.summary()}"
+            )
+        if self.repeat_threshold is not None:
+            check_repeats(self.recorder, self.repeat_threshold, mode="raise")
+        return False
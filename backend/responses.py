@@ -0,0 +1,62 @@
+"""
+Fast JSON responses
+
+FastJSONResponse is the app's default response class: it serializes with
+orjson (several times faster than the stdlib encoder, and it understands
+numpy scalars/arrays and datetimes natively) and falls back to `json` when
+orjson isn't installed.
+
+Endpoints whose payload is built internally from trusted data can return
+`fast_response(...)` with plain dicts: returning a Response skips FastAPI's
+response_model validation and jsonable_encoder pass, while the declared
+response_model still documents the shape in OpenAPI.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+)
+
+
+def _default(value: Any):
+    """
+    Stdlib fallback for the types orjson handles natively
+    """
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize to compact JSON bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when available
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    """
+    Serialize trusted internal data directly, without response_model validation
+    """
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
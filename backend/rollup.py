@@ -0,0 +1,213 @@
+"""
+Per-user daily rollup for time-series analytics
+
+`user_daily_stats` holds one row per user and day: attempts, score sum,
+passing attempts and minutes tracked. A quiz submission increments the
+day's row in the transaction that stores the attempt, and time tracking
+right after its own commit, so progress series read O(days) rows instead
+of every attempt. Weekly and monthly series are
+summed from the daily rows.
+
+Rebuild the rollup from the attempts (archive included) and time tracking
+with `python -m backend.rollup`. Time tracking only keeps a running total
+per topic, so backfilled minutes land on the record's last_accessed day.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.archive import iter_archived_attempts, iter_user_attempts
+from backend.models import Performance, QuizAttempt, UserDailyStats
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ("day", "week", "month")
+PASS_SCORE = 60
+
+
+@dataclass(frozen=True)
+class DayTotals:
+    day: date
+    attempts_count: int
+    score_sum: float
+    passed_count: int
+    time_spent_minutes: float
+
+
+def period_start(day: date, granularity: str) -> date:
+    """
+    First day of the day/week (Monday)/month containing `day`
+    """
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def today() -> date:
+    # Attempt times come from SQLite's CURRENT_TIMESTAMP, which is UTC
+    return datetime.utcnow().date()
+
+
+def _apply(db: Session, user_id: int, day: date, attempts: int, score_sum: float, passed: int, minutes: float):
+    row = db.query(UserDailyStats).filter(UserDailyStats.user_id == user_id, UserDailyStats.day == day).first()
+    if row is None:
+        db.add(UserDailyStats(
+            user_id=user_id, day=day, attempts_count=attempts, score_sum=score_sum,
+            passed_count=passed, time_spent_minutes=minutes
+        ))
+    else:
+        # Concurrent writes for the same day add up: increment in SQL
+        row.attempts_count = UserDailyStats.attempts_count + attempts
+        row.score_sum = UserDailyStats.score_sum + score_sum
+        row.passed_count = UserDailyStats.passed_count + passed
+        row.time_spent_minutes = UserDailyStats.time_spent_minutes + minutes
+
+
+def record_daily(db: Session, user_id: int, day: date, attempts: int = 0, score_sum: float = 0.0,
+                 passed: int = 0, minutes: float = 0.0):
+    """
+    Add to a user's row for `day`
+
+    Flushes without committing, so the totals land with the caller's changes.
+    """
+    _apply(db, user_id, day, attempts, score_sum, passed, minutes)
+    db.flush()
+
+
+def apply_daily_deltas(db: Session, deltas: Dict[Tuple[int, date], Tuple[float, int]]):
+    """
+    Add (score sum, passed) corrections per (user, day), e.g. after a re-grade
+
+    Does not commit, so the corrections land with the caller's own changes.
+    """
+    for (user_id, day), (score_delta, passed_delta) in sorted(deltas.items()):
+        _apply(db, user_id, day, 0, score_delta, passed_delta, 0.0)
+
+
+def record_attempt(db: Session, user_id: int, completed_at: Optional[datetime], score: float):
+    day = completed_at.date() if completed_at is not None else today()
+    record_daily(db, user_id, day, attempts=1, score_sum=score, passed=1 if score >= PASS_SCORE else 0)
+
+
+def record_minutes(db: Session, user_id: int, minutes: float):
+    """
+    Add tracked minutes to today's row and commit
+    """
+    try:
+        record_daily(db, user_id, today(), minutes=minutes)
+        db.commit()
+    except IntegrityError:
+        # A concurrent write created the same row first; add on top of it
+        db.rollback()
+        record_daily(db, user_id, today(), minutes=minutes)
+        db.commit()
+
+
+def load_daily(db: Session, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> List[DayTotals]:
+    """
+    A user's daily rows between `start` and `end` (inclusive), oldest first
+    """
+    query = db.query(
+        UserDailyStats.day, UserDailyStats.attempts_count, UserDailyStats.score_sum,
+        UserDailyStats.passed_count, UserDailyStats.time_spent_minutes,
+    ).filter(UserDailyStats.user_id == user_id)
+    if start is not None:
+        query = query.filter(UserDailyStats.day >= start)
+    if end is not None:
+        query = query.filter(UserDailyStats.day <= end)
+    return [DayTotals(*row) for row in query.order_by(UserDailyStats.day).all()]
+
+
+def aggregate(days: List[DayTotals], granularity: str = "day") -> List[dict]:
+    """
+    Sum daily rows into day/week/month periods (only periods with activity)
+    """
+    periods: Dict[date, list] = {}
+    for d in days:
+        # [attempts, score sum, passed, minutes]
+        p = periods.setdefault(period_start(d.day, granularity), [0, 0.0, 0, 0.0])
+        p[0] += d.attempts_count
+        p[1] += d.score_sum
+        p[2] += d.passed_count
+        p[3] += d.time_spent_minutes
+    return [
+        {
+            "period": start.isoformat(),
+            "attempts_count": attempts,
+            "average_score": score_sum / attempts if attempts else 0,
+            "passed_count": passed,
+            "time_spent_minutes": minutes,
+        }
+        for start, (attempts, score_sum, passed, minutes) in sorted(periods.items())
+    ]
+
+
+def rebuild_daily_stats(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the rollup (all users, or one) from attempts and time tracking
+    """
+    totals: Dict[Tuple[int, date], list] = {}
+
+    def add(uid, day, attempts=0, score_sum=0.0, passed=0, minutes=0.0):
+        t = totals.setdefault((uid, day), [0, 0.0, 0, 0.0])
+        t[0] += attempts
+        t[1] += score_sum
+        t[2] += passed
+        t[3] += minutes
+
+    archived = (
+        iter_user_attempts(user_id) if user_id is not None
+        else iter_archived_attempts(["user_id", "score", "completed_at"])
+    )
+    for a in archived:
+        add(a["user_id"], date.fromisoformat(a["completed_at"][:10]), 1, a["score"], int(a["score"] >= PASS_SCORE))
+
+    attempts_query = db.query(
+        QuizAttempt.user_id, func.date(QuizAttempt.completed_at), func.count(QuizAttempt.id),
+        func.sum(QuizAttempt.score), func.sum(case((QuizAttempt.score >= PASS_SCORE, 1), else_=0)),
+    ).group_by(QuizAttempt.user_id, func.date(QuizAttempt.completed_at))
+    minutes_query = db.query(
+        Performance.user_id, func.date(Performance.last_accessed), func.sum(Performance.time_spent_minutes)
+    ).group_by(Performance.user_id, func.date(Performance.last_accessed))
+    stats_query = db.query(UserDailyStats)
+    if user_id is not None:
+        attempts_query = attempts_query.filter(QuizAttempt.user_id == user_id)
+        minutes_query = minutes_query.filter(Performance.user_id == user_id)
+        stats_query = stats_query.filter(UserDailyStats.user_id == user_id)
+
+    for uid, day, count, score_sum, passed in attempts_query.all():
+        add(uid, date.fromisoformat(day), count, score_sum or 0.0, passed or 0)
+    for uid, day, minutes in minutes_query.all():
+        add(uid, date.fromisoformat(day), minutes=minutes or 0.0)
+
+    stats_query.delete(synchronize_session=False)
+    db.add_all(
+        UserDailyStats(user_id=uid, day=day, attempts_count=attempts, score_sum=score_sum,
+                       passed_count=passed, time_spent_minutes=minutes)
+        for (uid, day), (attempts, score_sum, passed, minutes) in totals.items()
+    )
+    db.commit()
+    return len(totals)
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild the user_daily_stats rollup")
+    parser.add_argument("--user-id", type=int, default=None, help="rebuild one user only")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    session = SessionLocal()
+    try:
+        rows = rebuild_daily_stats(session, args.user_id)
+    finally:
+        session.close()
+    logger.info(f"Rebuilt {rows} daily rollup rows")
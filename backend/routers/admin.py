@@ -0,0 +1,121 @@
+"""
+Admin routes: batch scoring of many learners, leaderboard checks,
+cross-tenant reports
+"""
+import logging
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.database import DEFAULT_TENANT, SessionLocal, current_tenant, fan_out, get_db
+from backend.models import ArchivedTopicStats, Course, Enrollment, QuizAttempt, User
+from backend.schemas import BatchScoreRequest, TenantSummary
+from backend.profiling import ProfiledRoute
+from backend.auth import get_current_admin
+from backend.responses import dumps
+from backend.routers.recommendations import gap_items, topic_items
+
+logger = logging.getLogger(__name__)
+
+# Learners accepted by one batch request
+BATCH_MAX_USERS = 10000
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.post("/batch-scores")
+def batch_scores(
+    request: BatchScoreRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Topic recommendations and knowledge gaps for a list of learners or a course
+
+    Streams NDJSON, one BatchScoreResult line per learner in user id order.
+    Learners are scored in chunks with the vectorized models in
+    backend.ml.batch, so lines start arriving before the batch is complete.
+    """
+    if (request.user_ids is None) == (request.course_id is None):
+        raise HTTPException(status_code=400, detail="Give either user_ids or course_id")
+    if not 1 <= request.limit <= 50:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 50")
+
+    if request.course_id is not None:
+        user_ids = [
+            user_id for (user_id,) in
+            db.query(Enrollment.user_id).filter(Enrollment.course_id == request.course_id).all()
+        ]
+    else:
+        known = db.query(User.id).filter(User.id.in_(set(request.user_ids))).all()
+        user_ids = [user_id for (user_id,) in known]
+    if len(user_ids) > BATCH_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_USERS} learners per batch")
+
+    from backend.ml.batch import iter_batch_scores
+
+    limit = request.limit
+    logger.info(f"Batch scoring {len(user_ids)} learners for {current_user.username}")
+
+    def body():
+        # The request's session may be closed once streaming starts
+        session = SessionLocal()
+        try:
+            for result in iter_batch_scores(session, user_ids, limit):
+                yield dumps({
+                    "user_id": result["user_id"],
+                    "recommendations": topic_items(result["recommendations"]),
+                    "knowledge_gaps": gap_items(result["knowledge_gaps"]),
+                }) + b"\n"
+        finally:
+            session.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.get("/leaderboards/verify")
+def verify_leaderboard_state(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Check the leaderboard table and this worker's in-memory ranks
+
+    Slow: recomputes every entry from the attempts and the archive.
+    """
+    from backend.leaderboard import verify_leaderboards
+
+    problems = verify_leaderboards(db)
+    return {"ok": not problems, "problems": problems[:100], "problem_count": len(problems)}
+
+def tenant_summary(db: Session) -> dict:
+    """
+    Size and activity of one tenant's database
+    """
+    attempts, score_sum, last_attempt_at = db.query(
+        func.count(QuizAttempt.id), func.coalesce(func.sum(QuizAttempt.score), 0.0), func.max(QuizAttempt.completed_at)
+    ).one()
+    archived, archived_sum = db.query(
+        func.coalesce(func.sum(ArchivedTopicStats.attempts_count), 0),
+        func.coalesce(func.sum(ArchivedTopicStats.score_sum), 0.0),
+    ).one()
+    total = attempts + archived
+    return {
+        "tenant": current_tenant.get(),
+        "users": db.query(func.count(User.id)).scalar(),
+        "courses": db.query(func.count(Course.id)).scalar(),
+        "quiz_attempts": total,
+        "average_score": (score_sum + archived_sum) / total if total else None,
+        "last_attempt_at": last_attempt_at,
+    }
+
+@router.get("/tenants", response_model=List[TenantSummary])
+def tenant_report(current_user: User = Depends(get_current_admin)):
+    """
+    Users, courses and quiz activity of every tenant
+
+    Queries all tenant databases in parallel (backend.database.fan_out).
+    Only for administrators of the default tenant.
+    """
+    if current_tenant.get() != DEFAULT_TENANT:
+        raise HTTPException(status_code=403, detail="Cross-tenant reports need an administrator of the default tenant")
+    return list(fan_out(tenant_summary).values())
@@ -3,20 +3,28 @@ Analytics and dashboard routes with visualizations
 """
 import base64
 import io
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-from backend.database import get_db
+from backend.database import SessionLocal, get_db
 from backend.models import User, Topic, QuizAttempt, Performance
-from backend.schemas import DashboardData, ProgressData, TopicPerformanceData
-from backend.auth import get_current_user
+from backend.schemas import DashboardData, ProgressPeriodData
+from backend.profiling import ProfiledRoute
+from backend.auth import get_bearer_token, get_current_user
+from backend.live import live_broker
+from backend.responses import fast_response
+from backend.rollup import aggregate, load_daily
+from backend.snapshot import PROGRESS_DAYS, UserSnapshot, load_user_snapshot
+from backend.warmup import get_pyplot
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Longest window for the progress series and chart (10 years)
+MAX_SERIES_DAYS = 3660
 
 @router.get("/dashboard", response_model=DashboardData)
 def get_dashboard_data(
@@ -26,118 +34,132 @@ def get_dashboard_data(
     """
     Get comprehensive dashboard data for analytics
     """
-    # Get all topics
-    all_topics = db.query(Topic).all()
+    # Plain dicts shaped like DashboardData, serialized without re-validation
+    return fast_response(build_dashboard(load_user_snapshot(db, current_user.id)))
+
+def build_dashboard(snapshot: UserSnapshot) -> dict:
+    """
+    Dashboard numbers (DashboardData shape) from a preloaded user snapshot
+    """
+    # Topics of the user's enrolled courses
+    all_topics = snapshot.topics
     total_topics = len(all_topics)
     
-    # Get user's quiz attempts
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id).all()
-    
-    # Calculate completed topics (topics with at least one attempt scoring >= 60)
-    completed_topics = set()
-    topic_scores = {}
-    
-    for attempt in attempts:
-        quiz = attempt.quiz
-        topic_id = quiz.topic_id
-        
-        if topic_id not in topic_scores:
-            topic_scores[topic_id] = []
-        topic_scores[topic_id].append(attempt.score)
-        
-        if attempt.score >= 60:
-            completed_topics.add(topic_id)
+    # Per-topic totals, archived attempts included
+    totals = snapshot.topic_totals()
     
-    completed_count = len(completed_topics)
+    # Calculate completed topics (curriculum topics with at least one attempt scoring >= 60)
+    completed_count = sum(1 for t in all_topics if t.id in totals and totals[t.id].passed_count > 0)
     completion_percentage = (completed_count / total_topics * 100) if total_topics > 0 else 0
     
     # Calculate average score
-    all_scores = [attempt.score for attempt in attempts]
-    average_score = sum(all_scores) / len(all_scores) if all_scores else 0
+    total_attempts = sum(t.attempts_count for t in totals.values())
+    total_passed = sum(t.passed_count for t in totals.values())
+    total_score = sum(t.score_sum for t in totals.values())
+    average_score = total_score / total_attempts if total_attempts else 0
     
-    # Progress over time (last 30 days)
+    # Progress over time (last 30 days), read from the daily rollup: the
+    # running totals start from everything before the window
     progress_data = []
     end_date = datetime.now()
-    start_date = end_date - timedelta(days=30)
+    start_date = end_date - timedelta(days=PROGRESS_DAYS)
+    window = [d for d in snapshot.daily if d.day >= start_date.date()]
+    by_day = {d.day: d for d in window}
+    passed_by_date = total_passed - sum(d.passed_count for d in window)
+    count_by_date = total_attempts - sum(d.attempts_count for d in window)
+    score_by_date = total_score - sum(d.score_sum for d in window)
     
     current_date = start_date
-    cumulative_completed = 0
     
     while current_date <= end_date:
-        # Count topics completed by this date
-        completed_by_date = sum(
-            1 for attempt in attempts
-            if attempt.completed_at <= current_date and attempt.score >= 60
-        )
-        
-        # Get average score up to this date
-        scores_by_date = [
-            attempt.score for attempt in attempts
-            if attempt.completed_at <= current_date
-        ]
-        avg_score_by_date = sum(scores_by_date) / len(scores_by_date) if scores_by_date else 0
+        day = by_day.get(current_date.date())
+        if day is not None:
+            passed_by_date += day.passed_count
+            count_by_date += day.attempts_count
+            score_by_date += day.score_sum
         
-        progress_data.append(ProgressData(
-            date=current_date.strftime("%Y-%m-%d"),
-            topics_completed=completed_by_date,
-            average_score=avg_score_by_date
-        ))
+        progress_data.append({
+            "date": current_date.strftime("%Y-%m-%d"),
+            "topics_completed": passed_by_date,
+            "average_score": score_by_date / count_by_date if count_by_date else 0
+        })
         
         current_date += timedelta(days=1)
     
     # Topic-wise performance
     topic_performances = []
     for topic in all_topics:
-        if topic.id in topic_scores:
-            scores = topic_scores[topic.id]
-            avg_score = sum(scores) / len(scores)
-            attempts_count = len(scores)
+        if topic.id in totals:
+            avg_score = totals[topic.id].average
+            attempts_count = totals[topic.id].attempts_count
             completion_status = "Completed" if avg_score >= 60 else "In Progress"
         else:
             avg_score = 0
             attempts_count = 0
             completion_status = "Not Started"
         
-        topic_performances.append(TopicPerformanceData(
-            topic_id=topic.id,
-            topic_title=topic.title,
-            average_score=avg_score,
-            attempts_count=attempts_count,
-            completion_status=completion_status
-        ))
-    
-    return DashboardData(
-        total_topics=total_topics,
-        completed_topics=completed_count,
-        completion_percentage=round(completion_percentage, 2),
-        average_score=round(average_score, 2),
-        progress_over_time=progress_data[-30:],  # Last 30 days
-        topic_performances=topic_performances
-    )
+        topic_performances.append({
+            "topic_id": topic.id,
+            "topic_title": topic.title,
+            "average_score": avg_score,
+            "attempts_count": attempts_count,
+            "completion_status": completion_status
+        })
+    
+    return {
+        "total_topics": total_topics,
+        "completed_topics": completed_count,
+        "completion_percentage": round(completion_percentage, 2),
+        "average_score": round(average_score, 2),
+        "progress_over_time": progress_data[-30:],  # Last 30 days
+        "topic_performances": topic_performances
+    }
+
+def _progress_periods(db: Session, user_id: int, days: Optional[int], granularity: str) -> List[dict]:
+    start = (datetime.now() - timedelta(days=days)).date() if days else None
+    return aggregate(load_daily(db, user_id, start=start), granularity)
+
+@router.get("/progress-series", response_model=List[ProgressPeriodData])
+def get_progress_series(
+    days: Optional[int] = Query(None, ge=1, le=MAX_SERIES_DAYS),
+    granularity: Literal["day", "week", "month"] = "day",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Attempts, average score, passes and minutes per day, week or month
+    
+    Read from the daily rollup (one row per active day), over the last
+    `days` days or the whole history; periods without activity are omitted.
+    """
+    return fast_response(_progress_periods(db, current_user.id, days, granularity))
 
 @router.get("/progress-chart")
 def get_progress_chart(
+    days: Optional[int] = Query(None, ge=1, le=MAX_SERIES_DAYS),
+    granularity: Literal["day", "week", "month"] = "day",
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Generate progress chart image
+    Generate progress chart image (average score per day, week or month)
     """
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id).all()
+    periods = _progress_periods(db, current_user.id, days, granularity)
     
-    if not attempts:
+    if not periods:
         return {"error": "No data available"}
     
     # Prepare data
-    dates = [attempt.completed_at.date() for attempt in attempts]
-    scores = [attempt.score for attempt in attempts]
+    dates = [date.fromisoformat(p["period"]) for p in periods]
+    scores = [p["average_score"] for p in periods]
     
-    # Create chart
+    # Create chart (matplotlib is imported on first use)
+    plt = get_pyplot()
     plt.figure(figsize=(10, 6))
     plt.plot(dates, scores, marker='o', linestyle='-', linewidth=2, markersize=4)
     plt.title('Quiz Scores Over Time', fontsize=16, fontweight='bold')
     plt.xlabel('Date', fontsize=12)
-    plt.ylabel('Score (%)', fontsize=12)
+    plt.ylabel('Average Score (%)', fontsize=12)
     plt.grid(True, alpha=0.3)
     plt.xticks(rotation=45)
     plt.tight_layout()
@@ -159,25 +181,19 @@ def get_topic_performance_chart(
     """
     Generate topic-wise performance chart
     """
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id).all()
+    snapshot = load_user_snapshot(db, current_user.id)
+    totals = snapshot.topic_totals()
     
-    if not attempts:
+    if not totals:
         return {"error": "No data available"}
     
-    # Group by topic
-    topic_scores = {}
-    for attempt in attempts:
-        quiz = attempt.quiz
-        topic_title = quiz.topic.title
-        if topic_title not in topic_scores:
-            topic_scores[topic_title] = []
-        topic_scores[topic_title].append(attempt.score)
+    # Average per topic, archived attempts included
+    titles = {t.id: t.title for t in snapshot.topics}
+    topics = [titles.get(topic_id, "") for topic_id in totals]
+    avg_scores = [t.average for t in totals.values()]
     
-    # Calculate averages
-    topics = list(topic_scores.keys())
-    avg_scores = [sum(scores) / len(scores) for scores in topic_scores.values()]
-    
-    # Create chart
+    # Create chart (matplotlib is imported on first use)
+    plt = get_pyplot()
     plt.figure(figsize=(12, 6))
     plt.barh(topics, avg_scores, color='steelblue', alpha=0.7)
     plt.title('Average Score by Topic', fontsize=16, fontweight='bold')
@@ -195,3 +211,35 @@ def get_topic_performance_chart(
     plt.close()
     
     return {"image": f"data:image/png;base64,{img_base64}"}
+
+def _user_id_for_token(token: Optional[str]) -> int:
+    """
+    Resolve a stream's token to a user id without keeping a session open
+    """
+    db = SessionLocal()
+    try:
+        return get_current_user(token=token, db=db).id
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_dashboard_updates(
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: Optional[str] = None
+):
+    """
+    Server-Sent Events stream of dashboard deltas for the current user
+    
+    EventSource can't send headers, so the token may be passed as ?token=.
+    Reconnects resume from the Last-Event-ID header (or ?last_event_id=).
+    """
+    token = token or get_bearer_token(request.headers.get("authorization"))
+    user_id = await run_in_threadpool(_user_id_for_token, token)
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+    
+    return StreamingResponse(
+        live_broker.stream(user_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
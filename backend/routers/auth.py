@@ -4,15 +4,16 @@ Authentication routes: signup, login
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from backend.database import get_db
+from backend.database import current_tenant, get_db
 from backend.models import User
 from backend.schemas import UserCreate, UserLogin, Token, UserResponse
+from backend.profiling import ProfiledRoute
 from backend.auth import (
     get_password_hash, authenticate_user, create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
 )
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.post("/signup", response_model=UserResponse)
 def signup(user_data: UserCreate, db: Session = Depends(get_db)):
@@ -63,7 +64,7 @@ def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             )
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+            data={"sub": user.username, "tid": current_tenant.get()}, expires_delta=access_token_expires
         )
         return {"access_token": access_token, "token_type": "bearer"}
     except HTTPException:
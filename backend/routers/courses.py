@@ -1,25 +1,138 @@
 """
 Course and topic management routes
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from backend.database import get_db
 from backend.models import Course, Topic, User
-from backend.schemas import CourseCreate, CourseResponse, TopicCreate, TopicResponse
+from backend.schemas import (
+    CourseCreate, CourseResponse, EnrollmentResponse, LeaderboardResponse, TopicCreate, TopicResponse
+)
+from backend.profiling import ProfiledRoute
 from backend.auth import get_current_user
+from backend.catalog import get_catalog_json
+from backend.http_cache import catalog_headers, check_catalog_etag
+from backend.enrollment import enroll, enrolled_course_ids, unenroll
+from backend.leaderboard import COURSE, LEADERBOARD_MAX_TOP, TOPIC, leaderboards
+from backend.versions import bump_catalog_version, bump_user_version
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+def leaderboard_response(db: Session, scope: str, scope_id: int, user_id: int, limit: int) -> dict:
+    """
+    Top `limit` of a leaderboard plus the user's own standing
+    """
+    total, top, me = leaderboards.view(db, scope, scope_id, user_id, limit)
+    user_ids = {s.user_id for s in top} | ({me.user_id} if me else set())
+    usernames = dict(db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    
+    def standing(s):
+        return {
+            "rank": s.rank,
+            "user_id": s.user_id,
+            "username": usernames.get(s.user_id, ""),
+            "best_score": s.best_score,
+            "achieved_at": s.achieved_at,
+        }
+    
+    return {
+        "scope": scope,
+        "scope_id": scope_id,
+        "total_entries": total,
+        "top": [standing(s) for s in top],
+        "me": standing(me) if me else None,
+    }
 
 @router.get("/", response_model=List[CourseResponse])
-def get_courses(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_courses(
+    difficulty: Optional[str] = None,
+    course_ids: Optional[List[int]] = Query(None),
+    etag: str = Depends(check_catalog_etag),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
     Get all courses with their topics
+    
+    Optionally filtered by topic difficulty and/or repeated `course_ids`.
+    Served from pre-serialized JSON until the catalog changes.
+    """
+    # A returned Response bypasses the dependency's header changes; set them here
+    return Response(
+        content=get_catalog_json(db, difficulty, course_ids),
+        media_type="application/json",
+        headers=catalog_headers(etag)
+    )
+
+@router.get("/enrolled", response_model=List[CourseResponse])
+def get_enrolled_courses(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Get the courses the current user is enrolled in, with their topics
+    """
+    course_ids = enrolled_course_ids(db, current_user.id)
+    if not course_ids:
+        return Response(content=b"[]", media_type="application/json")
+    return Response(content=get_catalog_json(db, None, course_ids), media_type="application/json")
+
+@router.post("/{course_id}/enroll", response_model=EnrollmentResponse)
+def enroll_in_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Enroll the current user in a course (idempotent)
     """
-    courses = db.query(Course).all()
-    return courses
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    try:
+        enrolled = enroll(db, current_user.id, course_id)
+        db.commit()
+    except IntegrityError:
+        # A concurrent request enrolled the user first
+        db.rollback()
+        enrolled = False
+    if enrolled:
+        # The personalized views are scoped to enrolled courses
+        bump_user_version(current_user.id)
+    return {"course_id": course_id, "enrolled": True}
+
+@router.delete("/{course_id}/enroll", response_model=EnrollmentResponse)
+def leave_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Remove the current user's enrollment in a course
+    """
+    if unenroll(db, current_user.id, course_id):
+        bump_user_version(current_user.id)
+    return {"course_id": course_id, "enrolled": False}
+
+@router.get("/{course_id}/leaderboard", response_model=LeaderboardResponse)
+def get_course_leaderboard(
+    course_id: int,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_TOP),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Course leaderboard: sum of each learner's best topic scores, then earliest
+    """
+    if db.query(Course.id).filter(Course.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return leaderboard_response(db, COURSE, course_id, current_user.id, limit)
+
+@router.get("/topics/{topic_id}/leaderboard", response_model=LeaderboardResponse)
+def get_topic_leaderboard(
+    topic_id: int,
+    limit: int = Query(10, ge=1, le=LEADERBOARD_MAX_TOP),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Topic leaderboard: each learner's best quiz score in the topic, then earliest
+    """
+    if db.query(Topic.id).filter(Topic.id == topic_id).first() is None:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return leaderboard_response(db, TOPIC, topic_id, current_user.id, limit)
 
-@router.get("/{course_id}", response_model=CourseResponse)
+@router.get("/{course_id}", response_model=CourseResponse, dependencies=[Depends(check_catalog_etag)])
 def get_course(course_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Get a specific course by ID
@@ -40,10 +153,11 @@ def create_course(course_data: CourseCreate, db: Session = Depends(get_db), curr
     )
     db.add(db_course)
     db.commit()
+    bump_catalog_version()
     db.refresh(db_course)
     return db_course
 
-@router.get("/topics/{topic_id}", response_model=TopicResponse)
+@router.get("/topics/{topic_id}", response_model=TopicResponse, dependencies=[Depends(check_catalog_etag)])
 def get_topic(topic_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Get a specific topic by ID
@@ -72,5 +186,6 @@ def create_topic(topic_data: TopicCreate, db: Session = Depends(get_db), current
     )
     db.add(db_topic)
     db.commit()
+    bump_catalog_version()
     db.refresh(db_topic)
     return db_topic
@@ -0,0 +1,90 @@
+"""
+Learner home: the dashboard and all personalized views in one request
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from backend.database import current_tenant, get_db, tenant_scope
+from backend.models import User
+from backend.schemas import LearnerHome
+from backend.profiling import ProfiledRoute
+from backend.auth import get_current_user
+from backend.cache import user_cache_key, user_results
+from backend.responses import fast_response
+from backend.snapshot import load_user_snapshot
+from backend.routers.analytics import build_dashboard
+from backend.routers.recommendations import gap_items, path_items, topic_items
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for all views; slower ones are returned as null
+HOME_VIEW_TIMEOUT = float(os.getenv("HOME_VIEW_TIMEOUT", "5"))
+HOME_WORKERS = int(os.getenv("HOME_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=HOME_WORKERS, thread_name_prefix="home-view")
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("", response_model=LearnerHome)
+def get_learner_home(
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dashboard, topic recommendations, knowledge gaps and adaptive path
+
+    The user's data is loaded once into a snapshot and the four views are
+    computed from it concurrently. A view that fails or misses the
+    HOME_VIEW_TIMEOUT deadline is returned as null and named in `errors`;
+    a timed-out view keeps running and fills the cache for the next call.
+    """
+    from backend.ml.adaptive_path import get_adaptive_recommendations_for_snapshot
+    from backend.ml.knowledge_gaps import detect_knowledge_gaps_for_snapshot
+    from backend.ml.recommendations import recommend_topics_for_snapshot
+
+    user_id = current_user.id
+    # Keys are taken before loading, so results from this snapshot are never
+    # cached under a newer data version
+    topics_key = user_cache_key(user_id, "topics", (limit, "content"))
+    gaps_key = user_cache_key(user_id, "knowledge-gaps", ())
+    path_key = user_cache_key(user_id, "adaptive-path", ())
+    snapshot = load_user_snapshot(db, user_id)
+
+    views = {
+        "dashboard": lambda: build_dashboard(snapshot),
+        "recommendations": lambda: topic_items(user_results.get_or_compute(
+            topics_key, lambda: recommend_topics_for_snapshot(snapshot, limit))),
+        "knowledge_gaps": lambda: gap_items(user_results.get_or_compute(
+            gaps_key, lambda: detect_knowledge_gaps_for_snapshot(snapshot))),
+        "adaptive_path": lambda: path_items(user_results.get_or_compute(
+            path_key, lambda: get_adaptive_recommendations_for_snapshot(snapshot))),
+    }
+    tenant = current_tenant.get()
+
+    def run(compute):
+        # Pool threads don't inherit the request's context
+        with tenant_scope(tenant):
+            return compute()
+
+    futures = {name: _executor.submit(run, compute) for name, compute in views.items()}
+
+    deadline = time.monotonic() + HOME_VIEW_TIMEOUT
+    result, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            result[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FuturesTimeout:
+            result[name] = None
+            errors[name] = "timeout"
+            logger.warning(f"Home view {name} timed out for user {user_id}")
+        except Exception as e:
+            result[name] = None
+            errors[name] = "failed"
+            logger.error(f"Home view {name} failed for user {user_id}: {e}")
+    result["errors"] = errors
+
+    return fast_response(result)
@@ -1,18 +1,33 @@
 """
 Student performance tracking routes
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from backend.database import get_db
 from backend.models import Performance, User, Topic
 from backend.schemas import PerformanceUpdate, PerformanceResponse
+from backend.profiling import ProfiledRoute
 from backend.auth import get_current_user
+from backend.events import Event, PERFORMANCE_TRACKED, event_bus
+from backend.rollup import record_minutes
+from backend.versions import bump_user_version
+from backend.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, id_keyset_page, parse_fields, project_row, stream_page
+)
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# Fields selectable on performance listings (PerformanceResponse)
+PERFORMANCE_FIELDS = ["id", "user_id", "topic_id", "time_spent_minutes", "last_accessed"]
 
 @router.post("/track", response_model=PerformanceResponse)
-def track_performance(performance_data: PerformanceUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def track_performance(
+    performance_data: PerformanceUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
     Track or update time spent on a topic
     """
@@ -36,15 +51,40 @@ def track_performance(performance_data: PerformanceUpdate, db: Session = Depends
     
     db.commit()
     db.refresh(performance)
+    record_minutes(db, current_user.id, performance_data.time_spent_minutes)
+    bump_user_version(current_user.id)
+    
+    background_tasks.add_task(event_bus.publish, Event(PERFORMANCE_TRACKED, current_user.id, {
+        "topic_id": performance.topic_id,
+        "time_spent_minutes": performance_data.time_spent_minutes,
+    }))
     return performance
 
 @router.get("/user", response_model=List[PerformanceResponse])
-def get_user_performance(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_user_performance(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get all performance records for current user
+    Get performance records for current user, most recently tracked topic first
+    
+    Paginated like /api/quizzes/attempts/user: pass X-Next-Cursor back as
+    `cursor`; `fields` is an optional comma-separated projection. Pages are
+    keyed on the record id, since last_accessed may be NULL.
     """
-    performances = db.query(Performance).filter(Performance.user_id == current_user.id).all()
-    return performances
+    selected = parse_fields(fields, PERFORMANCE_FIELDS)
+    columns = [getattr(Performance, f).label(f) for f in selected if f != "id"]
+    query = db.query(Performance.id.label("id"), *columns).filter(Performance.user_id == current_user.id)
+    rows = id_keyset_page(query, Performance.id, cursor, limit).all()
+    
+    return stream_page(
+        rows, limit,
+        serialize=lambda row: project_row(row, selected),
+        cursor_key=lambda row: (row.id,)
+    )
 
 @router.get("/topic/{topic_id}", response_model=PerformanceResponse)
 def get_topic_performance(topic_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -1,26 +1,107 @@
 """
 Quiz and assessment routes
 """
+import csv
+import io
 import json
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from itertools import chain
+from types import SimpleNamespace
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-from backend.database import get_db
+from typing import List, Optional
+from backend.database import SessionLocal, get_db
 from backend.models import Quiz, QuizAttempt, User, Topic
-from backend.schemas import QuizCreate, QuizResponse, QuizSubmission, QuizAttemptResponse
-from backend.auth import get_current_user
+from backend.schemas import QuizCreate, QuizResponse, QuizSubmission, QuizAttemptResponse, QuizUpdate
+from backend.profiling import ProfiledRoute
+from backend.auth import get_current_admin, get_current_user
+from backend.archive import has_archived_attempts, iter_user_attempts, parse_timestamp, read_user_attempts
+from backend.events import Event, QUIZ_SUBMITTED, event_bus
+from backend.http_cache import check_catalog_etag
+from backend.ml.mastery import update_mastery
+from backend.ml.spaced_repetition import record_review
+from backend.enrollment import enroll
+from backend.leaderboard import publish_score, record_score
+from backend.rollup import record_attempt
+from backend.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, keyset_page, parse_fields, project_row, raw_timestamp,
+    stream_page
+)
+from backend.versions import bump_catalog_version, bump_user_version
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
 
-@router.get("/topic/{topic_id}", response_model=List[QuizResponse])
+router = APIRouter(route_class=ProfiledRoute)
+
+# Fields selectable on attempt listings (QuizAttemptResponse)
+ATTEMPT_FIELDS = ["id", "quiz_id", "score", "completed_at"]
+# Columns of the CSV history export
+EXPORT_FIELDS = ["id", "quiz_id", "topic_id", "score", "completed_at"]
+EXPORT_CHUNK_BYTES = 64 * 1024
+# Hot attempts read per query while exporting
+EXPORT_BATCH_ROWS = 1000
+
+def public_question(q: dict) -> dict:
+    """
+    A stored question without its answer key
+    """
+    question = {"question": q["question"], "options": q["options"]}
+    if "correct_answer_indices" in q:
+        question["multiple"] = True  # Answer with a list of option indices
+    return question
+
+def quiz_content(questions) -> tuple:
+    """
+    Stored questions and answer-key entries for QuizQuestion inputs
+    """
+    # numpy-backed; imported on first use to keep startup light
+    from backend.grading import key_entry
+    
+    questions_list = []
+    answers_list = []
+    for number, q in enumerate(questions, start=1):
+        if (q.correct_answer_index is None) == (q.correct_answer_indices is None):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Question {number}: give correct_answer_index or correct_answer_indices"
+            )
+        correct = [q.correct_answer_index] if q.correct_answer_index is not None else q.correct_answer_indices
+        if not correct or any(not 0 <= i < len(q.options) for i in correct):
+            raise HTTPException(status_code=400, detail=f"Question {number}: correct answers must be option indices")
+        if q.weight <= 0:
+            raise HTTPException(status_code=400, detail=f"Question {number}: weight must be positive")
+        
+        stored = {"question": q.question, "options": q.options}
+        if q.correct_answer_indices is not None:
+            stored["correct_answer_indices"] = sorted(set(correct))
+        else:
+            stored["correct_answer_index"] = q.correct_answer_index
+        questions_list.append(stored)
+        answers_list.append(key_entry(correct, q.weight, q.partial_credit))
+    return questions_list, answers_list
+
+@router.get("/topic/{topic_id}", response_model=List[QuizResponse], dependencies=[Depends(check_catalog_etag)])
 def get_quizzes_by_topic(topic_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
-    Get all quizzes for a specific topic
+    Get all quizzes for a specific topic (without answers)
     """
     quizzes = db.query(Quiz).filter(Quiz.topic_id == topic_id).all()
-    return quizzes
+    
+    result = []
+    for quiz in quizzes:
+        questions_data = json.loads(quiz.questions)
+        result.append({
+            "id": quiz.id,
+            "topic_id": quiz.topic_id,
+            "title": quiz.title,
+            "questions": [public_question(q) for q in questions_data]
+        })
+    return result
 
-@router.get("/{quiz_id}", response_model=QuizResponse)
+@router.get("/{quiz_id}", response_model=QuizResponse, dependencies=[Depends(check_catalog_etag)])
 def get_quiz(quiz_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Get a specific quiz by ID (without answers)
@@ -31,12 +112,7 @@ def get_quiz(quiz_id: int, db: Session = Depends(get_db), current_user: User = D
     
     # Parse questions and remove correct answers for security
     questions_data = json.loads(quiz.questions)
-    questions_without_answers = []
-    for q in questions_data:
-        questions_without_answers.append({
-            "question": q["question"],
-            "options": q["options"]
-        })
+    questions_without_answers = [public_question(q) for q in questions_data]
     
     quiz_dict = {
         "id": quiz.id,
@@ -57,15 +133,7 @@ def create_quiz(quiz_data: QuizCreate, db: Session = Depends(get_db), current_us
         raise HTTPException(status_code=404, detail="Topic not found")
     
     # Prepare questions and answers
-    questions_list = []
-    answers_list = []
-    for q in quiz_data.questions:
-        questions_list.append({
-            "question": q.question,
-            "options": q.options,
-            "correct_answer_index": q.correct_answer_index
-        })
-        answers_list.append(q.correct_answer_index)
+    questions_list, answers_list = quiz_content(quiz_data.questions)
     
     db_quiz = Quiz(
         topic_id=quiz_data.topic_id,
@@ -75,60 +143,226 @@ def create_quiz(quiz_data: QuizCreate, db: Session = Depends(get_db), current_us
     )
     db.add(db_quiz)
     db.commit()
+    bump_catalog_version()
     db.refresh(db_quiz)
     
     # Return quiz without answers
-    questions_without_answers = []
-    for q in questions_list:
-        questions_without_answers.append({
-            "question": q["question"],
-            "options": q["options"]
-        })
-    
     return {
         "id": db_quiz.id,
         "topic_id": db_quiz.topic_id,
         "title": db_quiz.title,
-        "questions": questions_without_answers
+        "questions": [public_question(q) for q in questions_list]
+    }
+
+@router.put("/{quiz_id}", response_model=QuizResponse)
+def update_quiz(
+    quiz_id: int,
+    quiz_data: QuizUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Replace a quiz's questions and answer key (admins only)
+    
+    When the answer key changes, every stored attempt is re-graded in the
+    background after the response.
+    """
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    
+    questions_list, answers_list = quiz_content(quiz_data.questions)
+    old_answers = json.loads(quiz.answers)
+    if quiz_data.title is not None:
+        quiz.title = quiz_data.title
+    quiz.questions = json.dumps(questions_list)
+    quiz.answers = json.dumps(answers_list)
+    db.commit()
+    bump_catalog_version()
+    
+    if answers_list != old_answers:
+        background_tasks.add_task(run_regrade, quiz_id)
+    
+    return {
+        "id": quiz.id,
+        "topic_id": quiz.topic_id,
+        "title": quiz.title,
+        "questions": [public_question(q) for q in questions_list]
     }
 
+def run_regrade(quiz_id: int):
+    """
+    Background task: re-grade a quiz's attempts in a session of its own
+    """
+    from backend.grading import regrade_quiz
+    
+    db = SessionLocal()
+    try:
+        regrade_quiz(db, quiz_id)
+    except Exception as e:
+        logger.error(f"Re-grading quiz {quiz_id} failed: {e}")
+    finally:
+        db.close()
+
+def save_submission(db: Session, user_id: int, quiz: Quiz, answers: list, score: float) -> tuple:
+    """
+    Store a graded attempt and the state derived from it in one transaction
+    
+    Returns (attempt, course total from record_score). When a concurrent
+    submission creates one of the same rows first (e.g. the learner's first
+    mastery or daily row), the transaction is rolled back and replayed once
+    on top of the other submission's rows.
+    """
+    for retry in (True, False):
+        try:
+            db_attempt = QuizAttempt(
+                user_id=user_id,
+                quiz_id=quiz.id,
+                score=score,
+                answers_submitted=json.dumps(answers)
+            )
+            db.add(db_attempt)
+            db.flush()
+            # completed_at is set by the database
+            db.refresh(db_attempt)
+            # O(1) online mastery update: two rows, no history scan
+            update_mastery(db, user_id, quiz.topic, score)
+            # The attempt is a review: reschedule the topic (SM-2)
+            record_review(db, user_id, quiz.topic_id, score, db_attempt.completed_at)
+            # Today's row of the daily rollup behind the progress series
+            record_attempt(db, user_id, db_attempt.completed_at, score)
+            # Taking a quiz enrolls the learner in its course
+            enroll(db, user_id, quiz.topic.course_id)
+            # Only a new personal best touches the topic and course leaderboards
+            course_total = record_score(db, user_id, quiz.topic_id, quiz.topic.course_id, score, db_attempt.completed_at)
+            db.commit()
+            return db_attempt, course_total
+        except IntegrityError:
+            db.rollback()
+            if not retry:
+                raise
+
 @router.post("/submit", response_model=QuizAttemptResponse)
-def submit_quiz(submission: QuizSubmission, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def submit_quiz(
+    submission: QuizSubmission,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
     Submit quiz answers and get score
     """
+    from backend.grading import grade_submission, quiz_answer_key
+    
     quiz = db.query(Quiz).filter(Quiz.id == submission.quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Parse correct answers
-    correct_answers = json.loads(quiz.answers)
+    # Calculate score (single choice, multi-select, weights, partial credit)
+    score = grade_submission(quiz_answer_key(quiz), submission.answers)
     
-    # Calculate score
-    correct_count = 0
-    for i, answer in enumerate(submission.answers):
-        if i < len(correct_answers) and answer == correct_answers[i]:
-            correct_count += 1
+    db_attempt, course_total = save_submission(db, current_user.id, quiz, submission.answers, score)
+    # In-memory boards only change once the new best is committed
+    publish_score(current_user.id, quiz.topic_id, quiz.topic.course_id, score, db_attempt.completed_at, course_total)
+    bump_user_version(current_user.id)
     
-    score = (correct_count / len(correct_answers)) * 100 if correct_answers else 0
-    
-    # Save attempt
-    db_attempt = QuizAttempt(
-        user_id=current_user.id,
-        quiz_id=submission.quiz_id,
-        score=score,
-        answers_submitted=json.dumps(submission.answers)
-    )
-    db.add(db_attempt)
-    db.commit()
-    db.refresh(db_attempt)
+    # Derived data (aggregates, recommendations) is updated after the response
+    background_tasks.add_task(event_bus.publish, Event(QUIZ_SUBMITTED, current_user.id, {
+        "attempt_id": db_attempt.id,
+        "quiz_id": quiz.id,
+        "topic_id": quiz.topic_id,
+        "score": score,
+    }))
     
     return db_attempt
 
 @router.get("/attempts/user", response_model=List[QuizAttemptResponse])
-def get_user_attempts(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_user_attempts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get all quiz attempts for current user
+    Get quiz attempts for current user, newest first, one page at a time
+    
+    Pass the X-Next-Cursor response header back as `cursor` to get the next
+    page; `fields` is an optional comma-separated projection. Past the hot
+    table the listing continues into the archive, which is all older.
     """
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.user_id == current_user.id).all()
-    return attempts
+    selected = parse_fields(fields, ATTEMPT_FIELDS)
+    columns = [getattr(QuizAttempt, f).label(f) for f in selected if f != "id"]
+    query = db.query(
+        QuizAttempt.id.label("id"),
+        raw_timestamp(QuizAttempt.completed_at).label("cursor_ts"),
+        *columns
+    ).filter(QuizAttempt.user_id == current_user.id)
+    rows = keyset_page(query, QuizAttempt.completed_at, QuizAttempt.id, cursor, limit).all()
+    if len(rows) <= limit and has_archived_attempts(db, current_user.id):
+        before = decode_cursor(cursor) if cursor else None
+        rows += [
+            SimpleNamespace(
+                id=a["id"], quiz_id=a["quiz_id"], score=a["score"],
+                completed_at=parse_timestamp(a["completed_at"]), cursor_ts=a["completed_at"]
+            )
+            for a in read_user_attempts(current_user.id, before, limit + 1 - len(rows))
+        ]
+    
+    return stream_page(
+        rows, limit,
+        serialize=lambda row: project_row(row, selected),
+        cursor_key=lambda row: (row.cursor_ts, row.id)
+    )
+
+@router.get("/attempts/export")
+def export_user_attempts(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the current user's whole attempt history as CSV, oldest first
+    
+    Archived attempts are streamed month by month, then the hot table in
+    keyset batches, so memory stays flat however long the history is.
+    """
+    user_id = current_user.id
+    archived = iter_user_attempts(user_id) if has_archived_attempts(db, user_id) else iter(())
+    
+    def hot():
+        after = None
+        while True:
+            query = db.query(
+                QuizAttempt.id, QuizAttempt.quiz_id, Quiz.topic_id, QuizAttempt.score, QuizAttempt.completed_at,
+                raw_timestamp(QuizAttempt.completed_at).label("cursor_ts")
+            ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(QuizAttempt.user_id == user_id)
+            if after is not None:
+                query = query.filter(tuple_(raw_timestamp(QuizAttempt.completed_at), QuizAttempt.id) > tuple_(*after))
+            batch = query.order_by(QuizAttempt.completed_at, QuizAttempt.id).limit(EXPORT_BATCH_ROWS).all()
+            for row in batch:
+                yield row[:5]
+            if len(batch) < EXPORT_BATCH_ROWS:
+                return
+            after = (batch[-1].cursor_ts, batch[-1].id)
+    
+    def body():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        rows = (
+            (a["id"], a["quiz_id"], a["topic_id"], a["score"], parse_timestamp(a["completed_at"]))
+            for a in archived
+        )
+        for attempt_id, quiz_id, topic_id, score, completed_at in chain(rows, hot()):
+            writer.writerow([attempt_id, quiz_id, topic_id, score, completed_at.isoformat()])
+            if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    return StreamingResponse(
+        body(), media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="quiz_attempts.csv"'}
+    )
@@ -1,63 +1,122 @@
 """
 Recommendation routes: personalized topics, knowledge gaps, adaptive path
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal
 from backend.database import get_db
 from backend.models import User
-from backend.schemas import RecommendationResponse, KnowledgeGapResponse
+from backend.schemas import RecommendationResponse, KnowledgeGapResponse, ReviewItem
+from backend.profiling import ProfiledRoute
 from backend.auth import get_current_user
-from backend.ml.recommendations import recommend_topics
-from backend.ml.knowledge_gaps import detect_knowledge_gaps
-from backend.ml.adaptive_path import get_adaptive_recommendations
+from backend.cache import cached_for_user
+from backend.responses import fast_response
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+def topic_items(recommendations: List[dict]) -> List[dict]:
+    """
+    Topic recommendations in RecommendationResponse shape
+    """
+    return [
+        {
+            "topic_id": rec["topic_id"],
+            "topic_title": rec["topic_title"],
+            "difficulty_level": rec["difficulty_level"],
+            "recommendation_reason": rec["reason"],
+            "confidence_score": float(rec["similarity_score"])
+        }
+        for rec in recommendations
+    ]
+
+def gap_items(gaps: List[dict]) -> List[dict]:
+    """
+    Knowledge gaps in KnowledgeGapResponse shape
+    """
+    return [
+        {
+            "topic_id": gap["topic_id"],
+            "topic_title": gap["topic_title"],
+            "difficulty_level": gap["difficulty_level"],
+            "is_weak": bool(gap["is_weak"]),
+            "risk_score": float(gap["risk_score"])
+        }
+        for gap in gaps
+    ]
+
+def path_items(recommendations: List[dict]) -> List[dict]:
+    """
+    Adaptive path entries in RecommendationResponse shape
+    """
+    return [
+        {
+            "topic_id": rec["topic_id"],
+            "topic_title": rec["topic_title"],
+            "difficulty_level": rec["difficulty_level"],
+            "recommendation_reason": rec["reason"],
+            "confidence_score": 0.8 if rec["priority"] == "high" else 0.6
+        }
+        for rec in recommendations
+    ]
 
 @router.get("/topics", response_model=List[RecommendationResponse])
 def get_topic_recommendations(
     limit: int = 5,
+    strategy: Literal["content", "collaborative"] = "content",
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get personalized topic recommendations using cosine similarity
-    """
-    recommendations = recommend_topics(current_user.id, db, limit)
+    Get personalized topic recommendations
     
-    result = []
-    for rec in recommendations:
-        result.append(RecommendationResponse(
-            topic_id=rec["topic_id"],
-            topic_title=rec["topic_title"],
-            difficulty_level=rec["difficulty_level"],
-            recommendation_reason=rec["reason"],
-            confidence_score=rec["similarity_score"]
-        ))
+    strategy=content: cosine similarity of the user's profile to topic features
+    strategy=collaborative: item-item cosine neighbors learned from all learners
+    """
+    # ML modules pull in pandas/sklearn; import on first use to keep startup fast
+    if strategy == "collaborative":
+        from backend.ml import collaborative
+
+        # A rebuilt or rolled-back neighbor table changes the answers, so its
+        # version is part of the key and the same table computes the result
+        table = collaborative.get_neighbor_table(db)
+        recommendations = cached_for_user(
+            current_user.id, "topics", (limit, strategy, table.version),
+            lambda: collaborative.recommend_topics_collaborative(current_user.id, db, limit, table)
+        )
+    else:
+        from backend.ml.recommendations import recommend_topics
+
+        recommendations = cached_for_user(
+            current_user.id, "topics", (limit, strategy),
+            lambda: recommend_topics(current_user.id, db, limit)
+        )
     
-    return result
+    return fast_response(topic_items(recommendations))
 
 @router.get("/knowledge-gaps", response_model=List[KnowledgeGapResponse])
 def get_knowledge_gaps(
+    strategy: Literal["logistic", "mastery"] = "logistic",
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Detect knowledge gaps using Logistic Regression
-    """
-    gaps = detect_knowledge_gaps(current_user.id, db)
+    Detect knowledge gaps
     
-    result = []
-    for gap in gaps:
-        result.append(KnowledgeGapResponse(
-            topic_id=gap["topic_id"],
-            topic_title=gap["topic_title"],
-            difficulty_level=gap["difficulty_level"],
-            is_weak=gap["is_weak"],
-            risk_score=gap["risk_score"]
-        ))
+    strategy=logistic: logistic regression fit on the user's attempt history
+    strategy=mastery: online Elo-style mastery ratings, read directly
+    """
+    if strategy == "mastery":
+        # Ratings are maintained on every submission; nothing to fit or cache
+        from backend.ml.mastery import mastery_gaps
+        gaps = mastery_gaps(current_user.id, db)
+    else:
+        from backend.ml.knowledge_gaps import detect_knowledge_gaps
+        gaps = cached_for_user(
+            current_user.id, "knowledge-gaps", (),
+            lambda: detect_knowledge_gaps(current_user.id, db)
+        )
     
-    return result
+    return fast_response(gap_items(gaps))
 
 @router.get("/adaptive-path", response_model=List[RecommendationResponse])
 def get_adaptive_learning_path(
@@ -67,16 +126,27 @@ def get_adaptive_learning_path(
     """
     Get adaptive learning path recommendations (rule-based)
     """
-    recommendations = get_adaptive_recommendations(current_user.id, db)
+    from backend.ml.adaptive_path import get_adaptive_recommendations
+
+    recommendations = cached_for_user(
+        current_user.id, "adaptive-path", (),
+        lambda: get_adaptive_recommendations(current_user.id, db)
+    )
     
-    result = []
-    for rec in recommendations:
-        result.append(RecommendationResponse(
-            topic_id=rec["topic_id"],
-            topic_title=rec["topic_title"],
-            difficulty_level=rec["difficulty_level"],
-            recommendation_reason=rec["reason"],
-            confidence_score=0.8 if rec["priority"] == "high" else 0.6
-        ))
+    return fast_response(path_items(recommendations))
+
+@router.get("/review-queue", response_model=List[ReviewItem])
+def get_review_queue(
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Topics due for spaced-repetition review, most overdue first
     
-    return result
+    Scheduled with SM-2 on every quiz submission; read with one range scan
+    of the (user_id, due_at) index.
+    """
+    from backend.ml.spaced_repetition import review_queue
+
+    return fast_response(review_queue(db, current_user.id, limit))
@@ -0,0 +1,35 @@
+"""
+Search routes: ranked full-text search over the catalog
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from backend.database import get_db
+from backend.models import User
+from backend.schemas import SearchResponse
+from backend.profiling import ProfiledRoute
+from backend.auth import get_current_user
+from backend.search import search
+
+# Deepest result offered; past it, refine the query
+SEARCH_MAX_OFFSET = 1000
+
+router = APIRouter(route_class=ProfiledRoute)
+
+@router.get("/", response_model=SearchResponse)
+def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[List[Literal["course", "topic", "quiz"]]] = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=SEARCH_MAX_OFFSET),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Courses, topics and quizzes matching `q`, best match first
+
+    Every term must match, as a word prefix, in a title, description or
+    quiz question. Optionally restricted to repeated `kind`s; page with
+    `offset` (the response's next_offset).
+    """
+    return search(db, q, kind or (), limit, offset)
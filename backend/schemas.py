@@ -2,7 +2,7 @@
 Pydantic schemas for request/response validation
 """
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Union
 from datetime import datetime
 
 # Authentication schemas
@@ -60,17 +60,58 @@ class CourseResponse(CourseBase):
     class Config:
         from_attributes = True
 
+class EnrollmentResponse(BaseModel):
+    course_id: int
+    enrolled: bool
+
+class LeaderboardStanding(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    best_score: float
+    achieved_at: datetime
+
+class LeaderboardResponse(BaseModel):
+    scope: str  # "course" or "topic"
+    scope_id: int
+    total_entries: int
+    top: List[LeaderboardStanding]
+    me: Optional[LeaderboardStanding] = None  # The current user, if ranked
+
+class SearchHit(BaseModel):
+    kind: str  # "course", "topic" or "quiz"
+    id: int
+    title: str
+    snippet: str  # Excerpt of the description or questions around the match
+    score: float  # bm25 relevance, higher is better
+    course_id: Optional[int] = None
+    course_title: Optional[str] = None
+    topic_id: Optional[int] = None
+    topic_title: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    next_offset: Optional[int] = None  # Offset of the next page, if any
+
 # Quiz schemas
 class QuizQuestion(BaseModel):
     question: str
     options: List[str]
-    correct_answer_index: int
+    correct_answer_index: Optional[int] = None
+    correct_answer_indices: Optional[List[int]] = None  # Multi-select instead of one index
+    weight: float = 1.0
+    partial_credit: bool = False  # Credit for partly right multi-select answers
 
 class QuizCreate(BaseModel):
     topic_id: int
     title: str
     questions: List[QuizQuestion]
 
+class QuizUpdate(BaseModel):
+    title: Optional[str] = None
+    questions: List[QuizQuestion]
+
 class QuizResponse(BaseModel):
     id: int
     topic_id: int
@@ -82,7 +123,7 @@ class QuizResponse(BaseModel):
 
 class QuizSubmission(BaseModel):
     quiz_id: int
-    answers: List[int]  # List of selected answer indices
+    answers: List[Union[int, List[int]]]  # Selected index per question (a list for multi-select)
 
 class QuizAttemptResponse(BaseModel):
     id: int
@@ -123,12 +164,30 @@ class KnowledgeGapResponse(BaseModel):
     is_weak: bool
     risk_score: float
 
+class ReviewItem(BaseModel):
+    topic_id: int
+    topic_title: str
+    difficulty_level: str
+    due_at: datetime
+    overdue_days: float
+    interval_days: float
+    repetitions: int
+    ease_factor: float
+    last_score: Optional[float] = None
+
 # Analytics schemas
 class ProgressData(BaseModel):
     date: str
     topics_completed: int
     average_score: float
 
+class ProgressPeriodData(BaseModel):
+    period: str  # First day of the day/week/month
+    attempts_count: int
+    average_score: float
+    passed_count: int
+    time_spent_minutes: float
+
 class TopicPerformanceData(BaseModel):
     topic_id: int
     topic_title: str
@@ -143,3 +202,29 @@ class DashboardData(BaseModel):
     average_score: float
     progress_over_time: List[ProgressData]
     topic_performances: List[TopicPerformanceData]
+
+class LearnerHome(BaseModel):
+    dashboard: Optional[DashboardData] = None
+    recommendations: Optional[List[RecommendationResponse]] = None
+    knowledge_gaps: Optional[List[KnowledgeGapResponse]] = None
+    adaptive_path: Optional[List[RecommendationResponse]] = None
+    errors: Dict[str, str] = {}  # View name -> "timeout" or "failed"
+
+# Admin batch scoring
+class BatchScoreRequest(BaseModel):
+    user_ids: Optional[List[int]] = None
+    course_id: Optional[int] = None  # Every learner enrolled in the course
+    limit: int = 5
+
+class BatchScoreResult(BaseModel):
+    user_id: int
+    recommendations: List[RecommendationResponse]
+    knowledge_gaps: List[KnowledgeGapResponse]
+
+class TenantSummary(BaseModel):
+    tenant: str
+    users: int
+    courses: int
+    quiz_attempts: int  # Including archived attempts
+    average_score: Optional[float] = None
+    last_attempt_at: Optional[datetime] = None
@@ -0,0 +1,198 @@
+"""
+Full-text search over courses, topics and quiz questions
+
+One SQLite FTS5 table, `search_index`, holds a (title, body) document per
+course (title, description), topic (title, description) and quiz (title,
+question texts). Triggers on the source tables keep it in sync with every
+write, whichever code path makes it. A document's rowid encodes its source
+(id * 4 + kind), so the triggers replace documents by rowid.
+
+Queries are ranked with bm25, a title match counting SEARCH_TITLE_WEIGHT
+times a body match. Every search term is matched as a prefix ("pyth" finds
+"Python"); the index keeps prefix indexes for 2-4 characters, so
+search-as-you-type stays an index lookup on large catalogs.
+
+    python -m backend.search rebuild
+"""
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+from backend.models import Course, Quiz, Topic
+
+logger = logging.getLogger(__name__)
+
+# bm25 weight of the title column relative to the body
+SEARCH_TITLE_WEIGHT = float(os.getenv("SEARCH_TITLE_WEIGHT", "10.0"))
+# Terms matched as prefixes need at least this many characters
+SEARCH_MIN_PREFIX = 2
+# Terms used from one query
+SEARCH_MAX_TERMS = 8
+
+KINDS = {"course": 1, "topic": 2, "quiz": 3}
+
+# Question texts of a quiz, one per line (stored questions are a JSON list)
+_QUIZ_BODY = """(
+    SELECT coalesce(group_concat(json_extract(value, '$.question'), char(10)), '')
+    FROM json_each(CASE WHEN json_valid({row}.questions) THEN {row}.questions ELSE '[]' END)
+)"""
+
+_SOURCES = {
+    # kind: (table, title, body)
+    "course": ("courses", "{row}.title", "coalesce({row}.description, '')"),
+    "topic": ("topics", "{row}.title", "coalesce({row}.description, '')"),
+    "quiz": ("quizzes", "{row}.title", _QUIZ_BODY),
+}
+
+
+def _document(kind: str, row: str) -> str:
+    """
+    SELECT of (rowid, kind, title, body) for source row alias `row`
+    """
+    _, title, body = _SOURCES[kind]
+    return (
+        f"SELECT {row}.id * 4 + {KINDS[kind]}, '{kind}', "
+        f"{title.format(row=row)}, {body.format(row=row)}"
+    )
+
+
+def _schema() -> List[str]:
+    statements = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+            kind UNINDEXED, title, body,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )
+        """
+    ]
+    for kind, (table, _, _) in _SOURCES.items():
+        insert = f"INSERT INTO search_index(rowid, kind, title, body) {_document(kind, 'new')};"
+        delete = f"DELETE FROM search_index WHERE rowid = old.id * 4 + {KINDS[kind]};"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def _populate(conn):
+    conn.execute(text("DELETE FROM search_index"))
+    for kind, (table, _, _) in _SOURCES.items():
+        conn.execute(text(f"INSERT INTO search_index(rowid, kind, title, body) {_document(kind, 'src')} FROM {table} AS src"))
+    conn.execute(text("INSERT INTO search_index(search_index) VALUES('optimize')"))
+
+
+def create_search_index(bind):
+    """
+    Create the index and its triggers if missing, filling a new index
+    """
+    with bind.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first()
+        for statement in _schema():
+            conn.execute(text(statement))
+        if not exists:
+            _populate(conn)
+            logger.info("Built the search index")
+
+
+def rebuild_search_index(bind) -> int:
+    """
+    Refill the index from the source tables; returns the document count
+    """
+    with bind.begin() as conn:
+        _populate(conn)
+        return conn.execute(text("SELECT count(*) FROM search_index")).scalar()
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for free text: all terms, each as a prefix
+
+    Terms are quoted, so FTS5 operators in the input are matched as text.
+    Returns None when the query has no searchable term.
+    """
+    terms = re.findall(r"\w+", query.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' if len(t) >= SEARCH_MIN_PREFIX else f'"{t}"' for t in terms)
+
+
+def search(
+    db: Session, query: str, kinds: Sequence[str] = (), limit: int = 20, offset: int = 0
+) -> Dict:
+    """
+    One page of ranked matches, with each hit's course and topic
+
+    Fetches one extra hit to tell whether another page follows.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return {"query": query, "results": [], "next_offset": None}
+
+    kind_filter = " AND kind IN :kinds" if kinds else ""
+    statement = text(
+        "SELECT rowid, kind, title, snippet(search_index, 2, '', '', '...', 16) AS snippet, "
+        "bm25(search_index, 0.0, :title_weight, 1.0) AS score "
+        f"FROM search_index WHERE search_index MATCH :match{kind_filter} "
+        "ORDER BY score, rowid LIMIT :limit OFFSET :offset"
+    )
+    params = {"match": expression, "title_weight": SEARCH_TITLE_WEIGHT, "limit": limit + 1, "offset": offset}
+    if kinds:
+        statement = statement.bindparams(bindparam("kinds", expanding=True))
+        params["kinds"] = list(kinds)
+    rows = db.execute(statement, params).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    hits = [
+        {"kind": kind, "id": rowid // 4, "title": title, "snippet": snippet, "score": -score}
+        for rowid, kind, title, snippet, score in rows
+    ]
+    _attach_context(db, hits)
+    return {"query": query, "results": hits, "next_offset": offset + limit if has_more else None}
+
+
+def _attach_context(db: Session, hits: List[Dict]):
+    """
+    Set course_id/course_title and topic_id/topic_title on a page of hits
+    """
+    quiz_ids = [h["id"] for h in hits if h["kind"] == "quiz"]
+    quiz_topics = dict(db.query(Quiz.id, Quiz.topic_id).filter(Quiz.id.in_(quiz_ids)).all()) if quiz_ids else {}
+    topic_ids = {h["id"] for h in hits if h["kind"] == "topic"} | set(quiz_topics.values())
+    topics = {
+        topic_id: (course_id, title) for topic_id, course_id, title in
+        db.query(Topic.id, Topic.course_id, Topic.title).filter(Topic.id.in_(topic_ids)).all()
+    } if topic_ids else {}
+    course_ids = {h["id"] for h in hits if h["kind"] == "course"} | {c for c, _ in topics.values()}
+    courses = dict(db.query(Course.id, Course.title).filter(Course.id.in_(course_ids)).all()) if course_ids else {}
+
+    for hit in hits:
+        if hit["kind"] == "course":
+            topic_id, course_id = None, hit["id"]
+        else:
+            topic_id = hit["id"] if hit["kind"] == "topic" else quiz_topics.get(hit["id"])
+            course_id = topics.get(topic_id, (None, None))[0]
+        hit["topic_id"] = topic_id
+        hit["topic_title"] = topics[topic_id][1] if topic_id in topics else None
+        hit["course_id"] = course_id
+        hit["course_title"] = courses.get(course_id)
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend.database import get_engine, init_db
+
+    parser = argparse.ArgumentParser(description="Search index maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="refill the search index from the catalog")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    logger.info(f"Indexed {rebuild_search_index(get_engine())} search documents")
@@ -0,0 +1,127 @@
+"""
+Read-only snapshot of one learner's data
+
+The dashboard and the personalized views all need the same inputs: the
+topics of their curriculum, their attempts (with each quiz's topic), the totals of
+their archived attempts, their time tracking and the recent days of the
+daily rollup. load_user_snapshot reads them in five queries into plain
+immutable records, so several views can be computed from one load, in
+parallel threads, without sharing a Session.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+from sqlalchemy.orm import Session
+from backend.enrollment import scope_topics
+from backend.models import ArchivedTopicStats, Performance, Quiz, QuizAttempt, Topic
+from backend.rollup import DayTotals, load_daily
+
+# Days of daily rollup loaded for the dashboard's progress series
+PROGRESS_DAYS = 30
+
+
+@dataclass(frozen=True)
+class TopicInfo:
+    id: int
+    course_id: int
+    title: str
+    difficulty_level: str
+    order_index: int
+
+
+@dataclass(frozen=True)
+class AttemptInfo:
+    quiz_id: int
+    topic_id: int
+    score: float
+    completed_at: datetime
+
+
+@dataclass(frozen=True)
+class TopicTotals:
+    attempts_count: int
+    score_sum: float
+    passed_count: int  # Attempts scoring >= 60
+
+    @property
+    def average(self) -> float:
+        return self.score_sum / self.attempts_count if self.attempts_count else 0.0
+
+    @property
+    def failed_count(self) -> int:
+        return self.attempts_count - self.passed_count
+
+    def __add__(self, other: "TopicTotals") -> "TopicTotals":
+        return TopicTotals(
+            self.attempts_count + other.attempts_count,
+            self.score_sum + other.score_sum,
+            self.passed_count + other.passed_count,
+        )
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    user_id: int
+    topics: Tuple[TopicInfo, ...]  # The user's curriculum
+    attempts: Tuple[AttemptInfo, ...]  # Hot attempts, oldest first
+    time_spent: Dict[int, float] = field(default_factory=dict)
+    # Totals of archived attempts per topic, in first-attempt order; all
+    # older than `attempts`
+    archived: Dict[int, TopicTotals] = field(default_factory=dict)
+    # Daily rollup rows of the last PROGRESS_DAYS days, oldest first
+    daily: Tuple[DayTotals, ...] = ()
+
+    def topic(self, topic_id: int) -> TopicInfo:
+        return self.topics_by_id()[topic_id]
+
+    def topics_by_id(self) -> Dict[int, TopicInfo]:
+        # Computed on demand; the snapshot itself stays immutable
+        return {t.id: t for t in self.topics}
+
+    def topic_totals(self) -> Dict[int, TopicTotals]:
+        """
+        The user's totals per attempted topic, archived attempts included
+
+        Topics come in the order of their first attempt, as the views expect.
+        """
+        totals = dict(self.archived)
+        for attempt in self.attempts:
+            hot = TopicTotals(1, attempt.score, 1 if attempt.score >= 60 else 0)
+            previous = totals.get(attempt.topic_id)
+            totals[attempt.topic_id] = previous + hot if previous else hot
+        return totals
+
+
+def load_user_snapshot(db: Session, user_id: int) -> UserSnapshot:
+    """
+    Load everything the personalized views need for one user
+    """
+    # Only the topics of the user's enrolled courses (the whole catalog if none)
+    topics = tuple(
+        TopicInfo(*row) for row in scope_topics(db.query(
+            Topic.id, Topic.course_id, Topic.title, Topic.difficulty_level, Topic.order_index
+        ), user_id).order_by(Topic.id).all()
+    )
+    attempts = tuple(
+        AttemptInfo(*row) for row in db.query(
+            QuizAttempt.quiz_id, Quiz.topic_id, QuizAttempt.score, QuizAttempt.completed_at
+        ).join(Quiz, QuizAttempt.quiz_id == Quiz.id).filter(
+            QuizAttempt.user_id == user_id
+        ).order_by(QuizAttempt.completed_at, QuizAttempt.id).all()
+    )
+    time_spent = dict(
+        db.query(Performance.topic_id, Performance.time_spent_minutes).filter(Performance.user_id == user_id).all()
+    )
+    archived = {
+        topic_id: TopicTotals(count, score_sum, passed)
+        for topic_id, count, score_sum, passed in db.query(
+            ArchivedTopicStats.topic_id, ArchivedTopicStats.attempts_count,
+            ArchivedTopicStats.score_sum, ArchivedTopicStats.passed_count,
+        ).filter(ArchivedTopicStats.user_id == user_id).order_by(
+            ArchivedTopicStats.first_attempt_at, ArchivedTopicStats.topic_id
+        ).all()
+    }
+    daily = tuple(load_daily(db, user_id, start=(datetime.now() - timedelta(days=PROGRESS_DAYS)).date()))
+    return UserSnapshot(
+        user_id=user_id, topics=topics, attempts=attempts, time_spent=time_spent, archived=archived, daily=daily
+    )
@@ -0,0 +1,69 @@
+"""
+Per-request tenant selection
+
+A token names its tenant in the `tid` claim, set at login. Requests without
+a valid token (signup, login) choose one with the X-Tenant header. Tokens
+issued before tenants existed have no claim and stay on the default tenant.
+The middleware runs outermost, so every later middleware, dependency,
+background task and streamed body of the request sees the same tenant.
+
+    python -m backend.tenancy init   # create the schema in every tenant database
+    python -m backend.tenancy list
+"""
+from typing import Optional
+from starlette.responses import JSONResponse
+from backend.auth import get_bearer_token, get_token_tenant
+from backend.database import DEFAULT_TENANT, is_tenant, tenant_scope
+
+TENANT_HEADER = b"x-tenant"
+
+
+def request_tenant(scope) -> Optional[str]:
+    """
+    The tenant an ASGI request asks for (None if unknown)
+    """
+    headers = dict(scope.get("headers", []))
+    tenant = get_token_tenant(get_bearer_token(headers.get(b"authorization", b"").decode("latin-1")))
+    if tenant is None:
+        tenant = headers.get(TENANT_HEADER, b"").decode("latin-1").strip().lower() or DEFAULT_TENANT
+    return tenant if is_tenant(tenant) else None
+
+
+class TenantMiddleware:
+    """
+    ASGI middleware running each request with its tenant as the current one
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        tenant = request_tenant(scope)
+        if tenant is None:
+            await JSONResponse({"detail": "Unknown tenant"}, status_code=400)(scope, receive, send)
+            return
+        with tenant_scope(tenant):
+            await self.app(scope, receive, send)
+
+
+if __name__ == "__main__":
+    import argparse
+    import logging
+    from backend.database import TENANTS, init_all_tenants, tenant_url
+
+    parser = argparse.ArgumentParser(description="Tenant databases")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="create missing tables and indexes in every tenant's database")
+    sub.add_parser("list", help="list the configured tenants and their databases")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "init":
+        init_all_tenants()
+        logging.getLogger(__name__).info(f"Initialized {len(TENANTS)} tenant databases")
+    else:
+        for tenant in TENANTS:
+            print(f"{tenant} {tenant_url(tenant)}")
@@ -0,0 +1,118 @@
+"""
+Data version counters
+
+Bumped whenever the underlying data changes and used to build HTTP
+validators (ETags) and cache keys. The counters live in a shared anonymous
+memory map guarded by a process-shared lock: workers forked from the same
+parent (run_server.py --workers N) all see each other's bumps, so a write
+handled by one worker invalidates the caches of every other one. Values are
+prefixed with a random id created with the map, so a restart never reuses
+an old value.
+
+User versions are kept in VERSION_USER_SLOTS hashed slots; two users
+sharing a slot only cause extra cache misses, never stale reads. Leaderboard
+versions work the same way in VERSION_BOARD_SLOTS slots, as plain integers.
+
+Counters belong to the current tenant (backend.database.current_tenant):
+catalog versions use one of VERSION_TENANT_SLOTS hashed slots, and user and
+leaderboard slots are hashed with the tenant. Catalog and user versions of
+other tenants than the default one also carry the tenant name, so caches
+and ETags keyed by them never mix tenants, even on a shared slot.
+"""
+import mmap
+import multiprocessing
+import os
+import struct
+import uuid
+import zlib
+from backend.database import DEFAULT_TENANT, current_tenant
+
+VERSION_USER_SLOTS = int(os.getenv("VERSION_USER_SLOTS", "65536"))
+VERSION_BOARD_SLOTS = int(os.getenv("VERSION_BOARD_SLOTS", "4096"))
+VERSION_TENANT_SLOTS = int(os.getenv("VERSION_TENANT_SLOTS", "256"))
+
+_SLOT = struct.Struct("Q")
+
+# Created at import; forked workers inherit the same mapping and lock
+_BOOT_ID = uuid.uuid4().hex[:8]
+_counters = mmap.mmap(-1, _SLOT.size * (VERSION_TENANT_SLOTS + VERSION_USER_SLOTS + VERSION_BOARD_SLOTS))
+_lock = multiprocessing.Lock()
+
+
+def _catalog_slot(tenant: str) -> int:
+    return 0 if tenant == DEFAULT_TENANT else zlib.crc32(tenant.encode()) % VERSION_TENANT_SLOTS
+
+
+def _user_slot(tenant: str, user_id: int) -> int:
+    if tenant != DEFAULT_TENANT:
+        user_id = zlib.crc32(f"{tenant}:{user_id}".encode())
+    return VERSION_TENANT_SLOTS + user_id % VERSION_USER_SLOTS
+
+
+def _board_slot(tenant: str, board: str) -> int:
+    if tenant != DEFAULT_TENANT:
+        board = f"{tenant}:{board}"
+    return VERSION_TENANT_SLOTS + VERSION_USER_SLOTS + zlib.crc32(board.encode()) % VERSION_BOARD_SLOTS
+
+
+def _version(tenant: str, value: int) -> str:
+    if tenant == DEFAULT_TENANT:
+        return f"{_BOOT_ID}.{value}"
+    return f"{_BOOT_ID}.{tenant}.{value}"
+
+
+def _read(slot: int) -> int:
+    return _SLOT.unpack_from(_counters, slot * _SLOT.size)[0]
+
+
+def _increment(slot: int) -> int:
+    with _lock:
+        value = _read(slot) + 1
+        _SLOT.pack_into(_counters, slot * _SLOT.size, value)
+    return value
+
+
+def get_catalog_version() -> str:
+    """
+    Current version of the course catalog (courses, topics, quizzes)
+    """
+    tenant = current_tenant.get()
+    return _version(tenant, _read(_catalog_slot(tenant)))
+
+
+def bump_catalog_version() -> str:
+    """
+    Mark the catalog as changed; call after committing a catalog write
+    """
+    tenant = current_tenant.get()
+    return _version(tenant, _increment(_catalog_slot(tenant)))
+
+
+def get_user_version(user_id: int) -> str:
+    """
+    Current version of a user's learning data (attempts, time tracking)
+    """
+    tenant = current_tenant.get()
+    return _version(tenant, _read(_user_slot(tenant, user_id)))
+
+
+def bump_user_version(user_id: int) -> str:
+    """
+    Mark a user's data as changed; call after committing their write
+    """
+    tenant = current_tenant.get()
+    return _version(tenant, _increment(_user_slot(tenant, user_id)))
+
+
+def get_leaderboard_version(board: str) -> int:
+    """
+    Current version of one leaderboard ("course:<id>" or "topic:<id>")
+    """
+    return _read(_board_slot(current_tenant.get(), board))
+
+
+def bump_leaderboard_version(board: str) -> int:
+    """
+    Mark a leaderboard as changed and return its new version
+    """
+    return _increment(_board_slot(current_tenant.get(), board))
@@ -0,0 +1,81 @@
+"""
+Background warm-up of the heavy ML/plotting stack
+
+The routers import pandas, scikit-learn and matplotlib lazily so the app
+starts fast. When WARMUP_ON_STARTUP is set, a daemon thread pays those
+import costs (and primes the matplotlib font cache) while the server is
+already accepting traffic, so the first real request doesn't.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0").lower() in ("1", "true", "yes")
+
+WARMUP_MODULES = [
+    "backend.ml.recommendations",
+    "backend.ml.knowledge_gaps",
+    "backend.ml.adaptive_path",
+    "backend.ml.collaborative",
+]
+
+# Extra callables run after the imports, e.g. cache loaders
+_warmup_hooks = []
+
+
+def register_warmup_hook(func):
+    """
+    Register a callable to run during background warm-up
+    """
+    _warmup_hooks.append(func)
+    return func
+
+
+def get_pyplot():
+    """
+    Import matplotlib with the non-interactive backend and return pyplot
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # Non-interactive backend
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def warm_up():
+    """
+    Import the ML modules, prime matplotlib and run registered hooks
+    """
+    started = time.perf_counter()
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.error(f"Warm-up import of {name} failed: {e}")
+
+    try:
+        get_pyplot()
+        from matplotlib import font_manager
+        font_manager.findfont("DejaVu Sans")
+    except Exception as e:
+        logger.error(f"Warm-up of matplotlib failed: {e}")
+
+    for hook in list(_warmup_hooks):
+        try:
+            hook()
+        except Exception as e:
+            logger.error(f"Warm-up hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+
+def start_background_warmup() -> threading.Thread:
+    """
+    Run warm_up() in a daemon thread
+    """
+    thread = threading.Thread(target=warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,69 @@
+"""
+Import-time benchmark for backend.main
+
+Imports the app in fresh interpreters, reports the median wall time and
+fails if it exceeds the budget or if a heavy ML/plotting module was
+imported eagerly.
+
+Usage: python benchmarks/import_time.py [--runs 5] [--budget-ms 2500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use
+HEAVY_MODULES = ["pandas", "numpy", "sklearn", "scipy", "matplotlib"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - started
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_once() -> dict:
+    """
+    Import backend.main in a new interpreter and return timing info
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2500)
+    args = parser.parse_args()
+
+    results = [measure_once() for _ in range(args.runs)]
+    times_ms = [r["seconds"] * 1000 for r in results]
+    median_ms = statistics.median(times_ms)
+    heavy = sorted({m for r in results for m in r["heavy"]})
+
+    print(f"import backend.main: median {median_ms:.0f} ms "
+          f"(min {min(times_ms):.0f}, max {max(times_ms):.0f}, runs {args.runs})")
+    print(f"heavy modules imported eagerly: {', '.join(heavy) or 'none'}")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: median import time above budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if heavy:
+        print("FAIL: heavy modules must be imported lazily")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
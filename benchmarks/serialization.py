@@ -0,0 +1,107 @@
+"""
+Serialization benchmark for large dashboard payloads
+
+Compares FastAPI's default path (Pydantic objects, response_model
+validation, jsonable_encoder, stdlib json) with the fast path used by the
+dashboard and recommendation endpoints (plain dicts rendered by
+FastJSONResponse).
+
+Usage: python benchmarks/serialization.py [--topics 2000] [--days 365] [--runs 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from backend.responses import fast_response, orjson  # noqa: E402
+from backend.schemas import DashboardData, ProgressData, TopicPerformanceData  # noqa: E402
+
+
+def build_rows(topics: int, days: int):
+    progress = [
+        {"date": f"2024-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}", "topics_completed": i, "average_score": 61.5 + i % 7}
+        for i in range(days)
+    ]
+    performances = [
+        {"topic_id": i, "topic_title": f"Topic {i}", "average_score": 72.25,
+         "attempts_count": i % 9, "completion_status": "In Progress"}
+        for i in range(topics)
+    ]
+    return progress, performances
+
+
+def dashboard_dict(progress, performances) -> dict:
+    return {
+        "total_topics": len(performances),
+        "completed_topics": len(performances) // 2,
+        "completion_percentage": 50.0,
+        "average_score": 72.25,
+        "progress_over_time": progress,
+        "topic_performances": performances,
+    }
+
+
+def pydantic_path(progress, performances, field) -> bytes:
+    """
+    Objects per row, then FastAPI's validation + encoding + json.dumps
+    """
+    data = DashboardData(
+        total_topics=len(performances),
+        completed_topics=len(performances) // 2,
+        completion_percentage=50.0,
+        average_score=72.25,
+        progress_over_time=[ProgressData(**p) for p in progress],
+        topic_performances=[TopicPerformanceData(**t) for t in performances],
+    )
+    content = asyncio.run(serialize_response(field=field, response_content=data))
+    return JSONResponse(content).body
+
+
+def fast_path(progress, performances, field=None) -> bytes:
+    """
+    Plain dicts rendered directly
+    """
+    return fast_response(dashboard_dict(progress, performances)).body
+
+
+def measure(func, args, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    progress, performances = build_rows(args.topics, args.days)
+    field = create_response_field(name="Response_dashboard", type_=DashboardData)
+
+    slow_body = pydantic_path(progress, performances, field)
+    fast_body = fast_path(progress, performances)
+    assert json.loads(slow_body) == json.loads(fast_body), "paths must produce the same document"
+
+    slow_ms = measure(pydantic_path, (progress, performances, field), args.runs)
+    fast_ms = measure(fast_path, (progress, performances), args.runs)
+    print(f"dashboard with {args.topics} topics, {args.days} progress points "
+          f"({len(fast_body) / 1024:.0f} KiB), median of {args.runs} runs")
+    print(f"  pydantic + response_model + json: {slow_ms:8.2f} ms")
+    print(f"  dicts + {'orjson' if orjson else 'json'}:               {fast_ms:8.2f} ms  ({slow_ms / fast_ms:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
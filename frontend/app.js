@@ -191,6 +191,7 @@ async function handleSignup() {
 }
 
 function logout() {
+    disconnectDashboardStream();
     authToken = null;
     localStorage.removeItem('authToken');
     showPage('login');
@@ -213,9 +214,15 @@ function showPage(pageId) {
     }
 }
 
+// Dashboard and personalized views, computed server-side from one data load
+async function loadHome() {
+    return await apiCall('/home');
+}
+
 // Dashboard functions
 async function loadDashboard() {
-    const dashboardData = await apiCall('/analytics/dashboard');
+    const home = await loadHome();
+    const dashboardData = home && home.dashboard;
     
     if (!dashboardData) return;
     
@@ -227,6 +234,35 @@ async function loadDashboard() {
     // Load charts
     loadProgressChart();
     loadTopicPerformanceChart();
+    
+    // Keep the numbers current without re-requesting the dashboard
+    connectDashboardStream();
+}
+
+// Live dashboard updates (Server-Sent Events)
+let dashboardStream = null;
+
+function connectDashboardStream() {
+    if (dashboardStream || !authToken || !window.EventSource) return;
+    
+    // EventSource can't send headers; it resends Last-Event-ID on reconnect
+    dashboardStream = new EventSource(`${API_BASE_URL}/analytics/stream?token=${encodeURIComponent(authToken)}`);
+    dashboardStream.addEventListener('dashboard', (event) => applyDashboardDelta(JSON.parse(event.data)));
+    dashboardStream.addEventListener('reset', () => loadDashboard());
+}
+
+function disconnectDashboardStream() {
+    if (dashboardStream) {
+        dashboardStream.close();
+        dashboardStream = null;
+    }
+}
+
+function applyDashboardDelta(delta) {
+    document.getElementById('completion-rate').textContent = `${delta.completion_percentage}%`;
+    document.getElementById('average-score').textContent = `${delta.average_score}%`;
+    document.getElementById('topics-completed').textContent = delta.completed_topics;
+    document.getElementById('total-topics').textContent = delta.total_topics;
 }
 
 async function loadProgressChart() {
@@ -359,8 +395,12 @@ async function submitQuiz() {
 
 // Recommendations functions
 async function loadRecommendations() {
-    // Load topic recommendations
-    const topicRecs = await apiCall('/recommendations/topics?limit=5');
+    // One request for all three views; a view that timed out comes back as null
+    const home = await loadHome();
+    if (!home) return;
+    
+    // Topic recommendations
+    const topicRecs = home.recommendations;
     if (topicRecs) {
         const container = document.getElementById('topic-recommendations');
         container.innerHTML = topicRecs.map(rec => `
@@ -373,8 +413,8 @@ async function loadRecommendations() {
         `).join('');
     }
     
-    // Load knowledge gaps
-    const gaps = await apiCall('/recommendations/knowledge-gaps');
+    // Knowledge gaps
+    const gaps = home.knowledge_gaps;
     if (gaps) {
         const container = document.getElementById('knowledge-gaps');
         container.innerHTML = gaps.slice(0, 5).map(gap => `
@@ -386,8 +426,8 @@ async function loadRecommendations() {
         `).join('');
     }
     
-    // Load adaptive path
-    const adaptivePath = await apiCall('/recommendations/adaptive-path');
+    // Adaptive path
+    const adaptivePath = home.adaptive_path;
     if (adaptivePath) {
         const container = document.getElementById('adaptive-path');
         container.innerHTML = adaptivePath.map(rec => `
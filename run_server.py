@@ -1,10 +1,142 @@
 """
 Simple script to run the FastAPI server
+
+Development (default): one process with auto-reload.
+Production: `python run_server.py --workers 4` preforks N uvicorn workers
+sharing one listening socket. The app, the ML stack and the warm-up caches
+are loaded once in the parent before forking, so workers share those pages
+copy-on-write instead of each loading its own copy; data version counters
+live in shared memory so cache invalidation reaches every worker.
 """
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
 import uvicorn
 
+logger = logging.getLogger("run_server")
+
+# Seconds a worker waits for open requests (and SSE streams) on shutdown
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "10"))
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """
+    Listening socket created in the parent and inherited by every worker
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """
+    Import the app and load shared read-only state before forking
+    """
+    from backend.main import app
+    from backend.database import engine, init_db
+    from backend.warmup import warm_up
+
+    init_db()
+    warm_up()
+    # Connections must not cross the fork; each worker opens its own
+    engine.dispose()
+    # Keep preloaded objects out of the collector so it doesn't dirty
+    # (and un-share) their pages in every worker
+    gc.freeze()
+    return app
+
+
+def run_worker(app, sock: socket.socket, host: str, port: int):
+    """
+    Serve on the inherited socket until told to stop (runs in the child)
+    """
+    config = uvicorn.Config(
+        app, host=host, port=port, workers=1,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(app, sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(app, sock, host, port)
+        except Exception:
+            logger.exception("Worker crashed")
+            os._exit(1)
+        os._exit(0)
+    logger.info(f"Started worker {pid}")
+    return pid
+
+
+def serve_prefork(host: str, port: int, workers: int):
+    """
+    Fork `workers` uvicorn servers, restart any that die, stop on SIGINT/SIGTERM
+    """
+    app = preload()
+    sock = bind_socket(host, port)
+    logger.info(f"Listening on http://{host}:{port} with {workers} workers")
+
+    pids = {spawn(app, sock, host, port) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while pids:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        pids.discard(pid)
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}; restarting")
+            time.sleep(1)
+            pids.add(spawn(app, sock, host, port))
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the learning platform API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")),
+                        help="number of preforked workers; 1 runs the dev server with auto-reload")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        if not hasattr(os, "fork"):
+            sys.exit("--workers needs a platform with os.fork")
+        logging.basicConfig(level=logging.INFO)
+        serve_prefork(args.host, args.port, args.workers)
+    else:
+        uvicorn.run("backend.main:app",
+                    host=args.host,
+                    port=args.port,
+                    reload=True)
+
+
 if __name__ == "__main__":
-    uvicorn.run("backend.main:app", 
-                host="127.0.0.1", 
-                port=8000, 
-                reload=True)
+    main()
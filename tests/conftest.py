@@ -0,0 +1,80 @@
+"""
+Shared fixtures: each test gets a fresh SQLite database in its own directory
+"""
+import pytest
+from sqlalchemy import create_engine
+from backend import database
+from backend.database import DEFAULT_TENANT, SessionLocal, init_db
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # Relative data directories (archive, models) land in the test's directory
+    monkeypatch.chdir(tmp_path)
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    # Every session of the default tenant, the app's included, uses it
+    monkeypatch.setitem(database._engines, DEFAULT_TENANT, test_engine)
+    init_db(test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = SessionLocal(bind=engine)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    """
+    TestClient without the lifespan: derived-data events are handled inline,
+    before each request returns
+    """
+    from fastapi.testclient import TestClient
+    from backend.cache import user_results
+    from backend.catalog import catalog_cache
+    from backend.leaderboard import leaderboards
+    from backend.main import app
+
+    # In-process caches outlive a test's database
+    for cache in (user_results, catalog_cache, leaderboards):
+        cache.clear()
+    return TestClient(app)
+
+
+@pytest.fixture
+def login(client):
+    """
+    login(username): sign up and log in a user, returning their auth header
+    """
+    def sign_in(username: str) -> dict:
+        client.post("/api/auth/signup", json={
+            "username": username, "email": f"{username}@example.com", "password": "secret123"
+        })
+        response = client.post("/api/auth/login", json={"username": username, "password": "secret123"})
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return sign_in
+
+
+@pytest.fixture
+def make_quiz(client):
+    """
+    make_quiz(headers, questions, course_id=None): a quiz in a new topic
+
+    Returns (course_id, topic_id, quiz_id); a new course unless one is given.
+    """
+    def create(headers: dict, questions: list, course_id: int = None, difficulty: str = "Beginner"):
+        if course_id is None:
+            course_id = client.post("/api/courses/", json={"title": "Course"}, headers=headers).json()["id"]
+        topic_id = client.post("/api/courses/topics", json={
+            "title": "Topic", "difficulty_level": difficulty, "course_id": course_id
+        }, headers=headers).json()["id"]
+        quiz_id = client.post("/api/quizzes/", json={
+            "topic_id": topic_id, "title": "Quiz", "questions": questions
+        }, headers=headers).json()["id"]
+        return course_id, topic_id, quiz_id
+
+    return create
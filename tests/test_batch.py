@@ -0,0 +1,90 @@
+"""
+Batch scoring agrees with the per-user recommendation and gap views
+"""
+import json
+from datetime import datetime, timedelta
+import pytest
+from backend.ml.batch import iter_batch_scores, load_batch
+from backend.ml.knowledge_gaps import detect_knowledge_gaps
+from backend.ml.recommendations import recommend_topics
+from backend.models import (
+    ArchivedTopicStats, Course, Enrollment, Performance, Quiz, QuizAttempt, Topic, User
+)
+
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+# Scores per user and topic index, in attempt order
+HISTORIES = {
+    "newcomer": [],
+    "mixed": [(0, 95), (1, 40), (2, 70), (3, 20), (4, 85), (0, 55)],
+    "strong": [(0, 90), (1, 85), (5, 100)],
+    "enrolled": [(0, 30), (6, 90), (1, 65), (7, 45)],
+    "weak": [(2, 10), (3, 35)],
+}
+
+
+@pytest.fixture
+def catalog(db):
+    courses = [Course(title=f"Course {i}") for i in range(2)]
+    db.add_all(courses)
+    db.flush()
+    topics = [
+        Topic(course_id=courses[i // 5].id, title=f"Topic {i}", difficulty_level=LEVELS[i % 3], order_index=i % 5)
+        for i in range(10)
+    ]
+    db.add_all(topics)
+    db.flush()
+    quizzes = [Quiz(topic_id=t.id, title=t.title, questions="[]", answers="[]") for t in topics]
+    db.add_all(quizzes)
+    db.flush()
+
+    start = datetime(2026, 1, 1)
+    users = {}
+    for name, history in HISTORIES.items():
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        users[name] = user.id
+        for n, (topic, score) in enumerate(history):
+            db.add(QuizAttempt(
+                user_id=user.id, quiz_id=quizzes[topic].id, score=score, answers_submitted=json.dumps([]),
+                completed_at=start + timedelta(hours=n),
+            ))
+            db.add(Performance(user_id=user.id, topic_id=topics[topic].id, time_spent_minutes=7.5 * (n + 1)))
+    # Older totals moved to the archive count as well
+    db.add(ArchivedTopicStats(
+        user_id=users["mixed"], topic_id=topics[8].id, attempts_count=3, score_sum=120.0,
+        passed_count=1, first_attempt_at=start - timedelta(days=90),
+    ))
+    # "enrolled" only sees the second course, yet attempted topics of the first
+    db.add(Enrollment(user_id=users["enrolled"], course_id=courses[1].id))
+    db.commit()
+    return users
+
+
+# Chunks of 2 split the fitted learners; one chunk fits them side by side
+@pytest.mark.parametrize("chunk_size", [2, 500])
+def test_batch_matches_per_user_views(db, catalog, chunk_size):
+    results = list(iter_batch_scores(db, list(catalog.values()), limit=5, chunk_size=chunk_size))
+    assert [r["user_id"] for r in results] == sorted(catalog.values())
+
+    for result in results:
+        user_id = result["user_id"]
+        expected = recommend_topics(user_id, db, limit=5)
+        assert [r["topic_id"] for r in result["recommendations"]] == [r["topic_id"] for r in expected]
+        for got, want in zip(result["recommendations"], expected):
+            assert got["reason"] == want["reason"]
+            assert got["similarity_score"] == pytest.approx(want["similarity_score"], abs=1e-9)
+
+        expected = detect_knowledge_gaps(user_id, db)
+        assert [g["topic_id"] for g in result["knowledge_gaps"]] == [g["topic_id"] for g in expected]
+        for got, want in zip(result["knowledge_gaps"], expected):
+            assert got["is_weak"] == want["is_weak"]
+            # sklearn's lbfgs stops at its 1e-4 tolerance
+            assert got["risk_score"] == pytest.approx(want["risk_score"], abs=1e-3)
+
+
+def test_enrolled_chunk_only_loads_relevant_topics(db, catalog):
+    data = load_batch(db, [catalog["enrolled"]])
+    # The second course plus the first-course topics the learner attempted
+    assert [t.title for t in data.topics] == ["Topic 0", "Topic 1"] + [f"Topic {i}" for i in range(5, 10)]
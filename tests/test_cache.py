@@ -0,0 +1,133 @@
+"""
+Per-user result cache and the versions its keys are made of
+"""
+import multiprocessing
+import threading
+from types import SimpleNamespace
+import pytest
+from backend.cache import SingleFlightCache, user_cache_key, user_results
+from backend.ml import collaborative
+from backend.versions import bump_catalog_version, bump_user_version, get_catalog_version, get_user_version
+
+
+@pytest.fixture
+def learner(client, login, make_quiz):
+    """
+    A learner with one attempted topic and two untouched ones in the same course
+    """
+    author, headers = login("author"), login("amy")
+    question = {"question": "?", "options": ["a", "b"], "correct_answer_index": 0}
+    course_id, _, quiz_id = make_quiz(author, [question])
+    others = [make_quiz(author, [question], course_id=course_id)[1] for _ in range(2)]
+    client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": [1]}, headers=headers)
+    return headers, others
+
+
+def test_collaborative_results_follow_the_neighbor_table_version(client, learner, monkeypatch):
+    headers, (first, second) = learner
+    tables = {
+        "v1": SimpleNamespace(version="v1", score=lambda ratings: {first: 1.0}),
+        "v2": SimpleNamespace(version="v2", score=lambda ratings: {second: 1.0}),
+    }
+
+    def recommended(version):
+        monkeypatch.setattr(collaborative, "get_neighbor_table", lambda db: tables[version])
+        response = client.get("/api/recommendations/topics", params={"strategy": "collaborative"}, headers=headers)
+        assert response.status_code == 200
+        return [item["topic_id"] for item in response.json()]
+
+    assert recommended("v1") == [first]
+    # A new table (or a rollback to an older one) is picked up at once
+    assert recommended("v2") == [second]
+    assert recommended("v1") == [first]
+
+
+def test_concurrent_misses_compute_once():
+    cache = SingleFlightCache(maxsize=2)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.get_or_compute("key", compute))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_failed_compute_is_not_cached():
+    cache = SingleFlightCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("key", fail)
+    assert cache.get_or_compute("key", lambda: "value") == "value"
+    assert cache.stats()["inflight"] == 0
+
+
+def test_lru_evicts_the_oldest_key():
+    cache = SingleFlightCache(maxsize=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_compute(key, lambda: key)
+    assert cache.get_or_compute("a", lambda: "recomputed") == "a"
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+
+def test_writes_move_keys_to_new_versions(client, learner, make_quiz):
+    headers, _ = learner
+    key = user_cache_key(2, "knowledge-gaps", ())
+    assert user_cache_key(2, "knowledge-gaps", ()) == key
+
+    bump_user_version(1)
+    assert user_cache_key(2, "knowledge-gaps", ()) == key
+    make_quiz(headers, [])
+    catalog_key = user_cache_key(2, "knowledge-gaps", ())
+    assert catalog_key != key
+    client.post("/api/performance/track", json={"topic_id": 1, "time_spent_minutes": 5}, headers=headers)
+    assert user_cache_key(2, "knowledge-gaps", ()) != catalog_key
+
+
+def test_cached_view_is_recomputed_after_a_submission(client, learner):
+    headers, _ = learner
+    gaps = lambda: client.get("/api/recommendations/knowledge-gaps", headers=headers)
+    first = gaps().json()
+    hits = user_results.stats()["hits"]
+    assert gaps().json() == first
+    assert user_results.stats()["hits"] == hits + 1
+
+    # Recomputed under the new version, by the precompute handler or the read
+    misses = user_results.stats()["misses"]
+    client.post("/api/quizzes/submit", json={"quiz_id": 1, "answers": [0]}, headers=headers)
+    gaps()
+    assert user_results.stats()["misses"] > misses
+
+
+def _bump_in_child(user_id):
+    bump_user_version(user_id)
+    bump_catalog_version()
+
+
+def test_bumps_are_shared_with_forked_workers():
+    before = get_user_version(7), get_catalog_version()
+    child = multiprocessing.get_context("fork").Process(target=_bump_in_child, args=(7,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert get_user_version(7) != before[0]
+    assert get_catalog_version() != before[1]
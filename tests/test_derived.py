@@ -0,0 +1,28 @@
+"""
+Derived state pushed by the event pipeline
+"""
+from backend.derived import build_dashboard_delta
+
+
+def test_dashboard_delta_matches_dashboard_for_enrolled_user(client, login, make_quiz, db):
+    author, headers = login("author"), login("amy")
+    question = {"question": "?", "options": ["a", "b", "c"], "correct_answer_index": 0}
+    course_id, enrolled_topic, enrolled_quiz = make_quiz(author, [question])
+    make_quiz(author, [question], course_id=course_id)
+    other_course, _, other_quiz = make_quiz(author, [question])
+
+    # Taking a quiz enrolls; leaving the second course keeps its passed topic
+    # in the aggregates but outside the curriculum
+    for quiz_id in (enrolled_quiz, other_quiz):
+        client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": [0]}, headers=headers)
+    assert client.delete(f"/api/courses/{other_course}/enroll", headers=headers).status_code == 200
+
+    dashboard = client.get("/api/analytics/dashboard", headers=headers).json()
+    delta = build_dashboard_delta(db, 2, {enrolled_topic})
+    for field in ("total_topics", "completed_topics", "completion_percentage", "average_score"):
+        assert delta[field] == dashboard[field], field
+    assert (delta["total_topics"], delta["completed_topics"]) == (2, 1)
+
+    rows = {row["topic_id"]: row for row in dashboard["topic_performances"]}
+    [performance] = delta["topic_performances"]
+    assert {key: performance[key] for key in rows[enrolled_topic]} == rows[enrolled_topic]
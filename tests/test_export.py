@@ -0,0 +1,22 @@
+"""
+CSV export of the attempt history
+"""
+import csv
+import io
+from backend.routers import quizzes
+
+
+def test_export_streams_hot_attempts_in_batches(client, login, make_quiz, monkeypatch):
+    monkeypatch.setattr(quizzes, "EXPORT_BATCH_ROWS", 2)
+    headers = login("amy")
+    question = {"question": "?", "options": ["a", "b"], "correct_answer_index": 0}
+    _, topic_id, quiz_id = make_quiz(headers, [question])
+    for answer in (0, 1, 0, 0, 1):
+        client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": [answer]}, headers=headers)
+
+    response = client.get("/api/quizzes/attempts/export", headers=headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [1, 2, 3, 4, 5]
+    assert [float(row["score"]) for row in rows] == [100.0, 0.0, 100.0, 100.0, 0.0]
+    assert {int(row["topic_id"]) for row in rows} == {topic_id}
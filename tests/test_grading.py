@@ -0,0 +1,114 @@
+"""
+Grading engine: scoring rules, bulk re-grade and the quiz edit endpoint
+"""
+import json
+import numpy as np
+import pytest
+from backend.grading import compile_answer_key, encode_submissions, grade, grade_submission, regrade_quiz
+from backend.leaderboard import verify_leaderboards
+from backend.models import Quiz, QuizAttempt, TopicMastery, UserDailyStats
+from backend.ml.mastery import rebuild_ratings
+
+
+def question(options: int, correct=None, indices=None, partial=False, weight=1.0) -> dict:
+    return {
+        "question": "?", "options": [f"option {i}" for i in range(options)],
+        "correct_answer_index": correct, "correct_answer_indices": indices,
+        "partial_credit": partial, "weight": weight,
+    }
+
+
+def test_single_choice_matches_correct_share():
+    key = compile_answer_key([0, 2, 1], [4, 4, 4])
+    assert grade_submission(key, [0, 2, 3]) == 2 / 3 * 100
+    assert grade_submission(key, [0, 2, 1]) == 100.0
+    # Missing answers, answers past the last question and unknown options score nothing
+    assert grade_submission(key, [0]) == 1 / 3 * 100
+    assert grade_submission(key, [0, 2, 1, 3]) == 100.0
+    assert grade_submission(key, [9, 2, 1]) == 2 / 3 * 100
+
+
+def test_multi_select_and_weights():
+    key = compile_answer_key([{"correct": [0, 2], "weight": 3.0}, 1], [4, 4])
+    assert grade_submission(key, [[0, 2], 0]) == 75.0
+    assert grade_submission(key, [[0], 1]) == 25.0
+    assert grade_submission(key, [[0, 1, 2], 1]) == 25.0
+
+
+def test_partial_credit_uses_each_questions_own_options():
+    entries = [{"correct": [0, 1], "partial_credit": True}, 0]
+    answers = [[0, 2], 0]
+    # One right and one wrong pick of a 4-option question: 1/2 - 1/2 = 0
+    narrow = grade_submission(compile_answer_key(entries, [4, 4]), answers)
+    wide = grade_submission(compile_answer_key(entries, [4, 8]), answers)
+    assert narrow == wide == 50.0
+    # An option only the other question has selects nothing
+    assert grade_submission(compile_answer_key(entries, [4, 8]), [[0, 6], 0]) == 75.0
+
+
+def test_grade_is_vectorized_over_submissions():
+    key = compile_answer_key([0, {"correct": [1, 2], "partial_credit": True}], [3, 3])
+    submissions = [[0, [1, 2]], [1, [1]], [0, [0, 1]], []]
+    scores = grade(key, encode_submissions(key, submissions))
+    assert scores.tolist() == [grade_submission(key, s) for s in submissions]
+    np.testing.assert_allclose(scores, [100.0, 25.0, 50.0, 0.0])
+
+
+def submit(client, headers, quiz_id, answers):
+    response = client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": answers}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_regrade_rescores_attempts_and_derived_state(client, login, make_quiz, db):
+    amy, bob = login("amy"), login("bob")
+    _, topic_id, quiz_id = make_quiz(amy, [question(3, correct=0), question(3, correct=1)])
+    submit(client, amy, quiz_id, [0, 1])
+    submit(client, bob, quiz_id, [1, 1])
+    submit(client, bob, quiz_id, [1, 0])
+
+    # Nothing changes while the key is the same
+    assert regrade_quiz(db, quiz_id).attempts_changed == 0
+
+    quiz = db.get(Quiz, quiz_id)
+    quiz.answers = json.dumps([1, 1])
+    db.commit()
+    result = regrade_quiz(db, quiz_id, chunk_size=2)
+    assert (result.attempts_checked, result.attempts_changed) == (3, 3)
+    assert result.user_ids == {1, 2}
+
+    scores = [a.score for a in db.query(QuizAttempt).order_by(QuizAttempt.id)]
+    assert scores == [50.0, 100.0, 50.0]
+    daily = {row.user_id: (row.attempts_count, row.score_sum, row.passed_count) for row in db.query(UserDailyStats)}
+    assert daily == {1: (1, 50.0, 0), 2: (2, 150.0, 1)}
+    assert verify_leaderboards(db) == []
+
+    incremental = sorted((m.user_id, m.topic_id, m.rating, m.attempts_count) for m in db.query(TopicMastery))
+    rebuild_ratings(db)
+    db.expire_all()
+    assert sorted((m.user_id, m.topic_id, m.rating, m.attempts_count) for m in db.query(TopicMastery)) == incremental
+
+
+def test_update_quiz_regrades_in_the_background(client, login, make_quiz, monkeypatch):
+    monkeypatch.setattr("backend.auth.ADMIN_USERNAMES", {"admin"})
+    admin, amy = login("admin"), login("amy")
+    _, _, quiz_id = make_quiz(admin, [question(3, correct=0), question(3, correct=1)])
+    submit(client, amy, quiz_id, [2, 1])
+
+    edited = {"questions": [question(3, correct=2), question(3, correct=1)]}
+    assert client.put(f"/api/quizzes/{quiz_id}", json=edited, headers=amy).status_code == 403
+    response = client.put(f"/api/quizzes/{quiz_id}", json=edited, headers=admin)
+    assert response.status_code == 200
+    # The public view never exposes the key
+    assert "correct_answer_index" not in json.dumps(response.json())
+
+    attempts = client.get("/api/quizzes/attempts/user", headers=amy).json()
+    assert [a["score"] for a in attempts] == [100.0]
+
+
+def test_update_quiz_rejects_out_of_range_keys(client, login, make_quiz, monkeypatch):
+    monkeypatch.setattr("backend.auth.ADMIN_USERNAMES", {"admin"})
+    admin = login("admin")
+    _, _, quiz_id = make_quiz(admin, [question(3, correct=0)])
+    response = client.put(f"/api/quizzes/{quiz_id}", json={"questions": [question(3, correct=5)]}, headers=admin)
+    assert response.status_code == 400
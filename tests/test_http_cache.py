@@ -0,0 +1,59 @@
+"""
+Conditional GETs on the catalog endpoints
+"""
+import pytest
+from backend.http_cache import etag_matches
+from backend.query_debug import query_budget
+
+
+@pytest.fixture
+def catalog(client, login, make_quiz):
+    headers = login("amy")
+    question = {"question": "?", "options": ["a", "b"], "correct_answer_index": 0}
+    course_id, topic_id, quiz_id = make_quiz(headers, [question])
+    return headers, course_id, topic_id, quiz_id
+
+
+def paths(course_id, topic_id, quiz_id):
+    return [
+        "/api/courses/", f"/api/courses/{course_id}", f"/api/courses/topics/{topic_id}",
+        f"/api/quizzes/topic/{topic_id}", f"/api/quizzes/{quiz_id}",
+    ]
+
+
+def test_matching_etag_answers_304_without_queries(client, catalog, engine):
+    headers, *ids = catalog
+    for path in paths(*ids):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, path
+        etag = response.headers["ETag"]
+        assert response.headers["Vary"] == "Authorization"
+
+        with query_budget(0, engine=engine):
+            response = client.get(path, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304, path
+        assert response.headers["ETag"] == etag
+
+
+def test_304_needs_a_valid_token(client, catalog):
+    headers, *ids = catalog
+    etag = client.get("/api/courses/", headers=headers).headers["ETag"]
+    for auth in ({}, {"Authorization": "Bearer not-a-token"}):
+        response = client.get("/api/courses/", headers={**auth, "If-None-Match": etag})
+        assert response.status_code == 401
+
+
+def test_catalog_change_replaces_the_etag(client, catalog, make_quiz):
+    headers, course_id, *_ = catalog
+    etag = client.get("/api/courses/", headers=headers).headers["ETag"]
+    make_quiz(headers, [], course_id=course_id)
+    response = client.get("/api/courses/", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_if_none_match_parsing():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
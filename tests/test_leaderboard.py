@@ -0,0 +1,91 @@
+"""
+Incrementally maintained leaderboards
+"""
+from datetime import timedelta
+import pytest
+from backend.leaderboard import compute_entries, leaderboards, rebuild_leaderboards, verify_leaderboards
+from backend.models import LeaderboardEntry
+from backend.versions import bump_leaderboard_version
+
+
+def question(correct: int) -> dict:
+    return {"question": "?", "options": ["a", "b", "c", "d"], "correct_answer_index": correct}
+
+
+@pytest.fixture
+def course(client, login, make_quiz):
+    """
+    Two topics of one course, two questions each, and four learners' attempts
+    """
+    users = {name: login(name) for name in ("amy", "bob", "cat", "dan")}
+    course_id, first_topic, first_quiz = make_quiz(users["amy"], [question(0), question(1)])
+    _, second_topic, second_quiz = make_quiz(users["amy"], [question(0), question(1)], course_id=course_id)
+    # Submissions in order; bob ties amy's first-topic best later than her
+    for name, quiz_id, answers in [
+        ("amy", first_quiz, [0, 0]),
+        ("bob", first_quiz, [1, 1]),
+        ("amy", first_quiz, [0, 1]),
+        ("bob", first_quiz, [0, 1]),
+        ("cat", second_quiz, [0, 1]),
+        ("amy", second_quiz, [0, 0]),
+        ("bob", first_quiz, [0, 0]),  # Worse than bob's best: no change
+        ("dan", second_quiz, [2, 2]),
+    ]:
+        response = client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": answers}, headers=users[name])
+        assert response.status_code == 200
+    return users, course_id, first_topic, second_topic
+
+
+def board(client, headers, path):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    return data, [(s["username"], s["rank"], s["best_score"]) for s in data["top"]]
+
+
+def test_incremental_entries_match_a_full_recompute(course, db):
+    assert verify_leaderboards(db) == []
+    stored = {
+        (e.scope, e.scope_id, e.user_id): (e.best_score, e.achieved_at)
+        for e in db.query(LeaderboardEntry)
+    }
+    assert stored == compute_entries(db)
+
+    assert rebuild_leaderboards(db) == len(stored)
+    db.expire_all()
+    assert verify_leaderboards(db) == []
+
+
+def test_ranks_break_ties_by_first_to_reach_the_score(client, course):
+    users, course_id, first_topic, second_topic = course
+    data, top = board(client, users["dan"], f"/api/courses/topics/{first_topic}/leaderboard")
+    assert top == [("amy", 1, 100.0), ("bob", 2, 100.0)]
+    assert data["me"] is None
+
+    data, top = board(client, users["dan"], f"/api/courses/{course_id}/leaderboard")
+    assert top == [("amy", 1, 150.0), ("bob", 2, 100.0), ("cat", 3, 100.0), ("dan", 4, 0.0)]
+    assert (data["total_entries"], data["me"]["rank"]) == (4, 4)
+
+    data, top = board(client, users["cat"], f"/api/courses/{course_id}/leaderboard?limit=1")
+    assert top == [("amy", 1, 150.0)]
+    assert data["me"]["rank"] == 3
+
+
+def test_boards_reload_after_another_workers_change(client, course, db):
+    users, course_id, first_topic, _ = course
+    path = f"/api/courses/topics/{first_topic}/leaderboard"
+    board(client, users["amy"], path)
+
+    # Another worker stored a best of cat's from before anyone else's; this
+    # worker only sees the version bump
+    amy = db.query(LeaderboardEntry).filter_by(scope="topic", scope_id=first_topic, user_id=1).one()
+    db.add(LeaderboardEntry(
+        scope="topic", scope_id=first_topic, user_id=3, best_score=100.0,
+        achieved_at=amy.achieved_at - timedelta(hours=1),
+    ))
+    db.commit()
+    _, top = board(client, users["amy"], path)
+    assert [name for name, _, _ in top] == ["amy", "bob"]
+    bump_leaderboard_version(f"topic:{first_topic}")
+    _, top = board(client, users["amy"], path)
+    assert [name for name, _, _ in top] == ["cat", "amy", "bob"]
@@ -0,0 +1,24 @@
+"""
+Mastery ratings and the knowledge gaps read from them
+"""
+from backend.ml.mastery import mastery_gaps
+from backend.models import TopicRating
+from backend.query_debug import query_budget
+
+
+def test_mastery_gaps_only_reads_curriculum_ratings(client, login, make_quiz, db, engine):
+    author, headers = login("author"), login("amy")
+    question = {"question": "?", "options": ["a", "b"], "correct_answer_index": 0}
+    course_id, topic_id, quiz_id = make_quiz(author, [question])
+    other_course, _, other_quiz = make_quiz(author, [question])
+    for quiz in (quiz_id, other_quiz):
+        client.post("/api/quizzes/submit", json={"quiz_id": quiz, "answers": [1]}, headers=headers)
+    client.delete(f"/api/courses/{other_course}/enroll", headers=headers)
+    assert db.query(TopicRating).count() == 2
+
+    with query_budget(3, engine=engine) as recorder:
+        gaps = mastery_gaps(2, db)
+    assert [gap["topic_id"] for gap in gaps] == [topic_id]
+    assert gaps[0]["is_weak"]
+    ratings = [s for s in recorder.statements if "FROM topic_ratings" in s]
+    assert ratings and all(" IN (" in s for s in ratings)
@@ -0,0 +1,58 @@
+"""
+Keyset pagination of the per-user history listings
+"""
+import pytest
+from backend.models import Performance
+from backend.pagination import encode_cursor
+
+
+def walk(client, path, headers, limit):
+    """
+    All pages of a listing, following X-Next-Cursor
+    """
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params, headers=headers)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def tracked(client, login, make_quiz, db):
+    """
+    Five performance records for one user, two of them without last_accessed
+    """
+    headers = login("amy")
+    course_id, topic_id, _ = make_quiz(headers, [])
+    topic_ids = [topic_id] + [make_quiz(headers, [], course_id=course_id)[1] for _ in range(4)]
+    for topic_id in topic_ids:
+        client.post("/api/performance/track", json={"topic_id": topic_id, "time_spent_minutes": 5}, headers=headers)
+    db.query(Performance).filter(Performance.id.in_([2, 4])).update({"last_accessed": None}, synchronize_session=False)
+    db.commit()
+    return headers
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 5, 6])
+def test_performance_pages_cover_every_row_once(client, tracked, limit):
+    pages = walk(client, "/api/performance/user", tracked, limit)
+    ids = [row["id"] for page in pages for row in page]
+    assert ids == [5, 4, 3, 2, 1]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert [row["last_accessed"] is None for row in pages[0]][:2] == [False, True][:limit]
+
+
+def test_performance_rejects_timestamp_cursors(client, tracked):
+    for cursor in (encode_cursor("None", 3), "not-a-cursor"):
+        response = client.get("/api/performance/user", params={"cursor": cursor}, headers=tracked)
+        assert response.status_code == 400
+
+
+def test_attempt_cursor_rejects_null_timestamp(client, login):
+    headers = login("amy")
+    for cursor in (encode_cursor(None, 3), encode_cursor(3)):
+        response = client.get("/api/quizzes/attempts/user", params={"cursor": cursor}, headers=headers)
+        assert response.status_code == 400
@@ -0,0 +1,39 @@
+"""
+On-demand request profiling
+"""
+import cProfile
+import pytest
+from backend import profiling
+
+
+@pytest.fixture
+def admin(login, monkeypatch):
+    monkeypatch.setattr("backend.auth.ADMIN_USERNAMES", {"admin"})
+    return {**login("admin"), "X-Profile": "1"}
+
+
+def saved_profiles(tmp_path):
+    return sorted(p.name for p in (tmp_path / "profiles").glob("*.prof")) if (tmp_path / "profiles").exists() else []
+
+
+def test_header_profiles_the_endpoint(client, admin, tmp_path):
+    assert client.get("/api/courses/", headers=admin).status_code == 200
+    [name] = saved_profiles(tmp_path)
+    assert "GET_api-courses_admin" in name
+    assert not profiling._profiler_lock.locked()
+
+
+def test_busy_profiler_runs_the_endpoint_unprofiled(client, admin, tmp_path):
+    with profiling._profiler_lock:
+        assert client.get("/api/courses/", headers=admin).status_code == 200
+    assert saved_profiles(tmp_path) == []
+
+
+def test_refused_profiler_runs_the_endpoint_unprofiled(client, admin, tmp_path, monkeypatch):
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile.Profile, "enable", enable)
+    assert client.get("/api/courses/", headers=admin).status_code == 200
+    assert saved_profiles(tmp_path) == []
+    assert not profiling._profiler_lock.locked()
@@ -0,0 +1,76 @@
+"""
+Query counts of the hot read endpoints stay flat as a learner's data grows
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from backend.database import SessionLocal
+from backend.query_debug import QueryDebugMiddleware, install_query_listener, query_budget
+
+# Endpoint: queries per request, authentication included
+BUDGETS = {
+    "/api/home": 6,
+    "/api/analytics/dashboard": 6,
+    "/api/quizzes/attempts/user": 3,
+}
+
+
+def seed_history(client, headers: dict, courses: int):
+    """
+    `courses` courses of `courses` topics, each quiz attempted twice
+    """
+    for c in range(courses):
+        course_id = client.post("/api/courses/", json={"title": f"Course {c}"}, headers=headers).json()["id"]
+        for t in range(courses):
+            topic_id = client.post("/api/courses/topics", json={
+                "title": f"Topic {c}.{t}", "difficulty_level": "Beginner", "course_id": course_id
+            }, headers=headers).json()["id"]
+            quiz_id = client.post("/api/quizzes/", json={
+                "topic_id": topic_id, "title": "Quiz",
+                "questions": [{"question": "Pick a", "options": ["a", "b"], "correct_answer_index": 0}],
+            }, headers=headers).json()["id"]
+            for answer in (0, 1):
+                response = client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": [answer]}, headers=headers)
+                assert response.status_code == 200
+
+
+@pytest.mark.parametrize("courses", [1, 4])
+@pytest.mark.parametrize("path", sorted(BUDGETS))
+def test_read_endpoint_query_budget(client, login, engine, path, courses):
+    headers = login("amy")
+    seed_history(client, headers, courses)
+    # Cold, then served again at the same data versions
+    for _ in range(2):
+        with query_budget(BUDGETS[path], repeat_threshold=1, engine=engine):
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200
+
+
+def n_plus_one_app(mode: str) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(QueryDebugMiddleware, threshold=2, mode=mode)
+
+    @app.get("/rows")
+    def rows():
+        db = SessionLocal()
+        try:
+            return [db.execute(text("SELECT :n"), {"n": n}).scalar() for n in range(5)]
+        finally:
+            db.close()
+
+    return app
+
+
+def test_debug_middleware_counts_and_warns(engine, caplog):
+    install_query_listener(engine)
+    response = TestClient(n_plus_one_app("warn")).get("/rows")
+    assert response.status_code == 200
+    assert response.headers["x-query-count"] == "5"
+    assert "Possible N+1 in GET /rows" in caplog.text
+
+
+def test_debug_middleware_raise_mode_fails_the_request(engine):
+    install_query_listener(engine)
+    response = TestClient(n_plus_one_app("raise"), raise_server_exceptions=False).get("/rows")
+    assert response.status_code == 500
@@ -0,0 +1,87 @@
+"""
+Full-text catalog search and the triggers keeping its index in sync
+"""
+import pytest
+from sqlalchemy import text
+from backend.models import Course, Quiz, Topic
+from backend.search import match_expression, rebuild_search_index, search
+
+
+def hits(db, query, **kwargs):
+    return [(h["kind"], h["id"]) for h in search(db, query, **kwargs)["results"]]
+
+
+def index_rows(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(text("SELECT rowid, kind, title, body FROM search_index")).all())
+
+
+@pytest.fixture
+def catalog(client, login, make_quiz, monkeypatch):
+    monkeypatch.setattr("backend.auth.ADMIN_USERNAMES", {"admin"})
+    headers = login("admin")
+    course_id = client.post("/api/courses/", json={
+        "title": "Python Basics", "description": "Variables and loops"
+    }, headers=headers).json()["id"]
+    _, topic_id, quiz_id = make_quiz(headers, [
+        {"question": "What does a generator yield?", "options": ["a", "b"], "correct_answer_index": 0},
+    ], course_id=course_id)
+    return headers, course_id, topic_id, quiz_id
+
+
+def test_inserts_are_searchable_with_context(db, catalog):
+    _, course_id, topic_id, quiz_id = catalog
+    assert hits(db, "pyth") == [("course", course_id)]
+    assert hits(db, "loops variables") == [("course", course_id)]
+    [hit] = search(db, "generator")["results"]
+    assert (hit["kind"], hit["id"], hit["topic_id"], hit["course_id"]) == ("quiz", quiz_id, topic_id, course_id)
+    assert hit["course_title"] == "Python Basics"
+    assert "generator" in hit["snippet"]
+
+
+def test_updates_and_deletes_keep_the_index_in_sync(client, db, engine, catalog):
+    headers, course_id, topic_id, quiz_id = catalog
+    response = client.put(f"/api/quizzes/{quiz_id}", json={"title": "Closures", "questions": [
+        {"question": "Which scope does a closure capture?", "options": ["a", "b"], "correct_answer_index": 0},
+    ]}, headers=headers)
+    assert response.status_code == 200
+    assert hits(db, "generator") == []
+    assert hits(db, "closure") == [("quiz", quiz_id)]
+
+    db.get(Course, course_id).title = "Rust Basics"
+    db.get(Topic, topic_id).description = "Ownership"
+    db.commit()
+    assert hits(db, "python") == []
+    assert hits(db, "rust") == [("course", course_id)]
+    assert hits(db, "ownership") == [("topic", topic_id)]
+
+    db.delete(db.get(Quiz, quiz_id))
+    db.commit()
+    assert hits(db, "closure") == []
+
+    # The triggers left exactly what a full rebuild produces
+    synced = index_rows(engine)
+    assert rebuild_search_index(engine) == len(synced)
+    assert index_rows(engine) == synced
+
+
+def test_kind_filter_and_paging(client, db, catalog, make_quiz):
+    headers, course_id, *_ = catalog
+    for _ in range(3):
+        make_quiz(headers, [{"question": "Python quiz", "options": ["a"], "correct_answer_index": 0}], course_id=course_id)
+    assert {kind for kind, _ in hits(db, "python")} == {"course", "quiz"}
+    assert {kind for kind, _ in hits(db, "python", kinds=["quiz"])} == {"quiz"}
+    # Title matches rank above body matches
+    assert hits(db, "python")[0] == ("course", course_id)
+
+    first = search(db, "python", limit=2)
+    second = search(db, "python", limit=2, offset=first["next_offset"])
+    assert first["next_offset"] == 2 and second["next_offset"] is None
+    assert len({(h["kind"], h["id"]) for h in first["results"] + second["results"]}) == 4
+
+
+def test_operators_are_matched_as_text(db, catalog):
+    assert match_expression('python OR "x" NOT') == '"python"* "or"* "x" "not"*'
+    assert match_expression("!!!") is None
+    assert hits(db, 'python NOT basics') == []
+    assert search(db, "***")["results"] == []
@@ -0,0 +1,84 @@
+"""
+SM-2 review scheduling
+"""
+from datetime import datetime, timedelta
+import pytest
+from backend.ml.spaced_repetition import (
+    INITIAL_EASE, MIN_EASE, ReviewState, quality, rebuild_schedule, review_queue, sm2_update
+)
+from backend.models import ReviewSchedule
+
+
+def replay(*scores) -> ReviewState:
+    state = ReviewState(0, 0.0, INITIAL_EASE)
+    for score in scores:
+        state = sm2_update(state, score)
+    return state
+
+
+def test_quality_rounds_score_to_a_grade():
+    assert [quality(s) for s in (0, 9, 10, 49, 50, 69, 70, 100)] == [0, 0, 1, 2, 3, 3, 4, 5]
+
+
+def test_intervals_grow_by_the_previous_ease():
+    assert replay(100) == ReviewState(1, 1.0, pytest.approx(2.6))
+    assert replay(100, 100) == ReviewState(2, 6.0, pytest.approx(2.7))
+    third = replay(100, 100, 100)
+    assert third.repetitions == 3
+    assert third.interval_days == pytest.approx(6.0 * 2.7)
+    assert replay(100, 100, 100, 100).interval_days == pytest.approx(6.0 * 2.7 * 2.8)
+
+
+def test_failed_review_restarts_and_ease_has_a_floor():
+    failed = replay(100, 100, 100, 40)
+    assert (failed.repetitions, failed.interval_days) == (0, 1.0)
+    assert failed.ease_factor == pytest.approx(2.8 + 0.1 - 3 * (0.08 + 3 * 0.02))
+    assert replay(0, 0, 0, 0, 0).ease_factor == MIN_EASE
+    # Passing again starts over at 1 then 6 days
+    assert replay(100, 100, 100, 40, 100).interval_days == 1.0
+    assert replay(100, 100, 100, 40, 100, 100).interval_days == 6.0
+
+
+def schedule(db):
+    db.expire_all()
+    return sorted(
+        (r.user_id, r.topic_id, r.repetitions, round(r.interval_days, 9), round(r.ease_factor, 9),
+         r.last_score, r.due_at, r.last_reviewed_at)
+        for r in db.query(ReviewSchedule)
+    )
+
+
+@pytest.fixture
+def reviewed(client, login, make_quiz):
+    users = [login("amy"), login("bob")]
+    question = {"question": "?", "options": ["a", "b"], "correct_answer_index": 0}
+    course_id, _, first = make_quiz(users[0], [question, question])
+    _, _, second = make_quiz(users[0], [question, question], course_id=course_id)
+    for user, quiz_id, answers in [
+        (0, first, [0, 0]), (0, first, [0, 1]), (0, first, [0, 0]),
+        (1, first, [1, 1]), (1, second, [0, 0]), (1, second, [0, 0]), (0, second, [1, 0]),
+    ]:
+        client.post("/api/quizzes/submit", json={"quiz_id": quiz_id, "answers": answers}, headers=users[user])
+    return users
+
+
+def test_rebuild_matches_the_incremental_schedule(reviewed, db):
+    incremental = schedule(db)
+    assert len(incremental) == 4
+    assert rebuild_schedule(db) == 4
+    assert schedule(db) == incremental
+
+    db.query(ReviewSchedule).filter(ReviewSchedule.user_id == 2).delete()
+    db.commit()
+    rebuild_schedule(db, user_ids=[2], topic_ids=[1, 2])
+    assert schedule(db) == incremental
+
+
+def test_review_queue_lists_most_overdue_first(reviewed, db):
+    assert review_queue(db, 1) == []
+    later = datetime.utcnow() + timedelta(days=3)
+    # amy: topic 1 passed three times (50 is still a pass), topic 2 failed (1 day)
+    assert [item["topic_id"] for item in review_queue(db, 1, now=later)] == [2]
+    # bob: topic 1 failed (1 day), topic 2 passed twice (6 days)
+    assert [item["topic_id"] for item in review_queue(db, 2, now=later)] == [1]
+    assert [item["topic_id"] for item in review_queue(db, 2, limit=5, now=later + timedelta(days=5))] == [1, 2]
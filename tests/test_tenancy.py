@@ -0,0 +1,90 @@
+"""
+Per-tenant databases and request routing
+"""
+import pytest
+from sqlalchemy import create_engine, func
+from backend import database
+from backend.database import DEFAULT_TENANT, fan_out, init_db
+from backend.models import Course
+
+
+@pytest.fixture
+def tenants(engine, tmp_path, monkeypatch):
+    """
+    A second tenant, "acme", with its own database
+    """
+    monkeypatch.setattr(database, "TENANTS", [DEFAULT_TENANT, "acme"])
+    acme = create_engine(f"sqlite:///{tmp_path / 'acme.db'}", connect_args={"check_same_thread": False})
+    monkeypatch.setitem(database._engines, "acme", acme)
+    init_db(acme)
+    yield
+    acme.dispose()
+
+
+@pytest.fixture
+def sign_in(client):
+    def sign_in(username: str, tenant: str = DEFAULT_TENANT) -> dict:
+        tenant_header = {"X-Tenant": tenant}
+        client.post("/api/auth/signup", json={
+            "username": username, "email": f"{username}@example.com", "password": "secret123"
+        }, headers=tenant_header)
+        response = client.post("/api/auth/login", json={"username": username, "password": "secret123"},
+                               headers=tenant_header)
+        assert response.status_code == 200
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return sign_in
+
+
+def course_titles(client, headers):
+    response = client.get("/api/courses/", headers=headers)
+    assert response.status_code == 200
+    return [course["title"] for course in response.json()]
+
+
+def test_tenants_have_separate_data(client, tenants, sign_in):
+    local, remote = sign_in("amy"), sign_in("amy", "acme")
+    client.post("/api/courses/", json={"title": "Default course"}, headers=local)
+    client.post("/api/courses/", json={"title": "Acme course"}, headers=remote)
+    assert course_titles(client, local) == ["Default course"]
+    assert course_titles(client, remote) == ["Acme course"]
+
+
+def test_token_tenant_overrides_the_header(client, tenants, sign_in):
+    local, remote = sign_in("amy"), sign_in("bob", "acme")
+    client.post("/api/courses/", json={"title": "Acme course"}, headers=remote)
+    assert course_titles(client, {**remote, "X-Tenant": DEFAULT_TENANT}) == ["Acme course"]
+    assert course_titles(client, {**local, "X-Tenant": "acme"}) == []
+    # bob only exists in acme, whatever the header says
+    assert client.get("/api/auth/me", headers={**remote, "X-Tenant": DEFAULT_TENANT}).json()["username"] == "bob"
+
+
+def test_unknown_tenant_is_rejected(client, tenants):
+    response = client.post("/api/auth/login", json={"username": "amy", "password": "secret123"},
+                           headers={"X-Tenant": "nobody"})
+    assert response.status_code == 400
+
+
+def test_fan_out_and_the_cross_tenant_report(client, tenants, sign_in, monkeypatch):
+    monkeypatch.setattr("backend.auth.ADMIN_USERNAMES", {"admin"})
+    admin, remote_admin = sign_in("admin"), sign_in("admin", "acme")
+    for title in ("One", "Two"):
+        client.post("/api/courses/", json={"title": title}, headers=remote_admin)
+
+    counts = fan_out(lambda db: (database.current_tenant.get(), db.query(func.count(Course.id)).scalar()))
+    assert counts == {DEFAULT_TENANT: (DEFAULT_TENANT, 0), "acme": ("acme", 2)}
+
+    response = client.get("/api/admin/tenants", headers=admin)
+    assert response.status_code == 200
+    assert {(t["tenant"], t["users"], t["courses"]) for t in response.json()} == {
+        (DEFAULT_TENANT, 1, 0), ("acme", 1, 2)
+    }
+    assert client.get("/api/admin/tenants", headers=remote_admin).status_code == 403
+
+
+def test_catalog_etags_differ_between_tenants(client, tenants, sign_in):
+    local, remote = sign_in("amy"), sign_in("amy", "acme")
+    etag = client.get("/api/courses/", headers=local).headers["ETag"]
+    assert client.get("/api/courses/", headers=remote).headers["ETag"] != etag
+    response = client.get("/api/courses/", headers={**remote, "If-None-Match": etag})
+    assert response.status_code == 200